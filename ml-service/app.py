@@ -3,45 +3,365 @@
 Flask API for ML-powered Agricultural Supply Chain Fraud Detection
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, g, Response
 from flask_cors import CORS
+import hmac
+import numpy as np
 import os
 import sys
+import threading
+import time
 
 # Add models directory to path
 sys.path.append(os.path.dirname(__file__))
 
-from models.anomaly_detector import AnomalyDetector
+from models.inference import load_model
+from serving.scoring import validate_batch_payload, score_batch, score_many, score_vectors
+from serving.cache import ScoringCache, feature_cache_key
+from serving.microbatch import MicroBatcher
+from serving.metrics import MetricsRegistry, CONTENT_TYPE, observe_stages
+from serving.profiling import Profiler
+from serving.model_watcher import ModelWatcher
+from models.registry import ModelRegistry
 
 app = Flask(__name__)
 CORS(app)
 
-# Load trained models
 print("🚀 Starting ML Service...")
-print("📂 Loading trained models...")
 
-anomaly_detector = AnomalyDetector()
-model_path = '/home/mirza/fabric-workspace/agricultural-supply-chain/ml-service/saved_models/anomaly_detector.pkl'
+# Model registry directory; when set, the newest version is served and hot-swapped
+MODEL_REGISTRY_DIR = os.getenv('ML_MODEL_REGISTRY')
+model_path = os.getenv(
+    'ML_MODEL_PATH',
+    '/home/mirza/fabric-workspace/agricultural-supply-chain/ml-service/saved_models/anomaly_detector.pkl'
+)
+
+# Handlers read this once per request, so a swap never mixes two models in one response
+anomaly_detector = None
+model_watcher = None
+
+# 'loading' until the first model load finishes, then 'ready', 'missing' or 'failed'
+model_status = 'loading'
+model_loaded = threading.Event()
+
+# Top contributing features explained in each prediction (0 = off)
+EXPLAIN_TOP_FEATURES = int(os.getenv('ML_EXPLAIN_TOP_FEATURES', '5'))
+
+def swap_model(detector, manifest=None):
+    """Serve a new, already warmed-up model to every request from now on"""
+    global anomaly_detector
+    detector.set_explanations(EXPLAIN_TOP_FEATURES)
+    anomaly_detector = detector
+
+if MODEL_REGISTRY_DIR:
+    model_watcher = ModelWatcher(
+        ModelRegistry(MODEL_REGISTRY_DIR),
+        swap_model,
+        poll_seconds=float(os.getenv('ML_REGISTRY_POLL_SECONDS', '10')),
+        pinned_version=os.getenv('ML_MODEL_VERSION')
+    )
+
+def load_initial_model():
+    """Load the first model off the import path so /health answers immediately"""
+    global model_status
+    print("📂 Loading trained models...")
 
-if os.path.exists(model_path):
-    anomaly_detector.load(model_path)
-    print("✅ Anomaly detection model loaded successfully")
-else:
-    print("⚠️  Warning: Anomaly detection model not found. Please train the model first.")
-    anomaly_detector = None
+    try:
+        if model_watcher is not None:
+            model_watcher.check()
+            if anomaly_detector is not None:
+                print(f"✅ Anomaly detection model {anomaly_detector.model_version} loaded from registry")
+                model_status = 'ready'
+            else:
+                print(f"⚠️  Warning: No usable model in registry {MODEL_REGISTRY_DIR}. Waiting for one to be published.")
+                model_status = 'missing'
+        elif os.path.exists(model_path):
+            swap_model(load_model(model_path))
+            print("✅ Anomaly detection model loaded successfully")
+            model_status = 'ready'
+        else:
+            print("⚠️  Warning: Anomaly detection model not found. Please train the model first.")
+            model_status = 'missing'
+    except Exception as e:
+        print(f"❌ Failed to load model: {e}")
+        model_status = 'failed'
+    finally:
+        model_loaded.set()
+
+threading.Thread(target=load_initial_model, name='ml-model-loader', daemon=True).start()
+
+# Upper bound on items accepted by the batch endpoint
+MAX_BATCH_ITEMS = int(os.getenv('ML_MAX_BATCH_ITEMS', '1000'))
+
+# Recently scored payloads, keyed by feature vector + model version
+scoring_cache = ScoringCache(
+    max_entries=int(os.getenv('ML_CACHE_MAX_ENTRIES', '10000')),
+    ttl_seconds=float(os.getenv('ML_CACHE_TTL_SECONDS', '60'))
+)
+
+# Prometheus metrics served on /metrics
+metrics = MetricsRegistry()
+requests_total = metrics.counter(
+    'ml_requests_total', 'Requests handled', ['route', 'method', 'status', 'model_version'])
+request_duration = metrics.histogram(
+    'ml_request_duration_seconds', 'End-to-end request latency', ['route'])
+stage_duration = metrics.histogram(
+    'ml_stage_duration_seconds', 'Time spent per scoring stage', ['stage'])
+requests_in_flight = metrics.gauge(
+    'ml_requests_in_flight', 'Requests currently being handled', ['route'])
+model_info = metrics.gauge(
+    'ml_model_info', 'Model version currently served (value is always 1)', ['model_version'])
+cache_hits = metrics.counter('ml_cache_hits_total', 'Scoring cache hits')
+cache_misses = metrics.counter('ml_cache_misses_total', 'Scoring cache misses')
+cache_coalesced = metrics.counter('ml_cache_coalesced_total', 'Requests that waited on an identical in-flight computation')
+cache_evictions = metrics.counter('ml_cache_evictions_total', 'Scoring cache LRU evictions')
+cache_entries = metrics.gauge('ml_cache_entries', 'Results currently cached')
+
+def collect_state_metrics():
+    """Copy model and cache state into their metrics at scrape time"""
+    detector = anomaly_detector
+    model_info.clear()
+    if detector is not None:
+        model_info.labels(detector.model_version).set(1)
+
+    stats = scoring_cache.stats()
+    cache_hits.labels().set(stats['hits'])
+    cache_misses.labels().set(stats['misses'])
+    cache_coalesced.labels().set(stats['coalesced'])
+    cache_evictions.labels().set(stats['evictions'])
+    cache_entries.set(stats['size'])
+
+metrics.add_collector(collect_state_metrics)
+
+def score_pairs(items):
+    """Score queued (detector, batch, feature vector) items, one vectorized call per model"""
+    results = [None] * len(items)
+    groups = {}
+    for i, (detector, _, _) in enumerate(items):
+        groups.setdefault(id(detector), (detector, []))[1].append(i)
+
+    # Stage times here are per flush, not per request
+    timings = {}
+    for detector, index in groups.values():
+        X = np.vstack([items[i][2] for i in index])
+        for i, result in zip(index, score_vectors(detector, [items[i][1] for i in index], X, timings)):
+            results[i] = result
+    observe_stages(stage_duration, timings)
+
+    return results
+
+# Async serving mode: concurrent single requests are scored together
+microbatcher = None
+if os.getenv('ML_MICROBATCH_ENABLED', 'false').lower() in ('1', 'true', 'yes'):
+    microbatcher = MicroBatcher(
+        score_pairs,
+        max_batch_size=int(os.getenv('ML_MICROBATCH_MAX_SIZE', '64')),
+        max_wait_ms=float(os.getenv('ML_MICROBATCH_MAX_WAIT_MS', '5'))
+    )
+    print(f"⏱️  Micro-batching enabled (max {microbatcher.max_batch_size} items / {microbatcher.max_wait * 1000:g} ms)")
+
+def score_uncached(detector, batch_data, feature_vector):
+    """Score one validated batch, through the micro-batcher when enabled"""
+    if microbatcher is None:
+        return score_batch(detector, batch_data, g.timings, feature_vector)
+
+    result = microbatcher.submit_threadsafe((detector, batch_data, feature_vector))
+    if 'error' in result:
+        raise ValueError(result['error'])
+    return result
+
+def score_cached(detector, batch_data):
+    """Score one validated batch, reusing identical recent results"""
+    # Validation coerced every field the flags and fraud factors read into
+    # a number the vector holds, so the vector identifies the whole response
+    feature_vector = detector.record_to_vector(batch_data, g.timings)
+    key = feature_cache_key(feature_vector, detector.model_version)
+    return scoring_cache.get_or_compute(key, lambda: score_uncached(detector, batch_data, feature_vector))
+
+# Runtime memory/CPU profiling, driven from the /admin/profiling routes
+profiler = Profiler()
+ADMIN_TOKEN = os.getenv('ML_ADMIN_TOKEN')
+
+def current_detector():
+    """The model this request will use, remembered for its metrics label"""
+    detector = anomaly_detector
+    if detector is not None:
+        g.model_version = detector.model_version
+    return detector
+
+def read_json():
+    """Request body, timed as the json_parsing stage"""
+    start = time.perf_counter()
+    data = request.json
+    g.timings['json_parsing'] = time.perf_counter() - start
+    return data
+
+def respond(payload):
+    """jsonify, timed as the serialization stage"""
+    start = time.perf_counter()
+    response = jsonify(payload)
+    g.timings['serialization'] = time.perf_counter() - start
+    return response
+
+def start_process_threads():
+    """
+    Start the registry watcher and profiling sync in this process
+
+    Threads don't survive a fork, so every serving process starts its own;
+    serve.py calls this right after forking a worker.
+    """
+    if model_watcher is not None:
+        model_watcher.start()
+    profiler.start_sync()
+
+@app.before_request
+def ensure_process_threads():
+    start_process_threads()
+
+@app.before_request
+def start_request_metrics():
+    g.request_start = time.perf_counter()
+    g.route = request.url_rule.rule if request.url_rule else 'unmatched'
+    g.timings = {}
+    requests_in_flight.labels(g.route).inc()
+
+    # Only the scoring routes are profiled
+    if request.method == 'POST' and g.route.startswith('/api/ml/'):
+        g.profile_sample = profiler.begin()
+
+@app.after_request
+def record_status(response):
+    g.status = response.status_code
+    return response
+
+@app.teardown_request
+def finish_request_metrics(error=None):
+    if 'request_start' not in g:
+        return
+    profiler.end(g.get('profile_sample'), g.route)
+    requests_in_flight.labels(g.route).dec()
+    request_duration.labels(g.route).observe(time.perf_counter() - g.request_start)
+    requests_total.labels(g.route, request.method, g.get('status', 500), g.get('model_version', '')).inc()
+    observe_stages(stage_duration, g.timings)
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Prometheus text exposition of request, stage, model and cache metrics"""
+    return Response(metrics.render(), content_type=CONTENT_TYPE)
 
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
+    detector = anomaly_detector
     return jsonify({
-        'status': 'healthy',
+        # Callers only route traffic here once this reads 'healthy'
+        'status': 'loading' if model_status == 'loading' else 'healthy',
+        'model_status': 'ready' if detector is not None else model_status,
         'service': 'ml-service',
         'version': '1.0.0',
         'models_loaded': {
-            'anomaly_detector': anomaly_detector is not None
-        }
+            'anomaly_detector': detector is not None
+        },
+        'model_version': detector.model_version if detector else None,
+        'registry': model_watcher.stats() if model_watcher else None,
+        'cache': scoring_cache.stats(),
+        'microbatch': microbatcher.stats() if microbatcher else {'enabled': False}
     })
 
+def admin_denied():
+    """Error response unless the request carries ML_ADMIN_TOKEN, else None"""
+    if not ADMIN_TOKEN:
+        return jsonify({'error': 'Admin endpoints are disabled (set ML_ADMIN_TOKEN)'}), 404
+    if not hmac.compare_digest(request.headers.get('X-Admin-Token', ''), ADMIN_TOKEN):
+        return jsonify({'error': 'Invalid admin token'}), 403
+    return None
+
+@app.route('/admin/profiling', methods=['GET'])
+def profiling_status():
+    """Which profilers are running, and in how many workers"""
+    return admin_denied() or jsonify(profiler.status())
+
+@app.route('/admin/profiling/memory/start', methods=['POST'])
+def start_memory_profiling():
+    """
+    Start tracemalloc tracing
+
+    Request body (optional): {"frames": 10, "snapshotRate": 0.05}
+    """
+    denied = admin_denied()
+    if denied:
+        return denied
+    options = request.get_json(silent=True) or {}
+    profiler.start_memory(
+        frames=int(options.get('frames', 10)),
+        snapshot_rate=float(options.get('snapshotRate', 0.05))
+    )
+    return jsonify(profiler.status())
+
+@app.route('/admin/profiling/memory', methods=['GET'])
+def memory_profile():
+    """Top allocation sites and per-route allocation stats (?limit=20&group_by=lineno)"""
+    denied = admin_denied()
+    if denied:
+        return denied
+    try:
+        return jsonify(profiler.memory_report(
+            limit=request.args.get('limit', 20, type=int),
+            group_by=request.args.get('group_by', 'lineno')
+        ))
+    except (KeyError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/admin/profiling/memory/stop', methods=['POST'])
+def stop_memory_profiling():
+    """Stop tracing and return the final memory report"""
+    return admin_denied() or jsonify(profiler.stop_memory())
+
+@app.route('/admin/profiling/cpu/start', methods=['POST'])
+def start_cpu_profiling():
+    """
+    Profile a sample of scoring requests with cProfile
+
+    Request body (optional): {"sampleRate": 0.01}
+    """
+    denied = admin_denied()
+    if denied:
+        return denied
+    options = request.get_json(silent=True) or {}
+    profiler.start_cpu(sample_rate=float(options.get('sampleRate', 0.01)))
+    return jsonify(profiler.status())
+
+@app.route('/admin/profiling/cpu', methods=['GET'])
+def cpu_profile():
+    """Merged cProfile table of the sampled requests (?limit=30&sort=cumulative)"""
+    denied = admin_denied()
+    if denied:
+        return denied
+    try:
+        return jsonify(profiler.cpu_report(
+            limit=request.args.get('limit', 30, type=int),
+            sort=request.args.get('sort', 'cumulative')
+        ))
+    except (KeyError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/admin/profiling/cpu/stop', methods=['POST'])
+def stop_cpu_profiling():
+    """Stop CPU sampling and return the final report"""
+    return admin_denied() or jsonify(profiler.stop_cpu())
+
+@app.route('/api/ml/cache-stats', methods=['GET'])
+def cache_stats():
+    """Hit/miss/eviction counters of the scoring result cache"""
+    return jsonify(scoring_cache.stats())
+
+@app.route('/api/ml/microbatch-stats', methods=['GET'])
+def microbatch_stats():
+    """Flush sizes and queue wait times of the micro-batching scheduler"""
+    if microbatcher is None:
+        return jsonify({'enabled': False})
+    return jsonify({'enabled': True, **microbatcher.stats()})
+
 @app.route('/api/ml/anomaly-check', methods=['POST'])
 def check_anomaly():
     """
@@ -69,144 +389,133 @@ def check_anomaly():
         "confidence": 0.77,
         "riskLevel": "LOW",
         "recommendation": "APPROVE",
+        "topFeatures": [
+            {"feature": "pricePerUnit", "contribution": 0.0123, "share": 0.18},
+            ...
+        ],
         "flags": []
     }
+
+    topFeatures are the features the forest isolated this batch on,
+    read from its paths in the same scoring pass (ML_EXPLAIN_TOP_FEATURES)
     """
     try:
-        if anomaly_detector is None:
-            return jsonify({'error': 'Anomaly detection model not loaded'}), 503
-
-        batch_data = request.json
-
-        # Validate required fields
-        required_fields = ['crop', 'quantity', 'pricePerUnit', 'latitude', 'longitude']
-        missing_fields = [f for f in required_fields if f not in batch_data]
-
-        if missing_fields:
-            return jsonify({
-                'error': f'Missing required fields: {", ".join(missing_fields)}'
-            }), 400
-
-        # Set defaults for optional fields
-        batch_data.setdefault('temperature', 28.0)
-        batch_data.setdefault('humidity', 75.0)
-        batch_data.setdefault('moistureContent', 12.0)
-        batch_data.setdefault('qualityGrade', 'B')
-        batch_data.setdefault('weather_main', 'Clear')
-
-        # Make prediction
-        result = anomaly_detector.predict(batch_data)
-
-        # Add detailed flags if anomaly detected
-        flags = []
-        if result['isAnomaly']:
-            # Analyze which factors contributed to anomaly
-            if abs(batch_data['latitude']) < 0.1 and abs(batch_data['longitude']) < 0.1:
-                flags.append({
-                    'type': 'GPS_ANOMALY',
-                    'message': 'GPS coordinates suspicious (near Null Island)',
-                    'severity': 'HIGH'
-                })
-
-            if batch_data['temperature'] > 40 or batch_data['temperature'] < 15:
-                flags.append({
-                    'type': 'WEATHER_ANOMALY',
-                    'message': f'Temperature {batch_data["temperature"]}°C outside normal range for Malaysia',
-                    'severity': 'HIGH'
-                })
-
-            if batch_data.get('moistureContent', 50) > 100 or batch_data.get('moistureContent', 50) < 0:
-                flags.append({
-                    'type': 'MOISTURE_ANOMALY',
-                    'message': 'Moisture content physically impossible',
-                    'severity': 'CRITICAL'
-                })
-
-            # Price anomaly check (very rough heuristic)
-            if batch_data['pricePerUnit'] > 100:
-                flags.append({
-                    'type': 'PRICE_ANOMALY',
-                    'message': f'Price RM{batch_data["pricePerUnit"]}/kg unusually high',
-                    'severity': 'MEDIUM'
-                })
-
-        result['flags'] = flags
-
-        return jsonify(result)
+        detector = current_detector()
+        if detector is None:
+            return jsonify({'error': 'Anomaly detection model not loaded', 'model_status': model_status}), 503
+
+        batch_data = read_json()
+
+        error = validate_batch_payload(batch_data)
+        if error:
+            return jsonify({'error': error}), 400
+
+        return respond(score_cached(detector, batch_data)['anomaly'])
 
     except Exception as e:
         print(f"Error in anomaly-check: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/ml/fraud-score', methods=['POST'])
-def fraud_score():
+@app.route('/api/ml/anomaly-check/batch', methods=['POST'])
+def check_anomaly_batch():
     """
-    Calculate comprehensive fraud score for a batch
+    Check many batches in one request
 
-    Similar to anomaly-check but with more detailed factor breakdown
+    Request body: JSON array of anomaly-check payloads
+
+    Response:
+    {
+        "count": 2,
+        "errors": 1,
+        "results": [
+            {"index": 0, "batchId": "BAT-2025-001", "isAnomaly": false, ..., "flags": []},
+            {"index": 1, "batchId": "BAT-2025-002", "error": "Missing required fields: crop"}
+        ]
+    }
     """
     try:
-        if anomaly_detector is None:
-            return jsonify({'error': 'Anomaly detection model not loaded'}), 503
+        detector = current_detector()
+        if detector is None:
+            return jsonify({'error': 'Anomaly detection model not loaded', 'model_status': model_status}), 503
 
-        batch_data = request.json
+        items = read_json()
 
-        # Get anomaly prediction
-        anomaly_result = anomaly_detector.predict(batch_data)
+        if not isinstance(items, list):
+            return jsonify({'error': 'Request body must be a JSON array of batches'}), 400
 
-        # Calculate individual factor scores
-        factors = []
+        if len(items) > MAX_BATCH_ITEMS:
+            return jsonify({'error': f'Too many batches: {len(items)} (max {MAX_BATCH_ITEMS})'}), 413
 
-        # GPS factor
-        lat, lng = batch_data.get('latitude', 0), batch_data.get('longitude', 0)
-        gps_score = 0.0
-        if abs(lat) < 0.1 and abs(lng) < 0.1:
-            gps_score = 0.9
-        elif lat < 0 or lat > 8 or lng < 99 or lng > 120:  # Outside Malaysia
-            gps_score = 0.7
-        else:
-            gps_score = 0.1
+        # Score every valid item in a single vectorized pass
+        results = [
+            result if 'error' in result else result['anomaly']
+            for result in score_many(detector, items, g.timings)
+        ]
 
-        factors.append({
-            'factor': 'gps_location',
-            'score': gps_score,
-            'status': 'SUSPICIOUS' if gps_score > 0.5 else 'NORMAL'
+        for i, result in enumerate(results):
+            result['index'] = i
+            if isinstance(items[i], dict) and 'batchId' in items[i]:
+                result['batchId'] = items[i]['batchId']
+
+        return respond({
+            'count': len(results),
+            'errors': sum(1 for r in results if 'error' in r),
+            'results': results
         })
 
-        # Price factor
-        price = batch_data.get('pricePerUnit', 0)
-        price_score = 0.1 if 1 < price < 50 else 0.6
+    except Exception as e:
+        print(f"Error in anomaly-check/batch: {str(e)}")
+        return jsonify({'error': str(e)}), 500
 
-        factors.append({
-            'factor': 'pricing',
-            'score': price_score,
-            'status': 'SUSPICIOUS' if price_score > 0.5 else 'NORMAL'
-        })
+@app.route('/api/ml/score', methods=['POST'])
+def score():
+    """
+    Anomaly result, flags, factor breakdown and fraud score in one call
 
-        # Weather factor
-        temp = batch_data.get('temperature', 28)
-        weather_score = 0.1 if 20 < temp < 36 else 0.7
+    Request body: same payload as anomaly-check
 
-        factors.append({
-            'factor': 'weather_conditions',
-            'score': weather_score,
-            'status': 'SUSPICIOUS' if weather_score > 0.5 else 'NORMAL'
-        })
+    Response:
+    {
+        "anomaly": { ... anomaly-check response ... },
+        "fraud": { ... fraud-score response ... }
+    }
+    """
+    try:
+        detector = current_detector()
+        if detector is None:
+            return jsonify({'error': 'Anomaly detection model not loaded', 'model_status': model_status}), 503
 
-        # Combined fraud score (weighted average)
-        fraud_score = (
-            anomaly_result['anomalyScore'] * 0.5 +
-            gps_score * 0.2 +
-            price_score * 0.2 +
-            weather_score * 0.1
-        )
-
-        return jsonify({
-            'fraudScore': float(fraud_score),
-            'riskLevel': anomaly_result['riskLevel'],
-            'factors': factors,
-            'recommendation': 'BLOCK' if fraud_score > 0.8 else 'REVIEW' if fraud_score > 0.6 else 'APPROVE'
-        })
+        batch_data = read_json()
+
+        error = validate_batch_payload(batch_data)
+        if error:
+            return jsonify({'error': error}), 400
+
+        return respond(score_cached(detector, batch_data))
+
+    except Exception as e:
+        print(f"Error in score: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/ml/fraud-score', methods=['POST'])
+def fraud_score():
+    """
+    Calculate comprehensive fraud score for a batch
+
+    Similar to anomaly-check but with more detailed factor breakdown
+    """
+    try:
+        detector = current_detector()
+        if detector is None:
+            return jsonify({'error': 'Anomaly detection model not loaded', 'model_status': model_status}), 503
+
+        batch_data = read_json()
+
+        error = validate_batch_payload(batch_data)
+        if error:
+            return jsonify({'error': error}), 400
+
+        return respond(score_cached(detector, batch_data)['fraud'])
 
     except Exception as e:
         print(f"Error in fraud-score: {str(e)}")
@@ -215,17 +524,19 @@ def fraud_score():
 @app.route('/api/ml/batch-stats', methods=['GET'])
 def batch_stats():
     """Get model statistics"""
-    if anomaly_detector is None:
+    detector = anomaly_detector
+    if detector is None:
         return jsonify({'error': 'Model not loaded'}), 503
 
     return jsonify({
         'model': 'Isolation Forest',
-        'contamination': anomaly_detector.contamination,
-        'features_used': len(anomaly_detector.all_features),
+        'modelVersion': detector.model_version,
+        'contamination': detector.contamination,
+        'features_used': len(detector.all_features),
         'feature_types': {
-            'numeric': len(anomaly_detector.numeric_features),
-            'categorical': len(anomaly_detector.categorical_features),
-            'engineered': len(anomaly_detector.engineered_features)
+            'numeric': len(detector.numeric_features),
+            'categorical': len(detector.categorical_features),
+            'engineered': len(detector.engineered_features)
         }
     })
 
@@ -236,8 +547,13 @@ if __name__ == '__main__':
     print("\n📡 Endpoints available:")
     print("   GET  /health                    - Health check")
     print("   POST /api/ml/anomaly-check      - Check if batch is anomalous")
+    print("   POST /api/ml/anomaly-check/batch - Check many batches in one call")
     print("   POST /api/ml/fraud-score        - Calculate fraud risk score")
+    print("   POST /api/ml/score              - Anomaly check + fraud score in one call")
     print("   GET  /api/ml/batch-stats        - Get model statistics")
+    print("   GET  /api/ml/cache-stats        - Scoring cache counters")
+    print("   GET  /api/ml/microbatch-stats   - Micro-batching flush/wait stats")
+    print("   GET  /metrics                   - Prometheus metrics")
     print("\n🌐 Starting Flask server on http://0.0.0.0:5000")
     print("=" * 70 + "\n")
 
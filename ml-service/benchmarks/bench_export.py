@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+Training-data export benchmark against a seeded local PostgreSQL
+
+Seeds synthetic batches, each with several processing records and quality
+tests, into a scratch schema of the database in DATABASE_URL. It then
+times the export paths:
+
+    legacy      the export query before pre-aggregation (joins processing
+                records and quality tests, then GROUP BY ~30 columns),
+                read with pandas.read_sql_query
+    read_sql    the current query, read with pandas.read_sql_query
+    cursor      data_export.py --format parquet (named cursor)
+    copy        data_export.py --format parquet --method copy, on one
+                connection and on --workers connections
+
+It also reports server-side execution time (EXPLAIN ANALYZE) of both
+queries, and checks that both return the same batches and values apart
+from the processing/quality-test counts the legacy join inflates.
+
+The public tables are only read for their definitions; the scratch schema
+is dropped afterwards unless --keep is given.
+
+Usage:
+    DATABASE_URL=postgresql://localhost/supply_chain_dev python benchmarks/bench_export.py --rows 100000
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(SERVICE_DIR)
+
+import numpy as np
+import pandas as pd
+import warnings
+
+SCHEMA = 'ml_export_bench'
+TABLES = ['farm_locations', 'farmer_profiles', 'batches', 'processing_records', 'quality_tests']
+
+# The export query before per-batch pre-aggregation, kept as the baseline
+LEGACY_QUERY = """
+    SELECT
+        b."batchId", b."productType" as crop, b."cropType", b.quantity, b.unit,
+        b."qualityGrade", b."pricePerUnit", b.currency, b."totalBatchValue",
+        b."moistureContent", b."proteinContent", b.certifications, b.status, b."harvestDate",
+        EXTRACT(MONTH FROM b."harvestDate") as harvest_month,
+        EXTRACT(YEAR FROM b."harvestDate") as harvest_year,
+        EXTRACT(DOY FROM b."harvestDate") as harvest_day_of_year,
+        fl.latitude, fl.longitude, fl.temperature, fl.humidity, fl."weather_main", fl."weather_desc",
+        fl."soilType", fl."soilPh", fl.elevation,
+        fp."farmingType", fp."primaryCrops", fp.certifications as farmer_certifications, fp."farmSize",
+        b."cultivationMethod", b."irrigationMethod", b.fertilizers, b.pesticides,
+        COUNT(pr.id) as processing_count,
+        AVG(pr."outputQuantity"::float / NULLIF(pr."inputQuantity"::float, 0)) as avg_yield_ratio,
+        COUNT(qt.id) as quality_test_count,
+        STRING_AGG(DISTINCT qt."passFailStatus", ', ') as quality_test_results,
+        b."createdAt"
+    FROM batches b
+    LEFT JOIN farm_locations fl ON b."farmLocationId" = fl.id
+    LEFT JOIN farmer_profiles fp ON b."farmerId" = fp.id
+    LEFT JOIN processing_records pr ON b.id = pr."batchId"
+    LEFT JOIN quality_tests qt ON b.id = qt."batchId"
+    WHERE b.status NOT IN ('RECALLED')
+    GROUP BY
+        b.id, b."batchId", b."productType", b."cropType", b.quantity, b.unit,
+        b."qualityGrade", b."pricePerUnit", b.currency, b."totalBatchValue",
+        b."moistureContent", b."proteinContent", b.certifications, b.status,
+        b."harvestDate", b."cultivationMethod", b."irrigationMethod",
+        b.fertilizers, b.pesticides, b."createdAt",
+        fl.latitude, fl.longitude, fl.temperature, fl.humidity,
+        fl."weather_main", fl."weather_desc", fl."soilType", fl."soilPh", fl.elevation,
+        fp."farmingType", fp."primaryCrops", fp.certifications, fp."farmSize"
+    ORDER BY b."createdAt" DESC
+"""
+
+
+def pg_array(value):
+    """JSON list text -> PostgreSQL array literal for COPY FROM"""
+    items = json.loads(value) if isinstance(value, str) and value.startswith('[') else []
+    quoted = ('"' + str(item).replace('\\', '\\\\').replace('"', '\\"') + '"' for item in items)
+    return '{' + ','.join(quoted) + '}'
+
+
+def copy_in(cursor, table, df):
+    buffer = io.StringIO()
+    df.to_csv(buffer, index=False, header=False)
+    buffer.seek(0)
+    columns = ', '.join(f'"{column}"' for column in df.columns)
+    cursor.copy_expert(f'COPY {SCHEMA}.{table} ({columns}) FROM STDIN WITH (FORMAT csv)', buffer)
+
+
+def seed(conn, rows, seed_value):
+    """Create the scratch schema and fill it with synthetic batches"""
+    from utils.generate_synthetic_data import generate_synthetic_dataset
+
+    np.random.seed(seed_value)
+    base_rows = min(rows, 20000)
+    with contextlib.redirect_stdout(io.StringIO()):
+        base = generate_synthetic_dataset(n_normal=int(base_rows * 0.85), n_anomalous=base_rows - int(base_rows * 0.85))
+    df = base.iloc[np.arange(rows) % len(base)].reset_index(drop=True)
+    rng = np.random.default_rng(seed_value)
+    ids = np.arange(rows).astype(str)
+    created = pd.Timestamp('2024-01-01') + pd.to_timedelta(np.arange(rows) * 60, unit='s')
+
+    with conn.cursor() as cursor:
+        cursor.execute(f'DROP SCHEMA IF EXISTS {SCHEMA} CASCADE')
+        cursor.execute(f'CREATE SCHEMA {SCHEMA}')
+        for table in TABLES:
+            cursor.execute(f'CREATE TABLE {SCHEMA}.{table} (LIKE public.{table} INCLUDING ALL)')
+
+        copy_in(cursor, 'farm_locations', pd.DataFrame({
+            'id': 'fl' + ids, 'farmerId': 'fp' + ids, 'farmName': 'Farm ' + ids,
+            'latitude': df['latitude'], 'longitude': df['longitude'], 'elevation': df['elevation'],
+            'soilType': df['soilType'], 'soilPh': df['soilPh'], 'humidity': df['humidity'],
+            'temperature': df['temperature'], 'weather_main': df['weather_main'],
+            'weather_desc': df['weather_desc']
+        }))
+        copy_in(cursor, 'farmer_profiles', pd.DataFrame({
+            'id': 'fp' + ids, 'userId': 'u' + ids, 'firstName': 'Bench', 'lastName': ids,
+            'farmName': 'Farm ' + ids, 'farmSize': df['farmSize'],
+            'farmingType': df['farmingType'].map(pg_array), 'primaryCrops': df['primaryCrops'].map(pg_array),
+            'certifications': df['farmer_certifications'].map(pg_array)
+        }))
+        copy_in(cursor, 'batches', pd.DataFrame({
+            'id': 'b' + ids, 'batchId': 'BENCH-' + ids, 'farmerId': 'fp' + ids, 'farmLocationId': 'fl' + ids,
+            'productType': df['crop'], 'cropType': df['cropType'], 'quantity': df['quantity'],
+            'unit': df['unit'], 'harvestDate': df['harvestDate'], 'status': df['status'],
+            'cultivationMethod': df['cultivationMethod'], 'irrigationMethod': df['irrigationMethod'],
+            'fertilizers': df['fertilizers'].map(pg_array), 'pesticides': df['pesticides'].map(pg_array),
+            'qualityGrade': df['qualityGrade'], 'moistureContent': df['moistureContent'],
+            'proteinContent': df['proteinContent'], 'pricePerUnit': df['pricePerUnit'],
+            'currency': df['currency'], 'totalBatchValue': df['totalBatchValue'],
+            'certifications': df['certifications'].map(pg_array), 'createdAt': created, 'updatedAt': created
+        }))
+
+        # 0-3 processing records and 0-4 quality tests per batch
+        processing = np.repeat(np.arange(rows), rng.integers(0, 4, rows))
+        copy_in(cursor, 'processing_records', pd.DataFrame({
+            'id': 'pr' + np.arange(len(processing)).astype(str), 'batchId': 'b' + processing.astype(str),
+            'processorId': 'p1', 'facilityId': 'f1', 'processingDate': created[processing],
+            'processingType': 'drying', 'inputQuantity': 100.0,
+            'outputQuantity': rng.uniform(60, 100, len(processing)).round(2)
+        }))
+        tests = np.repeat(np.arange(rows), rng.integers(0, 5, rows))
+        copy_in(cursor, 'quality_tests', pd.DataFrame({
+            'id': 'qt' + np.arange(len(tests)).astype(str), 'batchId': 'b' + tests.astype(str),
+            'testType': 'moisture', 'testDate': created[tests], 'testingLab': 'Lab', 'testResults': '{}',
+            'passFailStatus': rng.choice(['PASS', 'FAIL'], len(tests), p=[0.9, 0.1])
+        }))
+
+        for table in TABLES:
+            cursor.execute(f'ANALYZE {SCHEMA}.{table}')
+    conn.commit()
+    return {'batches': rows, 'processing_records': len(processing), 'quality_tests': len(tests)}
+
+
+def execution_ms(conn, query, params=None):
+    """Server-side execution time of a query (EXPLAIN ANALYZE)"""
+    with conn.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (ANALYZE, FORMAT JSON) {query}", params)
+        return cursor.fetchone()[0][0]['Execution Time']
+
+
+def median_seconds(fn, repeats):
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            fn()
+        samples.append(time.perf_counter() - start)
+    return float(np.median(samples))
+
+
+def compare(legacy, current):
+    """Differences between the legacy and current exports, by batchId"""
+    legacy = legacy.set_index('batchId').sort_index()
+    current = current.set_index('batchId').sort_index()
+    counts = ['processing_count', 'quality_test_count']
+    same_values = all(
+        ((legacy[col] == current[col]) | (legacy[col].isna() & current[col].isna())).all()
+        for col in legacy.columns if col not in counts + ['avg_yield_ratio']
+    )
+    return {
+        'same_batches': bool(legacy.index.equals(current.index)),
+        'same_values_except_counts': bool(same_values),
+        'avg_yield_ratio_max_diff': float((legacy['avg_yield_ratio'] - current['avg_yield_ratio']).abs().max()),
+        'inflated_count_batches': int(
+            ((legacy['processing_count'] != current['processing_count'])
+             | (legacy['quality_test_count'] != current['quality_test_count'])).sum()
+        )
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Training data export benchmark (needs DATABASE_URL)')
+    parser.add_argument('--rows', type=int, default=100000, help='Synthetic batches to seed')
+    parser.add_argument('--workers', type=int, default=4, help='Parallel connections for the copy path')
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--reuse', action='store_true', help='Reuse an existing scratch schema')
+    parser.add_argument('--keep', action='store_true', help='Keep the scratch schema afterwards')
+    parser.add_argument('--output', default='bench_export.json', help='Where to write the results')
+    args = parser.parse_args()
+
+    # Every connection the exporters open resolves tables in the scratch schema
+    os.environ['PGOPTIONS'] = f'-c search_path={SCHEMA},public'
+    from utils import data_export
+    warnings.filterwarnings('ignore', message='pandas only supports SQLAlchemy')
+
+    conn = data_export.get_db_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute('SHOW server_version')
+            server_version = cursor.fetchone()[0]
+            cursor.execute("SELECT to_regclass(%s)", (f'{SCHEMA}.batches',))
+            exists = cursor.fetchone()[0] is not None
+
+        if args.reuse and exists:
+            with conn.cursor() as cursor:
+                cursor.execute('SELECT (SELECT count(*) FROM batches), (SELECT count(*) FROM processing_records), '
+                               '(SELECT count(*) FROM quality_tests)')
+                counts = dict(zip(['batches', 'processing_records', 'quality_tests'], cursor.fetchone()))
+            print(f"♻️  Reusing {SCHEMA}: {counts}")
+        else:
+            print(f"🌱 Seeding {args.rows} batches into {SCHEMA}...")
+            start = time.perf_counter()
+            counts = seed(conn, args.rows, args.seed)
+            print(f"   {counts} in {time.perf_counter() - start:.1f}s")
+
+        current_query, current_params = data_export.batch_query()
+        print("\n⏱️  Server-side execution (EXPLAIN ANALYZE)")
+        server = {
+            'legacy_ms': execution_ms(conn, LEGACY_QUERY),
+            'current_ms': execution_ms(conn, current_query, current_params)
+        }
+        print(f"   legacy   {server['legacy_ms']:>10.1f} ms")
+        print(f"   current  {server['current_ms']:>10.1f} ms")
+
+        results = {'server': server, 'client': {}}
+
+        def read_legacy():
+            return pd.read_sql_query(LEGACY_QUERY, conn)
+
+        with tempfile.TemporaryDirectory() as directory:
+            paths = {name: os.path.join(directory, f'{name}.parquet') for name in ('cursor', 'copy')}
+            methods = {
+                'legacy': read_legacy,
+                'read_sql': data_export.export_batch_data,
+                'cursor': lambda: data_export.stream_batch_data(paths['cursor']),
+                'copy_1': lambda: data_export.copy_batch_data(paths['copy'], workers=1),
+                f'copy_{args.workers}': lambda: data_export.copy_batch_data(paths['copy'], workers=args.workers)
+            }
+
+            print(f"\n⏱️  End-to-end export, median of {args.repeats} ({counts['batches']} batches)")
+            for name, fn in methods.items():
+                seconds = median_seconds(fn, args.repeats)
+                results['client'][name] = {'seconds': seconds, 'rows_per_second': counts['batches'] / seconds}
+                print(f"   {name:<10} {seconds:>8.2f} s {counts['batches'] / seconds:>12,.0f} rows/s")
+
+            with contextlib.redirect_stdout(io.StringIO()):
+                legacy = read_legacy()
+            current = pd.read_parquet(paths['copy'])
+            current['certifications'] = current['certifications'].map(json.loads)
+            for col in ('farmingType', 'primaryCrops', 'farmer_certifications', 'fertilizers', 'pesticides'):
+                current[col] = current[col].map(json.loads)
+            legacy['harvestDate'] = legacy['harvestDate'].astype('datetime64[ms]')
+            legacy['createdAt'] = legacy['createdAt'].astype('datetime64[ms]')
+            results['check'] = compare(legacy, current)
+    finally:
+        if not args.keep:
+            with conn.cursor() as cursor:
+                cursor.execute(f'DROP SCHEMA IF EXISTS {SCHEMA} CASCADE')
+            conn.commit()
+        conn.close()
+
+    check = results['check']
+    print(f"\n🔍 Legacy vs copy export: same batches {check['same_batches']}, "
+          f"same values apart from counts {check['same_values_except_counts']}, "
+          f"{check['inflated_count_batches']} batches with inflated legacy counts")
+
+    report = {
+        'environment': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'postgres': server_version,
+            'cpu_count': os.cpu_count()
+        },
+        'parameters': {key: value for key, value in vars(args).items() if key != 'output'},
+        'seeded': counts,
+        'results': results
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2, default=str)
+    print(f"\n💾 Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Parity check and scaling benchmark for AnomalyDetector.engineer_features
+
+Compares the vectorized feature engine against the original row-wise
+implementation and times it from 1k up to 1M rows.
+
+distance_from_region_center deliberately changed: the original scaled a
+planar distance in degrees by 111 km, the vectorized engine computes a
+haversine distance. That column is checked against a row-wise haversine
+instead, and the shift from the original is reported. Models trained
+before the change must be retrained.
+
+Usage:
+    python benchmarks/bench_feature_engineering.py
+    python benchmarks/bench_feature_engineering.py --sizes 1000 10000 --legacy-max 10000
+"""
+
+import argparse
+import contextlib
+import io
+import math
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from models.anomaly_detector import AnomalyDetector
+from models.inference import EARTH_RADIUS_KM
+from utils.generate_synthetic_data import generate_synthetic_dataset
+
+
+def legacy_engineer_features(detector, df):
+    """Original row-wise implementation, kept as the parity reference"""
+    df = df.copy()
+
+    # 1. Distance from regional centers (detect GPS spoofing)
+    def calculate_min_distance_to_regions(row):
+        lat, lng = row['latitude'], row['longitude']
+        min_dist = float('inf')
+
+        for region, (center_lat, center_lng) in detector.region_centers.items():
+            # Haversine-like distance (simplified)
+            dist = np.sqrt((lat - center_lat)**2 + (lng - center_lng)**2) * 111  # Convert to km
+            min_dist = min(min_dist, dist)
+
+        return min_dist
+
+    df['distance_from_region_center'] = df.apply(calculate_min_distance_to_regions, axis=1)
+
+    # 2. Price deviation from median per crop type (detect price manipulation)
+    median_prices = df.groupby('crop')['pricePerUnit'].transform('median')
+    df['price_deviation_from_median'] = abs(df['pricePerUnit'] - median_prices) / (median_prices + 0.01)
+
+    # 3. Quantity deviation (detect impossible quantities)
+    median_quantity = df.groupby('crop')['quantity'].transform('median')
+    df['quantity_deviation'] = abs(df['quantity'] - median_quantity) / (median_quantity + 0.01)
+
+    # 4. Temperature anomaly score (detect weather inconsistencies)
+    # Malaysia typical temp range: 23-35°C
+    df['temp_anomaly_score'] = df['temperature'].apply(
+        lambda x: 0 if 23 <= x <= 35 else abs(x - 29) / 10
+    )
+
+    # 5. Moisture anomaly score (detect impossible moisture values)
+    # Typical range: 0-100%
+    df['moisture_anomaly_score'] = df['moistureContent'].apply(
+        lambda x: 0 if 0 <= x <= 100 else abs(x - 50) / 50
+    )
+
+    return df
+
+
+def haversine_min_distance(detector, df):
+    """Row-wise great-circle distance to the nearest region center, in km"""
+    def min_distance(row):
+        lat, lng = math.radians(row['latitude']), math.radians(row['longitude'])
+        min_dist = float('inf')
+
+        for center_lat, center_lng in detector.region_centers.values():
+            c_lat, c_lng = math.radians(center_lat), math.radians(center_lng)
+            a = (math.sin((lat - c_lat) / 2) ** 2
+                 + math.cos(lat) * math.cos(c_lat) * math.sin((lng - c_lng) / 2) ** 2)
+            dist = 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(max(a, 0.0), 1.0)))
+            min_dist = min(min_dist, dist)
+
+        return min_dist
+
+    return df.apply(min_distance, axis=1).to_numpy(dtype=float)
+
+
+def build_frame(n_rows, base):
+    """Resample the synthetic base dataset up to n_rows"""
+    return base.sample(n=n_rows, replace=True, random_state=42).reset_index(drop=True)
+
+
+def time_call(fn, repeats):
+    """Best-of-N wall clock time in seconds"""
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def same(actual, expected):
+    return np.allclose(np.asarray(actual, dtype=float), np.asarray(expected, dtype=float),
+                       rtol=1e-12, atol=1e-9, equal_nan=True)
+
+
+def check_parity(detector, df):
+    """
+    Compare vectorized output against the original row-wise reference
+
+    Returns:
+        Tuple of (mismatching columns, distance_from_region_center minus
+        the original's, in km)
+    """
+    expected = legacy_engineer_features(detector, df)
+    actual = detector.engineer_features(df)
+
+    mismatches = []
+    for col in detector.engineered_features:
+        if col == 'distance_from_region_center':
+            reference = haversine_min_distance(detector, df)
+        else:
+            reference = expected[col]
+        if not same(actual[col], reference):
+            mismatches.append(col)
+
+    shift = (actual['distance_from_region_center'].to_numpy(dtype=float)
+             - expected['distance_from_region_center'].to_numpy(dtype=float))
+    return mismatches, shift[np.isfinite(shift)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='engineer_features parity and scaling benchmark')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 10_000, 100_000, 1_000_000])
+    parser.add_argument('--legacy-max', type=int, default=100_000,
+                        help='Largest size at which the row-wise reference is also timed')
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        base = generate_synthetic_dataset(n_normal=850, n_anomalous=150)
+
+    detector = AnomalyDetector()
+
+    print("🔍 Parity check against the original row-wise implementation...")
+    mismatches, shift = check_parity(detector, build_frame(5_000, base))
+    if mismatches:
+        print(f"❌ Mismatch in: {', '.join(mismatches)}")
+        sys.exit(1)
+    print("✅ All engineered features match (distance_from_region_center against a row-wise haversine)")
+    print(f"   distance_from_region_center vs the original: median {np.median(np.abs(shift)):.2f} km, "
+          f"max {np.max(np.abs(shift)):.2f} km apart; retrain models trained before the haversine switch")
+
+    print(f"\n⏱️  {'rows':>10} {'vectorized (s)':>16} {'row-wise (s)':>14} {'speedup':>9}")
+    for n_rows in args.sizes:
+        df = build_frame(n_rows, base)
+        vectorized = time_call(lambda: detector.engineer_features(df), args.repeats)
+
+        if n_rows <= args.legacy_max:
+            legacy = time_call(lambda: legacy_engineer_features(detector, df), 1)
+            print(f"   {n_rows:>10} {vectorized:>16.4f} {legacy:>14.4f} {legacy / vectorized:>8.1f}x")
+        else:
+            print(f"   {n_rows:>10} {vectorized:>16.4f} {'-':>14} {'-':>9}")
+
+
+if __name__ == "__main__":
+    main()
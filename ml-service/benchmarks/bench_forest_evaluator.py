@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Bit-for-bit check and timing of FlatIsolationForest against sklearn
+
+Trains a model on synthetic data, then verifies that the flattened
+evaluator (with the scaler folded into its thresholds) returns exactly the
+same values as IsolationForest.score_samples(scaler.transform(X)).
+
+Usage:
+    python benchmarks/bench_forest_evaluator.py
+"""
+
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from models.anomaly_detector import AnomalyDetector
+from models.forest_evaluator import FlatIsolationForest
+from utils.generate_synthetic_data import generate_synthetic_dataset
+
+
+def per_call_us(fn, n_calls):
+    """Mean microseconds per call"""
+    start = time.perf_counter()
+    for _ in range(n_calls):
+        fn()
+    return (time.perf_counter() - start) / n_calls * 1e6
+
+
+def main():
+    with contextlib.redirect_stdout(io.StringIO()):
+        df = generate_synthetic_dataset(n_normal=850, n_anomalous=150)
+        detector = AnomalyDetector(contamination=0.15)
+        detector.train(df)
+
+    X = detector.prepare_features(df, training=False)
+    rng = np.random.default_rng(7)
+    check_sets = {
+        'training rows': X,
+        'perturbed rows': X + rng.normal(0, 1, X.shape) * X.std(axis=0),
+        'extreme rows': rng.uniform(-1e6, 1e6, size=(5_000, X.shape[1]))
+    }
+
+    flat_forest = FlatIsolationForest.from_sklearn(detector.model, detector.scaler)
+
+    print("🔍 Bit-for-bit check against IsolationForest.score_samples...")
+    failed = False
+    for name, X_check in check_sets.items():
+        expected = detector.model.score_samples(detector.scaler.transform(X_check))
+        actual = flat_forest.score_samples(X_check)
+        identical = np.array_equal(actual, expected)
+        failed |= not identical
+        print(f"   {'✅' if identical else '❌'} {name}: {len(X_check)} samples")
+
+    if failed:
+        sys.exit(1)
+
+    x_single = X[:1]
+    X_batch = np.tile(X, (10, 1))
+
+    sklearn_single = per_call_us(
+        lambda: detector.model.score_samples(detector.scaler.transform(x_single)), 200
+    )
+    flat_single = per_call_us(lambda: flat_forest.score_samples(x_single), 2_000)
+    sklearn_batch = per_call_us(
+        lambda: detector.model.score_samples(detector.scaler.transform(X_batch)), 5
+    )
+    flat_batch = per_call_us(lambda: flat_forest.score_samples(X_batch), 5)
+
+    print(f"\n⏱️  {'case':<22} {'sklearn (us)':>14} {'flattened (us)':>16}")
+    print(f"   {'1 sample':<22} {sklearn_single:>14.1f} {flat_single:>16.1f}")
+    print(f"   {f'{len(X_batch)} samples':<22} {sklearn_batch:>14.1f} {flat_batch:>16.1f}")
+
+
+if __name__ == "__main__":
+    main()
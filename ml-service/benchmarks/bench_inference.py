@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+Inference benchmark suite for the anomaly detector
+
+Trains a model on synthetic data, then measures single-record predict
+latency, batch scoring throughput, feature engineering cost as the row
+count grows and model load time. Results are written to a JSON file;
+pass an earlier file as --baseline to flag regressions.
+
+Usage:
+    python benchmarks/bench_inference.py
+    python benchmarks/bench_inference.py --output after.json --baseline before.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(SERVICE_DIR)
+
+import numpy as np
+import pandas as pd
+import sklearn
+
+from models.anomaly_detector import AnomalyDetector
+from models.inference import load_model
+from utils.generate_synthetic_data import generate_synthetic_dataset
+
+# Fields a client sends to /api/ml/anomaly-check
+RECORD_FIELDS = [
+    'crop', 'quantity', 'pricePerUnit', 'latitude', 'longitude', 'temperature',
+    'humidity', 'moistureContent', 'qualityGrade', 'weather_main'
+]
+
+# Metric name suffix -> True if higher is better
+DIRECTIONS = {'_rows_per_second': True, '_ms': False}
+
+
+def percentiles_ms(samples):
+    """Latency summary of a list of seconds, in milliseconds"""
+    values = np.asarray(samples) * 1000
+    return {
+        'p50_ms': float(np.percentile(values, 50)),
+        'p90_ms': float(np.percentile(values, 90)),
+        'p99_ms': float(np.percentile(values, 99)),
+        'mean_ms': float(values.mean()),
+        'max_ms': float(values.max())
+    }
+
+
+def median_time(fn, repeats):
+    """Median wall clock seconds of repeated calls"""
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return float(np.median(samples))
+
+
+def to_records(df):
+    """Request payloads built from synthetic rows"""
+    records = df[RECORD_FIELDS].to_dict('records')
+    for record in records:
+        for field, value in record.items():
+            if isinstance(value, float) and np.isnan(value):
+                record[field] = 0.0
+    return records
+
+
+def resample(df, n_rows, seed):
+    return df.sample(n=n_rows, replace=True, random_state=seed).reset_index(drop=True)
+
+
+def bench_single(detector, records, iterations, warmup=200):
+    """Per-call latency of predict() on one record, plus mean per-stage time"""
+    for record in records[:warmup]:
+        detector.predict(record)
+
+    samples, stage_totals = [], {}
+    for i in range(iterations):
+        record = records[i % len(records)]
+        timings = {}
+        start = time.perf_counter()
+        detector.predict(record, timings=timings)
+        samples.append(time.perf_counter() - start)
+        for stage, seconds in timings.items():
+            stage_totals[stage] = stage_totals.get(stage, 0.0) + seconds
+
+    result = percentiles_ms(samples)
+    result['iterations'] = iterations
+    result['stages_mean_ms'] = {stage: total / iterations * 1000 for stage, total in stage_totals.items()}
+    return result
+
+
+def bench_batches(detector, records, sizes, repeats):
+    """Throughput of predict_many() at each batch size"""
+    results = {}
+    for size in sizes:
+        batch = [records[i % len(records)] for i in range(size)]
+        detector.predict_many(batch)
+        seconds = median_time(lambda: detector.predict_many(batch), repeats)
+        results[str(size)] = {
+            'batch_ms': seconds * 1000,
+            'per_record_us': seconds / size * 1e6,
+            'rows_per_second': size / seconds
+        }
+    return results
+
+
+def bench_features(detector, df, sizes, repeats, seed):
+    """engineer_features() and prepare_features() cost as rows grow"""
+    results = {}
+    for size in sizes:
+        frame = resample(df, size, seed)
+        engineer = median_time(lambda: detector.engineer_features(frame), repeats)
+        prepare = median_time(lambda: detector.prepare_features(frame, training=False), repeats)
+        results[str(size)] = {
+            'engineer_features_ms': engineer * 1000,
+            'prepare_features_ms': prepare * 1000,
+            'prepare_rows_per_second': size / prepare
+        }
+    return results
+
+
+def bench_load(detector, directory, repeats):
+    """In-process load time of the pickle and memory-mapped formats (warm page cache)"""
+    paths = {
+        'pickle': os.path.join(directory, 'anomaly_detector.pkl'),
+        'mmap': os.path.join(directory, 'anomaly_detector.model')
+    }
+    with contextlib.redirect_stdout(io.StringIO()):
+        detector.save(paths['pickle'])
+        detector.save(paths['mmap'], format='mmap')
+
+    results = {}
+    for name, path in paths.items():
+        with contextlib.redirect_stdout(io.StringIO()):
+            seconds = median_time(lambda: load_model(path), repeats)
+        results[name] = {'load_ms': seconds * 1000}
+    return results
+
+
+def environment():
+    """Where the numbers came from"""
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=SERVICE_DIR,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'sklearn': sklearn.__version__
+    }
+
+
+def flatten(results, prefix=''):
+    """Nested results -> {'a.b.c_ms': value} for comparison"""
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, name + '.'))
+        elif isinstance(value, (int, float)):
+            flat[name] = value
+    return flat
+
+
+def compare(results, baseline, tolerance):
+    """
+    Metrics that got worse than the baseline by more than tolerance
+
+    Args:
+        results: Benchmark section of this run
+        baseline: Benchmark section of an earlier run
+        tolerance: Allowed relative slowdown (0.2 = 20%)
+
+    Returns:
+        List of (metric, baseline value, current value, relative change)
+    """
+    current, previous = flatten(results), flatten(baseline)
+    regressions = []
+
+    for name, value in current.items():
+        if name not in previous or not previous[name]:
+            continue
+        higher_is_better = next(
+            (better for suffix, better in DIRECTIONS.items() if name.endswith(suffix)), None
+        )
+        # Only tail latencies, means and throughputs are gated; max_ms is too noisy
+        if higher_is_better is None or name.endswith('max_ms'):
+            continue
+
+        change = (value - previous[name]) / previous[name]
+        if (-change if higher_is_better else change) > tolerance:
+            regressions.append((name, previous[name], value, change))
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Anomaly detector inference benchmark')
+    parser.add_argument('--rows', type=int, default=5000, help='Synthetic training rows')
+    parser.add_argument('--iterations', type=int, default=5000, help='Single-record predict calls')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 10, 100, 1000, 10000])
+    parser.add_argument('--feature-sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--repeats', type=int, default=5, help='Repeats per batch/feature/load timing')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default='bench_inference.json', help='Where to write the results')
+    parser.add_argument('--baseline', help='Earlier results file to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='Relative slowdown vs the baseline reported as a regression')
+    args = parser.parse_args()
+
+    print(f"🤖 Training on {args.rows} synthetic rows...")
+    np.random.seed(args.seed)
+    with contextlib.redirect_stdout(io.StringIO()):
+        df = generate_synthetic_dataset(n_normal=int(args.rows * 0.85), n_anomalous=int(args.rows * 0.15))
+        detector = AnomalyDetector(contamination=0.15)
+        detector.train(df)
+
+    records = to_records(resample(df, 2000, args.seed))
+    results = {}
+
+    print(f"\n⏱️  Single-record predict ({args.iterations} calls)")
+    results['single'] = bench_single(detector, records, args.iterations)
+    single = results['single']
+    print(f"   p50 {single['p50_ms']:.3f} ms   p90 {single['p90_ms']:.3f} ms   p99 {single['p99_ms']:.3f} ms")
+    for stage, ms in single['stages_mean_ms'].items():
+        print(f"   {stage:<20} {ms * 1000:>8.1f} µs")
+
+    # Same calls without topFeatures, to track what explanations cost
+    explain_top, detector.explain_top = detector.explain_top, 0
+    results['single_without_explanations'] = bench_single(detector, records, args.iterations)
+    detector.explain_top = explain_top
+    plain = results['single_without_explanations']
+    print(f"   without explanations: p50 {plain['p50_ms']:.3f} ms "
+          f"(explanations add {single['p50_ms'] / plain['p50_ms'] - 1:+.0%})")
+
+    print(f"\n⏱️  {'batch size':>10} {'batch (ms)':>12} {'µs/record':>10} {'records/s':>12}")
+    results['batch'] = bench_batches(detector, records, args.batch_sizes, args.repeats)
+    for size, row in results['batch'].items():
+        print(f"   {size:>10} {row['batch_ms']:>12.2f} {row['per_record_us']:>10.1f} {row['rows_per_second']:>12,.0f}")
+
+    print(f"\n⏱️  {'rows':>10} {'engineer (ms)':>14} {'prepare (ms)':>13} {'rows/s':>12}")
+    results['features'] = bench_features(detector, df, args.feature_sizes, args.repeats, args.seed)
+    for size, row in results['features'].items():
+        print(f"   {size:>10} {row['engineer_features_ms']:>14.1f} {row['prepare_features_ms']:>13.1f} "
+              f"{row['prepare_rows_per_second']:>12,.0f}")
+
+    print("\n⏱️  Model load (in-process, warm page cache)")
+    with tempfile.TemporaryDirectory() as directory:
+        results['load'] = bench_load(detector, directory, args.repeats)
+    for name, row in results['load'].items():
+        print(f"   {name:<8} {row['load_ms']:>8.2f} ms")
+
+    report = {
+        'environment': environment(),
+        'parameters': {key: value for key, value in vars(args).items() if key not in ('output', 'baseline')},
+        'results': results
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n💾 Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline['results'], args.tolerance)
+        print(f"\n🔍 Compared with {args.baseline} ({baseline['environment'].get('commit')}), "
+              f"tolerance {args.tolerance:.0%}")
+        if regressions:
+            for name, before, after, change in regressions:
+                print(f"   ❌ {name}: {before:.4g} -> {after:.4g} ({change:+.0%})")
+            sys.exit(1)
+        print("   ✅ No regressions")
+
+
+if __name__ == "__main__":
+    main()
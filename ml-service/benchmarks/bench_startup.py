@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark for the ML service
+
+Every measurement runs in a fresh interpreter, so nothing is already
+imported or cached in-process. Reports import time of the scoring modules
+and of app.py, and time-to-first-prediction for the pickle and the
+memory-mapped model formats.
+
+With --workers (Linux), also starts serve.py on a model registry and
+reports the workers' memory right after startup and again after a hot
+swap to a newly published version. Startup alone flatters the pickle:
+workers share the master's copy until the first swap, after which each
+one unpickles a private copy; mapped versions stay shared.
+
+Usage:
+    python benchmarks/bench_startup.py --repeats 5
+    python benchmarks/bench_startup.py --workers 4
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(SERVICE_DIR)
+
+# Timed in the child process; prints one JSON line
+IMPORT_SNIPPET = """
+import json, sys, time
+sys.path.insert(0, {service_dir!r})
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+heavy = [m for m in ('pandas', 'sklearn', 'sklearn.model_selection', 'sklearn.metrics') if m in sys.modules]
+print(json.dumps({{'seconds': elapsed, 'heavy': heavy}}))
+"""
+
+FIRST_PREDICTION_SNIPPET = """
+import contextlib, io, json, sys, time
+sys.path.insert(0, {service_dir!r})
+start = time.perf_counter()
+from models.inference import load_model
+with contextlib.redirect_stdout(io.StringIO()):
+    model = load_model({model_path!r})
+loaded = time.perf_counter()
+model.predict({record!r})
+done = time.perf_counter()
+print(json.dumps({{'load': loaded - start, 'first_prediction': done - start}}))
+"""
+
+APP_READY_SNIPPET = """
+import contextlib, io, json, os, sys, time
+sys.path.insert(0, {service_dir!r})
+os.environ['ML_MODEL_PATH'] = {model_path!r}
+start = time.perf_counter()
+with contextlib.redirect_stdout(io.StringIO()):
+    import app
+imported = time.perf_counter()
+health = app.app.test_client().get('/health').get_json()
+answered = time.perf_counter()
+app.model_loaded.wait()
+ready = time.perf_counter()
+print(json.dumps({{'import': imported - start, 'health': answered - start,
+                   'health_status': health['status'], 'ready': ready - start}}))
+"""
+
+SAMPLE_RECORD = {
+    'crop': 'Rice', 'quantity': 1000, 'pricePerUnit': 3.5,
+    'latitude': 3.1234, 'longitude': 101.5678, 'temperature': 28.5,
+    'humidity': 75.0, 'moistureContent': 14.0, 'qualityGrade': 'A',
+    'weather_main': 'Clear'
+}
+
+
+def run_child(snippet, **params):
+    """Run a snippet in a fresh interpreter and parse its JSON result line"""
+    code = snippet.format(service_dir=SERVICE_DIR, **params)
+    output = subprocess.run(
+        [sys.executable, '-c', code], check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def median_of(results, key):
+    values = sorted(r[key] for r in results)
+    return values[len(values) // 2]
+
+
+def train_detector(n_rows):
+    """Train a detector on synthetic data"""
+    from models.anomaly_detector import AnomalyDetector
+    from utils.generate_synthetic_data import generate_synthetic_dataset
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        df = generate_synthetic_dataset(n_normal=int(n_rows * 0.85), n_anomalous=int(n_rows * 0.15))
+        detector = AnomalyDetector(contamination=0.15)
+        detector.train(df)
+    return detector
+
+
+def build_models(directory, n_rows):
+    """Train a synthetic model and save it in both formats"""
+    detector = train_detector(n_rows)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        pickle_path = os.path.join(directory, 'anomaly_detector.pkl')
+        mapped_path = os.path.join(directory, 'anomaly_detector.model')
+        detector.save(pickle_path)
+        detector.save(mapped_path, format='mmap')
+
+    return {'pickle': pickle_path, 'mmap': mapped_path}
+
+
+def worker_memory(master_pid):
+    """
+    Memory of a pre-fork master's workers, from /proc/<pid>/smaps_rollup
+
+    Returns:
+        Dictionary with worker count and summed private and proportional
+        (Pss) kB
+    """
+    with open(f'/proc/{master_pid}/task/{master_pid}/children') as f:
+        pids = f.read().split()
+
+    totals = {'workers': len(pids), 'private': 0, 'pss': 0}
+    for pid in pids:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            for line in f:
+                field, value = line.split()[:2]
+                if field in ('Private_Clean:', 'Private_Dirty:'):
+                    totals['private'] += int(value)
+                elif field == 'Pss:':
+                    totals['pss'] += int(value)
+    return totals
+
+
+def wait_for_version(port, version, workers, timeout=60):
+    """Poll /health until enough consecutive answers report the version"""
+    deadline = time.monotonic() + timeout
+    streak = 0
+    while streak < workers * 4:
+        if time.monotonic() > deadline:
+            raise TimeoutError(f'Workers did not switch to {version}')
+        with urllib.request.urlopen(f'http://127.0.0.1:{port}/health') as response:
+            health = json.load(response)
+        streak = streak + 1 if health['model_version'] == version else 0
+        time.sleep(0.05)
+
+
+def swap_memory(directory, n_rows, workers, port, mapped):
+    """
+    Serve a registry with serve.py, publish a second version and measure
+    worker memory before and after the hot swap
+    """
+    from models.registry import ModelRegistry
+
+    registry_dir = os.path.join(directory, 'registry-mmap' if mapped else 'registry-pickle')
+    ready_file = os.path.join(directory, 'ready')
+    registry = ModelRegistry(registry_dir)
+    with contextlib.redirect_stdout(io.StringIO()):
+        first = registry.publish(train_detector(n_rows), mapped=mapped)
+    second_detector = train_detector(n_rows)
+
+    env = dict(os.environ, ML_MODEL_REGISTRY=registry_dir, ML_REGISTRY_POLL_SECONDS='0.5')
+    server = subprocess.Popen(
+        [sys.executable, 'serve.py', '--workers', str(workers), '--threads', '2',
+         '--port', str(port), '--ready-file', ready_file],
+        cwd=SERVICE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        deadline = time.monotonic() + 60
+        while not os.path.exists(ready_file):
+            if server.poll() is not None or time.monotonic() > deadline:
+                raise RuntimeError('serve.py did not become ready')
+            time.sleep(0.1)
+        wait_for_version(port, first['version'], workers)
+        before = worker_memory(server.pid)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            second = registry.publish(second_detector, mapped=mapped)
+        wait_for_version(port, second['version'], workers)
+        time.sleep(1)
+        after = worker_memory(server.pid)
+    finally:
+        server.terminate()
+        server.wait(30)
+
+    return before, after
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ML service cold-start benchmark')
+    parser.add_argument('--repeats', type=int, default=5, help='Fresh interpreters per measurement')
+    parser.add_argument('--rows', type=int, default=5000, help='Synthetic training rows')
+    parser.add_argument('--workers', type=int, default=0,
+                        help='Also measure serve.py worker memory across a hot swap (0 = skip)')
+    parser.add_argument('--port', type=int, default=5099, help='Port for the --workers measurement')
+    args = parser.parse_args()
+
+    print("⏱️  Import time (fresh interpreter, median of "
+          f"{args.repeats}):")
+    for module in ['models.inference', 'models.anomaly_detector', 'app']:
+        results = [run_child(IMPORT_SNIPPET, module=module) for _ in range(args.repeats)]
+        heavy = ', '.join(results[0]['heavy']) or 'none'
+        print(f"   {module:<26} {median_of(results, 'seconds') * 1000:>8.1f} ms   heavy modules: {heavy}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        print(f"\n🤖 Training synthetic model on {args.rows} rows...")
+        models = build_models(directory, args.rows)
+
+        print(f"\n⏱️  {'format':<8} {'load (ms)':>12} {'first prediction (ms)':>24}")
+        for name, path in models.items():
+            results = [
+                run_child(FIRST_PREDICTION_SNIPPET, model_path=path, record=SAMPLE_RECORD)
+                for _ in range(args.repeats)
+            ]
+            print(f"   {name:<8} {median_of(results, 'load') * 1000:>12.1f} "
+                  f"{median_of(results, 'first_prediction') * 1000:>24.1f}")
+
+        print(f"\n⏱️  {'app.py':<8} {'import (ms)':>12} {'/health (ms)':>14} {'model ready (ms)':>18}")
+        for name, path in models.items():
+            results = [run_child(APP_READY_SNIPPET, model_path=path) for _ in range(args.repeats)]
+            print(f"   {name:<8} {median_of(results, 'import') * 1000:>12.1f} "
+                  f"{median_of(results, 'health') * 1000:>14.1f} {median_of(results, 'ready') * 1000:>18.1f}"
+                  f"   (/health said '{results[0]['health_status']}')")
+
+        if args.workers:
+            print(f"\n🧠 serve.py, {args.workers} workers, summed worker memory (MB):")
+            print(f"   {'format':<8} {'private':>9} {'Pss':>9}   {'after swap: private':>20} {'Pss':>9}")
+            for name, mapped in [('pickle', False), ('mmap', True)]:
+                before, after = swap_memory(directory, args.rows, args.workers, args.port, mapped)
+                print(f"   {name:<8} {before['private'] / 1024:>9.1f} {before['pss'] / 1024:>9.1f}   "
+                      f"{after['private'] / 1024:>20.1f} {after['pss'] / 1024:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
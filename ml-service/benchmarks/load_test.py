@@ -0,0 +1,468 @@
+#!/usr/bin/env python3
+"""
+HTTP load test for the ML service
+
+Starts the service locally (Flask development server, serve.py, or
+serve.py with micro-batching), replays synthetic batch payloads against
+/api/ml/anomaly-check and /api/ml/fraud-score, and reports throughput,
+latency percentiles, error rate and the saturation point for each step.
+
+Two load models:
+- closed loop (default): N clients send back-to-back; steps are --concurrency
+  levels and saturation is where more clients stop adding throughput
+- open loop (--rates): requests are sent on a fixed schedule whatever the
+  latency, and latency is measured from the scheduled send time, so queueing
+  is not hidden; saturation is the first rate that isn't sustained
+
+Every request opens a new connection with a --timeout deadline (default 5 s,
+the same as the Node.js client). The client runs in one Python process; if
+its CPU column approaches 100% the client, not the service, is the limit.
+
+Usage:
+    python benchmarks/load_test.py --modes dev prefork prefork-microbatch
+    python benchmarks/load_test.py --modes prefork --rates 100 200 400 800 --concurrency 64
+    python benchmarks/load_test.py --url http://localhost:5000 --concurrency 1 8 32
+"""
+
+import argparse
+import contextlib
+import http.client
+import io
+import json
+import os
+import queue
+import random
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlparse
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(SERVICE_DIR)
+
+import numpy as np
+
+ENDPOINTS = {
+    'anomaly-check': '/api/ml/anomaly-check',
+    'fraud-score': '/api/ml/fraud-score'
+}
+
+# Flask's built-in server (what `python app.py` runs), threaded, without the reloader
+DEV_SERVER_SNIPPET = """
+import sys
+sys.path.insert(0, {service_dir!r})
+import app
+app.app.run(host='127.0.0.1', port={port}, threaded=True)
+"""
+
+
+def build_payloads(n_payloads, seed):
+    """Request bodies shaped like the Node.js mlPayload, from synthetic batches"""
+    from utils.generate_synthetic_data import generate_synthetic_dataset
+
+    np.random.seed(seed)
+    with contextlib.redirect_stdout(io.StringIO()):
+        df = generate_synthetic_dataset(n_normal=int(n_payloads * 0.85), n_anomalous=int(n_payloads * 0.15))
+
+    payloads = []
+    for row in df.to_dict('records'):
+        def number(field, default):
+            value = row.get(field)
+            return default if value is None or value != value else float(value)
+
+        payloads.append(json.dumps({
+            'batchId': row['batchId'],
+            'crop': row['crop'],
+            'quantity': number('quantity', 0),
+            'pricePerUnit': number('pricePerUnit', 0),
+            'latitude': number('latitude', 0),
+            'longitude': number('longitude', 0),
+            'temperature': number('temperature', 28),
+            'humidity': number('humidity', 75),
+            'moistureContent': number('moistureContent', 12),
+            'qualityGrade': row.get('qualityGrade') or 'B',
+            'weather_main': row.get('weather_main') or 'Clear'
+        }).encode())
+    return payloads
+
+
+def build_model(directory, n_rows):
+    """Train a synthetic model and save it in the memory-mapped format"""
+    from models.anomaly_detector import AnomalyDetector
+    from utils.generate_synthetic_data import generate_synthetic_dataset
+
+    path = os.path.join(directory, 'anomaly_detector.model')
+    with contextlib.redirect_stdout(io.StringIO()):
+        df = generate_synthetic_dataset(n_normal=int(n_rows * 0.85), n_anomalous=int(n_rows * 0.15))
+        detector = AnomalyDetector(contamination=0.15)
+        detector.train(df)
+        detector.save(path, format='mmap')
+    return path
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class LocalServer:
+    """One service process started for a single mode"""
+
+    def __init__(self, mode, model_path, workers, threads, cache, log_dir):
+        self.mode = mode
+        self.port = free_port()
+        self.log_path = os.path.join(log_dir, f"{mode}.log")
+
+        env = dict(os.environ, ML_MODEL_PATH=model_path, PYTHONUNBUFFERED='1')
+        env.pop('ML_MODEL_REGISTRY', None)
+        if not cache:
+            env['ML_CACHE_MAX_ENTRIES'] = '0'
+        env['ML_MICROBATCH_ENABLED'] = 'true' if mode == 'prefork-microbatch' else 'false'
+
+        if mode == 'dev':
+            command = [sys.executable, '-c', DEV_SERVER_SNIPPET.format(service_dir=SERVICE_DIR, port=self.port)]
+        else:
+            command = [
+                sys.executable, os.path.join(SERVICE_DIR, 'serve.py'),
+                '--host', '127.0.0.1', '--port', str(self.port),
+                '--workers', str(workers), '--threads', str(threads)
+            ]
+
+        self.log = open(self.log_path, 'w')
+        self.process = subprocess.Popen(command, cwd=SERVICE_DIR, env=env,
+                                        stdout=self.log, stderr=subprocess.STDOUT)
+
+    def wait_ready(self, timeout=120.0):
+        """Block until /health reports a loaded model"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"{self.mode} server exited with {self.process.returncode}, see {self.log_path}")
+            try:
+                connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=2)
+                connection.request('GET', '/health')
+                health = json.loads(connection.getresponse().read())
+                connection.close()
+                if health.get('status') == 'healthy':
+                    return
+            except (OSError, ValueError, http.client.HTTPException):
+                pass
+            time.sleep(0.2)
+        raise RuntimeError(f"{self.mode} server not ready after {timeout:.0f}s, see {self.log_path}")
+
+    def stop(self):
+        if self.process.poll() is None:
+            self.process.send_signal(signal.SIGTERM)
+            try:
+                self.process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        self.log.close()
+
+
+def send(host, port, path, body, timeout):
+    """
+    POST one payload on a fresh connection
+
+    Returns:
+        Error kind, or None on a 200 response
+    """
+    connection = http.client.HTTPConnection(host, port, timeout=timeout)
+    try:
+        connection.request('POST', path, body=body, headers={'Content-Type': 'application/json'})
+        response = connection.getresponse()
+        response.read()
+        return None if response.status == 200 else f"http_{response.status}"
+    except socket.timeout:
+        return 'timeout'
+    except (OSError, http.client.HTTPException) as e:
+        return type(e).__name__
+    finally:
+        connection.close()
+
+
+class LoadGenerator:
+    """Sends payloads to the chosen endpoints and records every outcome"""
+
+    def __init__(self, host, port, endpoints, payloads, timeout, seed):
+        self.host = host
+        self.port = port
+        self.endpoints = endpoints
+        self.payloads = payloads
+        self.timeout = timeout
+        self.seed = seed
+
+    def _request(self, rng):
+        endpoint = self.endpoints[rng.randrange(len(self.endpoints))]
+        body = self.payloads[rng.randrange(len(self.payloads))]
+        return endpoint, ENDPOINTS[endpoint], body
+
+    def closed_loop(self, concurrency, duration):
+        """concurrency clients sending back-to-back for duration seconds"""
+        samples = []
+        deadline = time.perf_counter() + duration
+
+        def client(index):
+            rng = random.Random(self.seed + index)
+            local = []
+            while time.perf_counter() < deadline:
+                endpoint, path, body = self._request(rng)
+                start = time.perf_counter()
+                error = send(self.host, self.port, path, body, self.timeout)
+                local.append((endpoint, time.perf_counter() - start, error))
+            samples.extend(local)
+
+        self._run_threads(client, concurrency)
+        return samples
+
+    def open_loop(self, rate, concurrency, duration):
+        """
+        Requests scheduled at a fixed rate, sent by a pool of concurrency threads
+
+        Latency runs from the scheduled send time, so time spent waiting for a
+        free client counts. Requests still queued when the run ends (plus one
+        timeout of grace) are reported as 'not_sent'.
+        """
+        samples = []
+        pending = queue.Queue()
+        start = time.perf_counter()
+        deadline = start + duration
+        give_up = deadline + self.timeout
+
+        def dispatcher():
+            rng = random.Random(self.seed)
+            sent = 0
+            while True:
+                scheduled = start + sent / rate
+                if scheduled >= deadline:
+                    break
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                pending.put((scheduled,) + self._request(rng))
+                sent += 1
+
+        def client(index):
+            local = []
+            while True:
+                try:
+                    scheduled, endpoint, path, body = pending.get(timeout=0.05)
+                except queue.Empty:
+                    if time.perf_counter() >= deadline and not dispatch.is_alive():
+                        break
+                    continue
+                if time.perf_counter() >= give_up:
+                    local.append((endpoint, None, 'not_sent'))
+                    continue
+                error = send(self.host, self.port, path, body, self.timeout)
+                local.append((endpoint, time.perf_counter() - scheduled, error))
+            samples.extend(local)
+
+        dispatch = threading.Thread(target=dispatcher, daemon=True)
+        dispatch.start()
+        self._run_threads(client, concurrency)
+        return samples
+
+    @staticmethod
+    def _run_threads(target, count):
+        threads = [threading.Thread(target=target, args=(i,), daemon=True) for i in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+
+def summarize(samples, wall_seconds, cpu_seconds, offered_rate=None):
+    """Throughput, latency percentiles and errors of one step"""
+    latencies = np.array([latency for _, latency, error in samples if error is None]) * 1000
+    errors = {}
+    for _, _, error in samples:
+        if error is not None:
+            errors[error] = errors.get(error, 0) + 1
+
+    by_endpoint = {}
+    for endpoint, _, error in samples:
+        counts = by_endpoint.setdefault(endpoint, {'requests': 0, 'errors': 0})
+        counts['requests'] += 1
+        counts['errors'] += error is not None
+
+    def percentile(q):
+        return float(np.percentile(latencies, q)) if len(latencies) else None
+
+    return {
+        'offered_rate': offered_rate,
+        'requests': len(samples),
+        'ok': int(len(latencies)),
+        'throughput': len(latencies) / wall_seconds,
+        'error_rate': sum(errors.values()) / len(samples) if samples else 0.0,
+        'errors': errors,
+        'p50_ms': percentile(50),
+        'p95_ms': percentile(95),
+        'p99_ms': percentile(99),
+        'max_ms': float(latencies.max()) if len(latencies) else None,
+        'client_cpu': cpu_seconds / wall_seconds,
+        'endpoints': by_endpoint
+    }
+
+
+def find_saturation(steps, open_loop, max_error_rate, slo_ms, min_gain):
+    """
+    First step past the service's capacity
+
+    A step is past capacity if its error rate or p99 exceeds the limits, or
+    (open loop) it delivers less than 95% of the offered rate, or (closed
+    loop) it adds less than min_gain throughput over the previous step.
+
+    Returns:
+        Dictionary with the saturating step, the reason and the capacity
+        (throughput of the last step before it), or None if never saturated
+    """
+    for i, step in enumerate(steps):
+        reasons = []
+        if step['error_rate'] > max_error_rate:
+            reasons.append(f"error rate {step['error_rate']:.1%}")
+        if step['p99_ms'] is None or step['p99_ms'] > slo_ms:
+            reasons.append(f"p99 over {slo_ms:.0f} ms")
+        if open_loop and step['throughput'] < 0.95 * step['offered_rate']:
+            reasons.append(f"only {step['throughput']:.0f} of {step['offered_rate']:.0f} req/s delivered")
+        if not open_loop and i > 0 and step['throughput'] < steps[i - 1]['throughput'] * (1 + min_gain):
+            reasons.append(f"throughput gain under {min_gain:.0%}")
+
+        if reasons:
+            return {
+                'step': step['label'],
+                'reason': ', '.join(reasons),
+                'capacity_rps': steps[i - 1]['throughput'] if i > 0 else None
+            }
+    return None
+
+
+def run_steps(generator, args):
+    """Run every load step against one server"""
+    open_loop = bool(args.rates)
+    levels = args.rates if open_loop else args.concurrency
+
+    if args.warmup > 0:
+        generator.closed_loop(min(4, max(args.concurrency)), args.warmup)
+
+    steps = []
+    print(f"   {'step':>12} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>8} {'client cpu':>11}")
+    for level in levels:
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        if open_loop:
+            samples = generator.open_loop(level, max(args.concurrency), args.duration)
+        else:
+            samples = generator.closed_loop(level, args.duration)
+        wall, cpu = time.perf_counter() - wall_start, time.process_time() - cpu_start
+
+        step = summarize(samples, wall, cpu, offered_rate=level if open_loop else None)
+        step['label'] = f"{level:g} req/s" if open_loop else f"{level} clients"
+        steps.append(step)
+
+        def ms(value):
+            return f"{value:>9.1f}" if value is not None else f"{'-':>9}"
+        print(f"   {step['label']:>12} {step['throughput']:>9.1f} {ms(step['p50_ms'])} {ms(step['p95_ms'])} "
+              f"{ms(step['p99_ms'])} {step['error_rate']:>8.1%} {step['client_cpu']:>11.0%}")
+
+    saturation = find_saturation(steps, open_loop, args.max_error_rate, args.slo_ms, args.min_gain)
+    if saturation:
+        capacity = f"~{saturation['capacity_rps']:.0f} req/s" if saturation['capacity_rps'] else 'below the first step'
+        print(f"   📈 Saturated at {saturation['step']} ({saturation['reason']}); capacity {capacity}")
+    else:
+        best = max(step['throughput'] for step in steps)
+        print(f"   📈 Not saturated at the highest step; capacity ≥ {best:.0f} req/s")
+
+    return {'steps': steps, 'saturation': saturation}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ML service HTTP load test')
+    parser.add_argument('--modes', nargs='+', default=['dev', 'prefork', 'prefork-microbatch'],
+                        choices=['dev', 'prefork', 'prefork-microbatch'],
+                        help='Server modes to start and compare')
+    parser.add_argument('--url', help='Test an already running service instead of starting one')
+    parser.add_argument('--model', help='Model to serve (default: train a synthetic one)')
+    parser.add_argument('--endpoints', nargs='+', default=list(ENDPOINTS), choices=list(ENDPOINTS))
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16, 64],
+                        help='Client threads per step (closed loop), or the pool size with --rates')
+    parser.add_argument('--rates', type=float, nargs='+',
+                        help='Open loop: requests per second per step')
+    parser.add_argument('--duration', type=float, default=10.0, help='Seconds per step')
+    parser.add_argument('--warmup', type=float, default=2.0, help='Seconds of unrecorded load first')
+    parser.add_argument('--timeout', type=float, default=5.0, help='Per-request timeout in seconds')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='serve.py worker processes')
+    parser.add_argument('--threads', type=int, default=8, help='serve.py threads per worker')
+    parser.add_argument('--cache', action='store_true',
+                        help='Keep the scoring cache on (off by default, so every request is scored)')
+    parser.add_argument('--payloads', type=int, default=2000, help='Distinct synthetic payloads')
+    parser.add_argument('--slo-ms', type=float, default=1000.0, help='p99 above this counts as saturated')
+    parser.add_argument('--max-error-rate', type=float, default=0.01)
+    parser.add_argument('--min-gain', type=float, default=0.1,
+                        help='Closed loop: smallest throughput gain per step before calling it saturated')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='Write all results to this JSON file')
+    args = parser.parse_args()
+
+    if args.rates and len(args.concurrency) > 1:
+        parser.error('with --rates, --concurrency takes a single pool size')
+
+    print(f"🎲 Building {args.payloads} synthetic payloads...")
+    payloads = build_payloads(args.payloads, args.seed)
+    results = {}
+
+    if args.url:
+        target = urlparse(args.url)
+        print(f"\n🎯 {args.url}")
+        generator = LoadGenerator(target.hostname, target.port or 80, args.endpoints, payloads,
+                                  args.timeout, args.seed)
+        results['external'] = run_steps(generator, args)
+    else:
+        with tempfile.TemporaryDirectory() as directory:
+            model_path = args.model
+            if model_path is None:
+                print("🤖 Training synthetic model...")
+                model_path = build_model(directory, 5000)
+
+            for mode in args.modes:
+                detail = 'Flask dev server' if mode == 'dev' else f"{args.workers} workers x {args.threads} threads"
+                print(f"\n🚀 {mode} ({detail})")
+                server = LocalServer(mode, model_path, args.workers, args.threads, args.cache, directory)
+                try:
+                    server.wait_ready()
+                    generator = LoadGenerator('127.0.0.1', server.port, args.endpoints, payloads,
+                                              args.timeout, args.seed)
+                    results[mode] = run_steps(generator, args)
+                finally:
+                    server.stop()
+
+    if len(results) > 1:
+        print(f"\n📊 {'mode':<20} {'capacity (req/s)':>17} {'best req/s':>11} {'p99 at best (ms)':>17}  saturated at")
+        for mode, result in results.items():
+            best = max(result['steps'], key=lambda step: step['throughput'])
+            saturation = result['saturation']
+            # Never saturated: capacity is at least the best throughput seen
+            if saturation is None:
+                capacity = f"≥ {best['throughput']:.1f}"
+            elif saturation['capacity_rps']:
+                capacity = f"{saturation['capacity_rps']:.1f}"
+            else:
+                capacity = '-'
+            p99 = f"{best['p99_ms']:.1f}" if best['p99_ms'] is not None else '-'
+            print(f"   {mode:<20} {capacity:>17} {best['throughput']:>11.1f} "
+                  f"{p99:>17}  {saturation['step'] if saturation else 'not saturated'}")
+        print("   (≥: never saturated, capacity is at least the best throughput seen; -: saturated at the first step)")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'parameters': vars(args), 'results': results}, f, indent=2)
+        print(f"\n💾 Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
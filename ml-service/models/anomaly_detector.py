@@ -6,59 +6,97 @@ Uses Isolation Forest algorithm to detect suspicious batch entries
 
 import numpy as np
 import pandas as pd
-from sklearn.ensemble import IsolationForest
 from sklearn.preprocessing import StandardScaler, LabelEncoder
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import classification_report, confusion_matrix, precision_recall_fscore_support
 import joblib
 import json
+import os
+import shutil
 
-class AnomalyDetector:
+from models.forest_evaluator import FlatIsolationForest
+from models.inference import (
+    InferenceModel, MAPPED_FORMAT_VERSION, arrays_digest, file_digest, mapped_array,
+    temperature_anomaly_score, moisture_anomaly_score, _start_timer, _lap
+)
+
+# Rows from which sklearn's compiled tree walk beats the flattened forest
+SKLEARN_MIN_ROWS = 4096
+
+
+class AnomalyDetector(InferenceModel):
     """
     Detects anomalous batch entries that may indicate fraud or data tampering
+
+    Adds training, the pandas DataFrame path and the sklearn estimator to the
+    scoring in InferenceModel. The training-only parts of scikit-learn are
+    imported inside train(), so loading a model for inference stays cheap.
     """
 
-    def __init__(self, contamination=0.15):
+    def __init__(self, contamination=0.15, grade_reference=False):
         """
         Initialize anomaly detector
 
         Args:
             contamination: Expected proportion of anomalies in dataset (default 0.15 = 15%)
+            grade_reference: Also keep per-crop-and-grade medians, preferred over
+                per-crop medians when the combination was seen in training
         """
+        super().__init__(contamination)
         self.model = None
         self.scaler = StandardScaler()
         self.label_encoders = {}
-        self.contamination = contamination
-
-        # Features to use for anomaly detection
-        self.numeric_features = [
-            'latitude', 'longitude', 'quantity', 'pricePerUnit',
-            'temperature', 'humidity', 'moistureContent'
-        ]
-
-        self.categorical_features = [
-            'crop', 'qualityGrade', 'weather_main'
-        ]
-
-        self.engineered_features = [
-            'distance_from_region_center',
-            'price_deviation_from_median',
-            'quantity_deviation',
-            'temp_anomaly_score',
-            'moisture_anomaly_score'
-        ]
+        self.grade_reference = grade_reference
 
-        self.all_features = self.numeric_features + self.categorical_features + self.engineered_features
+        # Unverified flattened forest used only for attributions when
+        # compile_forest() fell back to sklearn scoring
+        self._fallback_forest = None
+
+    def compute_reference_stats(self, df):
+        """
+        Compute the median price/quantity reference table from training data
+
+        Args:
+            df: DataFrame with batch data
 
-        # Region centers for distance calculation (Malaysia)
-        self.region_centers = {
-            'north': (6.0, 100.5),   # Kedah/Perlis area
-            'central': (3.2, 101.5),  # Selangor/KL area
-            'south': (1.9, 103.5),    # Johor area
-            'east': (3.8, 103.0),     # Pahang/Terengganu area
-            'borneo': (5.5, 116.0)    # Sabah/Sarawak area
+        Returns:
+            Dictionary with 'global' and per-'crop' medians, plus per-crop
+            'crop_grade' medians when grade_reference is enabled
+        """
+        columns = ['pricePerUnit', 'quantity']
+        crops = df['crop'].astype(str).where(df['crop'].notna())
+
+        stats = {
+            'global': {col: float(df[col].median()) for col in columns},
+            'crop': {
+                crop: {col: float(row[col]) for col in columns}
+                for crop, row in df[columns].groupby(crops).median().iterrows()
+            }
         }
 
+        if self.grade_reference and 'qualityGrade' in df.columns:
+            grades = df['qualityGrade'].astype(str).where(df['qualityGrade'].notna())
+            stats['crop_grade'] = {}
+            for (crop, grade), row in df[columns].groupby([crops, grades]).median().iterrows():
+                stats['crop_grade'].setdefault(crop, {})[grade] = {col: float(row[col]) for col in columns}
+
+        return stats
+
+    def _reference_medians(self, df, column):
+        """Vectorized reference_median over a DataFrame"""
+        stats = self.reference_stats
+        crops = df['crop'].astype(str)
+        medians = crops.map({crop: s[column] for crop, s in stats['crop'].items()})
+
+        if stats.get('crop_grade') and 'qualityGrade' in df.columns:
+            keys = crops + '|' + df['qualityGrade'].astype(str)
+            grade_medians = keys.map({
+                f'{crop}|{grade}': s[column]
+                for crop, grades in stats['crop_grade'].items()
+                for grade, s in grades.items()
+            })
+            medians = grade_medians.fillna(medians)
+
+        return medians.fillna(stats['global'][column]).astype(float)
+
     def engineer_features(self, df):
         """
         Create engineered features for better anomaly detection
@@ -72,38 +110,31 @@ class AnomalyDetector:
         df = df.copy()
 
         # 1. Distance from regional centers (detect GPS spoofing)
-        def calculate_min_distance_to_regions(row):
-            lat, lng = row['latitude'], row['longitude']
-            min_dist = float('inf')
-
-            for region, (center_lat, center_lng) in self.region_centers.items():
-                # Haversine-like distance (simplified)
-                dist = np.sqrt((lat - center_lat)**2 + (lng - center_lng)**2) * 111  # Convert to km
-                min_dist = min(min_dist, dist)
-
-            return min_dist
+        df['distance_from_region_center'] = self.distance_to_nearest_region(
+            df['latitude'].to_numpy(dtype=float),
+            df['longitude'].to_numpy(dtype=float)
+        )
 
-        df['distance_from_region_center'] = df.apply(calculate_min_distance_to_regions, axis=1)
+        # Crop medians come from the training reference table once trained,
+        # otherwise from the frame itself
+        if self.reference_stats is None:
+            median_prices = df.groupby('crop')['pricePerUnit'].transform('median')
+            median_quantity = df.groupby('crop')['quantity'].transform('median')
+        else:
+            median_prices = self._reference_medians(df, 'pricePerUnit')
+            median_quantity = self._reference_medians(df, 'quantity')
 
         # 2. Price deviation from median per crop type (detect price manipulation)
-        median_prices = df.groupby('crop')['pricePerUnit'].transform('median')
         df['price_deviation_from_median'] = abs(df['pricePerUnit'] - median_prices) / (median_prices + 0.01)
 
         # 3. Quantity deviation (detect impossible quantities)
-        median_quantity = df.groupby('crop')['quantity'].transform('median')
         df['quantity_deviation'] = abs(df['quantity'] - median_quantity) / (median_quantity + 0.01)
 
         # 4. Temperature anomaly score (detect weather inconsistencies)
-        # Malaysia typical temp range: 23-35°C
-        df['temp_anomaly_score'] = df['temperature'].apply(
-            lambda x: 0 if 23 <= x <= 35 else abs(x - 29) / 10
-        )
+        df['temp_anomaly_score'] = temperature_anomaly_score(df['temperature'].to_numpy(dtype=float))
 
         # 5. Moisture anomaly score (detect impossible moisture values)
-        # Typical range: 0-100%
-        df['moisture_anomaly_score'] = df['moistureContent'].apply(
-            lambda x: 0 if 0 <= x <= 100 else abs(x - 50) / 50
-        )
+        df['moisture_anomaly_score'] = moisture_anomaly_score(df['moistureContent'].to_numpy(dtype=float))
 
         return df
 
@@ -120,6 +151,10 @@ class AnomalyDetector:
         """
         df = df.copy()
 
+        # Learn the per-crop reference medians once, reuse them at inference
+        if training:
+            self.reference_stats = self.compute_reference_stats(df)
+
         # Engineer features
         df = self.engineer_features(df)
 
@@ -140,12 +175,13 @@ class AnomalyDetector:
                     self.label_encoders[col] = LabelEncoder()
                     df[col] = self.label_encoders[col].fit_transform(df[col].astype(str))
                 else:
-                    # Use existing encoder, handle unknown labels
-                    df[col] = df[col].astype(str).apply(
-                        lambda x: self.label_encoders[col].transform([x])[0]
-                        if x in self.label_encoders[col].classes_
-                        else -1
-                    )
+                    # Categorical codes against the fitted classes, unknown labels become -1
+                    df[col] = pd.Categorical(
+                        df[col].astype(str), categories=self.label_encoders[col].classes_
+                    ).codes
+
+        if training:
+            self.compile_encoders()
 
         # Select features that exist in dataframe
         available_features = [f for f in self.all_features if f in df.columns]
@@ -153,7 +189,130 @@ class AnomalyDetector:
 
         return X
 
-    def train(self, df, test_size=0.2, random_state=42):
+    def compile_encoders(self):
+        """
+        Compile the fitted label encoders into hash-map lookup tables
+
+        LabelEncoder codes are positions in the sorted classes_ array, so the
+        tables give the same codes as transform() in O(1) per label.
+        """
+        self.compile_category_tables({
+            col: encoder.classes_.tolist() for col, encoder in self.label_encoders.items()
+        })
+
+    def _check_loaded(self):
+        if self.model is None and self.flat_forest is None:
+            raise Exception("Model not trained yet. Call train() first.")
+
+    def _use_sklearn(self, X):
+        """
+        Whether to walk the trees with sklearn rather than the flattened forest
+
+        The flattened forest wins on small batches, where sklearn's per-call
+        overhead dominates; from SKLEARN_MIN_ROWS rows sklearn's compiled walk
+        is faster. Both reach the same leaves, so results don't change.
+        """
+        return self.model is not None and (self.flat_forest is None or len(X) >= SKLEARN_MIN_ROWS)
+
+    def _sklearn_leaves(self, X):
+        """
+        Leaf reached by every sample in every tree, found by sklearn
+
+        Returns:
+            Global node ids of the attribution forest, shape (n_samples, n_trees)
+        """
+        X_scaled = np.ascontiguousarray((X - self.scaler.mean_) / self.scaler.scale_, dtype=np.float32)
+        subsample_features = self.model._max_features != self.model.n_features_in_
+
+        leaves = np.empty((len(X), len(self.model.estimators_)), dtype=np.intp)
+        roots = self.attribution_forest().roots
+        for t, (estimator, features) in enumerate(zip(self.model.estimators_, self.model.estimators_features_)):
+            X_tree = np.ascontiguousarray(X_scaled[:, features]) if subsample_features else X_scaled
+            leaves[:, t] = roots[t] + estimator.tree_.apply(X_tree)
+        return leaves
+
+    def _score_vectors(self, X, timings=None):
+        """
+        Scale and score feature vectors in a single pass over the forest
+
+        Small batches use the flattened forest, large ones sklearn (see
+        _use_sklearn).
+
+        Args:
+            X: Numpy array of shape (n_samples, n_features)
+            timings: Optional dictionary that receives per-stage seconds
+
+        Returns:
+            Tuple of (raw score_samples values, boolean anomaly mask)
+        """
+        if not self._use_sklearn(X):
+            return super()._score_vectors(X, timings)
+
+        timer = _start_timer(timings)
+        X_scaled = (X - self.scaler.mean_) / self.scaler.scale_
+        timer = _lap(timings, 'scaling', timer)
+        scores = self.model.score_samples(X_scaled)
+        _lap(timings, 'tree_scoring', timer)
+
+        # Same decision rule as IsolationForest.predict: decision_function < 0
+        return scores, (scores - self.model.offset_) < 0
+
+    def compile_forest(self, X_check=None):
+        """
+        Export the fitted forest and scaler into a FlatIsolationForest
+
+        The flattened evaluator is only switched on after it reproduces
+        sklearn's score_samples bit for bit on a check set; otherwise the
+        sklearn path stays in use.
+
+        Args:
+            X_check: Raw feature matrix to verify against. Defaults to points
+                spread around the scaler mean (up to ±6 standard deviations)
+
+        Returns:
+            True if the flattened evaluator is active
+        """
+        self.flat_forest = None
+        self._fallback_forest = None
+        self._importance_cache.clear()
+        flat_forest = FlatIsolationForest.from_sklearn(self.model, self.scaler)
+
+        if X_check is None:
+            rng = np.random.default_rng(0)
+            noise = rng.uniform(-6, 6, size=(2048, len(self.scaler.mean_)))
+            X_check = self.scaler.mean_ + noise * self.scaler.scale_
+
+        expected = self.model.score_samples(self.scaler.transform(X_check))
+        if not np.array_equal(flat_forest.score_samples(X_check), expected):
+            print("⚠️  Warning: Flattened forest disagrees with sklearn, using sklearn scoring")
+            return False
+
+        self.flat_forest = flat_forest
+        return True
+
+    def prepare_training_split(self, df, test_size=0.2, random_state=42):
+        """
+        Fit the feature pipeline on df and split it for training and evaluation
+
+        Args:
+            df: DataFrame with batch data including the 'is_anomaly' column
+            test_size: Proportion of data for testing
+            random_state: Random seed for reproducibility
+
+        Returns:
+            Tuple of (X_train, X_test, y_train, y_test) with unscaled features
+        """
+        from sklearn.model_selection import train_test_split
+
+        X = self.prepare_features(df, training=True)
+        y_true = df['is_anomaly'].values
+
+        return train_test_split(
+            X, y_true, test_size=test_size, random_state=random_state, stratify=y_true
+        )
+
+    def train(self, df, test_size=0.2, random_state=42, n_estimators=100, max_samples='auto',
+              max_features=1.0):
         """
         Train the anomaly detection model
 
@@ -161,23 +320,21 @@ class AnomalyDetector:
             df: DataFrame with batch data (must include 'is_anomaly' column for evaluation)
             test_size: Proportion of data for testing
             random_state: Random seed for reproducibility
+            n_estimators, max_samples, max_features: IsolationForest hyperparameters
 
         Returns:
             Dictionary with training results and metrics
         """
+        from sklearn.ensemble import IsolationForest
+        from sklearn.metrics import classification_report, confusion_matrix, precision_recall_fscore_support
+
         print("🤖 Training Anomaly Detection Model...")
         print(f"   Dataset size: {len(df)} batches")
         print(f"   Normal batches: {len(df[df['is_anomaly'] == False])}")
         print(f"   Anomalous batches: {len(df[df['is_anomaly'] == True])}")
 
-        # Prepare features
-        X = self.prepare_features(df, training=True)
-        y_true = df['is_anomaly'].values
-
-        # Split data
-        X_train, X_test, y_train, y_test = train_test_split(
-            X, y_true, test_size=test_size, random_state=random_state, stratify=y_true
-        )
+        # Prepare features and split data
+        X_train, X_test, y_train, y_test = self.prepare_training_split(df, test_size, random_state)
 
         print(f"\n📊 Training Data Split:")
         print(f"   Training set: {len(X_train)} batches")
@@ -190,17 +347,19 @@ class AnomalyDetector:
         # Train Isolation Forest
         print(f"\n⚙️  Training Isolation Forest...")
         print(f"   Contamination: {self.contamination}")
+        print(f"   Estimators: {n_estimators}, max_samples: {max_samples}, max_features: {max_features}")
 
         self.model = IsolationForest(
             contamination=self.contamination,
             random_state=random_state,
-            n_estimators=100,
-            max_samples='auto',
-            max_features=1.0,
+            n_estimators=n_estimators,
+            max_samples=max_samples,
+            max_features=max_features,
             bootstrap=False
         )
 
         self.model.fit(X_train_scaled)
+        self.compile_forest(np.vstack([X_train, X_test]))
 
         # Evaluate on test set
         print(f"\n📈 Evaluating Model...")
@@ -252,117 +411,281 @@ class AnomalyDetector:
             'test_recall': float(test_recall),
             'test_f1': float(test_f1),
             'confusion_matrix': cm.tolist(),
-            'n_features': X.shape[1],
-            'contamination': self.contamination
+            'n_features': X_train.shape[1],
+            'contamination': self.contamination,
+            'n_estimators': n_estimators,
+            'max_samples': max_samples,
+            'max_features': max_features
         }
 
         print(f"\n✅ Model training complete!")
 
         return results
 
-    def predict(self, batch_data):
+    def refresh_forest(self, X_new, X_history=None, n_replace=None, random_state=None):
         """
-        Predict if a batch is anomalous
+        Replace the oldest trees with trees fit on new data
+
+        The scaler, label encoders and reference medians stay as trained, so
+        the remaining trees keep their meaning. New trees are grown with
+        warm_start on the new rows (topped up from history to max_samples),
+        the same number of oldest trees is dropped, and offset_ is recomputed
+        over history + new rows exactly as fit() computes it. Cost grows with
+        the number of new rows and the bounded history, not with all data
+        ever seen.
 
         Args:
-            batch_data: Dictionary or DataFrame with batch information
+            X_new: Unscaled feature matrix of the new batches
+                (prepare_features(..., training=False))
+            X_history: Unscaled feature matrix of retained earlier batches
+            n_replace: Trees to replace. Defaults to the new rows' share of
+                history + new rows, at least one
+            random_state: Seed for the new trees; vary it between refreshes
 
         Returns:
-            Dictionary with prediction results
+            Dictionary with refresh statistics
         """
         if self.model is None:
-            raise Exception("Model not trained yet. Call train() first.")
-
-        # Convert dict to DataFrame if needed
-        if isinstance(batch_data, dict):
-            df = pd.DataFrame([batch_data])
-        else:
-            df = batch_data.copy()
+            raise Exception("Refreshing needs the sklearn estimator. Load the pickled model, not the mapped one.")
+
+        model = self.model
+        n_estimators = len(model.estimators_)
+        max_samples = model.max_samples_
+        if X_history is None:
+            X_history = np.empty((0, X_new.shape[1]))
+        X_window = np.vstack([X_history, X_new])
+
+        if n_replace is None:
+            n_replace = int(np.ceil(n_estimators * len(X_new) / len(X_window)))
+        n_replace = min(max(n_replace, 1), n_estimators)
+
+        # Each tree sees max_samples rows; keep that (and so the score normalization) unchanged
+        X_fit = X_new
+        if len(X_fit) < max_samples:
+            rng = np.random.default_rng(random_state)
+            top_up = min(max_samples - len(X_fit), len(X_history))
+            X_fit = np.vstack([X_fit, X_history[rng.choice(len(X_history), top_up, replace=False)]])
+        if len(X_fit) < max_samples:
+            raise ValueError(f"Need at least {max_samples} rows to grow new trees, got {len(X_fit)}")
+
+        model.set_params(
+            warm_start=True,
+            n_estimators=n_estimators + n_replace,
+            max_samples=max_samples,
+            random_state=random_state
+        )
+        try:
+            model.fit(self.scaler.transform(X_fit))
+        finally:
+            model.set_params(warm_start=False)
+
+        # Warm start appends, so the oldest trees are at the front
+        model.estimators_ = model.estimators_[n_replace:]
+        model.estimators_features_ = model.estimators_features_[n_replace:]
+        model._average_path_length_per_tree = model._average_path_length_per_tree[n_replace:]
+        model._decision_path_lengths = model._decision_path_lengths[n_replace:]
+        model.set_params(n_estimators=n_estimators)
+
+        window_scores = model.score_samples(self.scaler.transform(X_window))
+        model.offset_ = np.percentile(window_scores, 100.0 * self.contamination)
+        self.compile_forest(X_window)
+
+        flagged_new = window_scores[len(X_history):] < model.offset_
+        return {
+            'replaced_estimators': n_replace,
+            'n_estimators': n_estimators,
+            'new_rows': len(X_new),
+            'fit_rows': len(X_fit),
+            'window_rows': len(X_window),
+            'offset': float(model.offset_),
+            'new_flagged_rate': float(flagged_new.mean()) if len(flagged_new) else 0.0,
+            'contamination': self.contamination
+        }
 
-        # Prepare features
-        X = self.prepare_features(df, training=False)
-        X_scaled = self.scaler.transform(X)
+    def predict(self, batch_data, timings=None):
+        """
+        Predict if a batch is anomalous
 
-        # Predict
-        prediction = self.model.predict(X_scaled)[0]
-        anomaly_score = self.model.score_samples(X_scaled)[0]
+        Args:
+            batch_data: Dictionary or DataFrame with batch information
+            timings: Optional dictionary that receives per-stage seconds
 
-        # Convert anomaly score to 0-1 range (lower score = more anomalous)
-        # Isolation Forest scores are typically in range [-1, 1]
-        normalized_score = float(1 / (1 + np.exp(anomaly_score)))  # Sigmoid transformation
+        Returns:
+            Dictionary with prediction results
+        """
+        # Single records skip pandas entirely
+        if isinstance(batch_data, dict):
+            return super().predict(batch_data, timings)
 
-        is_anomaly = (prediction == -1)
+        self._check_loaded()
+        timer = _start_timer(timings)
+        X = self.prepare_features(batch_data.copy(), training=False)
+        _lap(timings, 'engineer_features', timer)
+        scores, is_anomaly, explanations = self._score_and_explain(X, timings)
 
-        # Determine risk level
-        if normalized_score > 0.7:
-            risk_level = 'HIGH'
-        elif normalized_score > 0.5:
-            risk_level = 'MEDIUM'
-        else:
-            risk_level = 'LOW'
-
-        result = {
-            'isAnomaly': bool(is_anomaly),
-            'anomalyScore': float(normalized_score),
-            'confidence': float(1 - normalized_score) if not is_anomaly else float(normalized_score),
-            'riskLevel': risk_level,
-            'recommendation': 'REVIEW' if is_anomaly else 'APPROVE'
-        }
-
-        return result
+        return self._format_result(is_anomaly[0], scores[0], explanations[0])
 
     def get_feature_importance(self, df):
         """
         Analyze which features contribute most to anomaly detection
 
+        Attributions come from the features split on along each sample's
+        isolation paths (see FlatIsolationForest.score_and_attribute), for
+        all rows in one pass. Results are cached per model version and data.
+
         Args:
             df: DataFrame with batch data
 
         Returns:
-            Dictionary with feature importance scores
+            Dictionary with sample counts and features ranked by importance
         """
-        X = self.prepare_features(df, training=False)
-        X_scaled = self.scaler.transform(X)
-
-        # Get anomaly scores for each feature individually
-        feature_scores = {}
-
-        for i, feature_name in enumerate(self.all_features):
-            # Create dataset with only this feature
-            X_single = X_scaled[:, i:i+1]
-
-            # Calculate variance in predictions
-            scores = self.model.score_samples(X_single)
-            feature_scores[feature_name] = {
-                'mean_score': float(np.mean(scores)),
-                'std_score': float(np.std(scores))
-            }
+        self._check_loaded()
+        return self._importance_from_matrix(self.prepare_features(df, training=False))
+
+    def attribution_forest(self):
+        """Flattened forest, or an unverified export when scoring fell back to sklearn"""
+        if self.flat_forest is not None:
+            return self.flat_forest
+        if self._fallback_forest is None:
+            self._fallback_forest = FlatIsolationForest.from_sklearn(self.model, self.scaler)
+        return self._fallback_forest
+
+    def _attribute_vectors(self, X):
+        if not self._use_sklearn(X):
+            return super()._attribute_vectors(X)
+
+        forest = self.attribution_forest()
+        scores, attributions = forest.score_and_attribute(X, leaves=self._sklearn_leaves(X))
+        if self.flat_forest is not None:
+            return scores, (scores - forest.offset) < 0, attributions
+
+        # Attributions only need the split structure; scores stay sklearn's
+        scores, is_anomaly = self._score_vectors(X)
+        return scores, is_anomaly, attributions
+
+    def save(self, path, format='pickle'):
+        """
+        Save trained model and preprocessing objects
 
-        return feature_scores
+        Args:
+            path: Destination file ('pickle') or directory ('mmap')
+            format: 'pickle' for a single joblib file, or 'mmap' for a
+                directory of uncompressed arrays that load() memory-maps
+        """
+        if format == 'mmap':
+            return self._save_mapped(path)
+        if format != 'pickle':
+            raise ValueError(f"Unknown model format: {format}")
 
-    def save(self, path):
-        """Save trained model and preprocessing objects"""
         joblib.dump({
             'model': self.model,
             'scaler': self.scaler,
             'label_encoders': self.label_encoders,
             'contamination': self.contamination,
+            'reference_stats': self.reference_stats,
+            'grade_reference': self.grade_reference,
             'numeric_features': self.numeric_features,
             'categorical_features': self.categorical_features,
             'engineered_features': self.engineered_features
         }, path)
+        self.model_version = file_digest(path)
         print(f"✅ Model saved to {path}")
 
+    def _save_mapped(self, path):
+        """
+        Write the memory-mappable model format
+
+        Node and scaler arrays go to .npy files that load() opens with mmap,
+        so loading is near-constant time and worker processes share the
+        page cache. Everything else goes to a small meta.json. Only the
+        verified flattened forest is stored, not the sklearn estimator.
+        """
+        if self.flat_forest is None:
+            raise Exception("Mapped format needs the flattened forest. Call compile_forest() first.")
+
+        forest_arrays, forest_scalars = self.flat_forest.arrays()
+        arrays = {f'forest_{name}': np.ascontiguousarray(a) for name, a in forest_arrays.items()}
+        arrays['scaler_mean'] = np.ascontiguousarray(self.scaler.mean_, dtype=np.float64)
+        arrays['scaler_scale'] = np.ascontiguousarray(self.scaler.scale_, dtype=np.float64)
+
+        meta = {
+            'format': MAPPED_FORMAT_VERSION,
+            'digest': arrays_digest(arrays),
+            'contamination': self.contamination,
+            'forest': forest_scalars,
+            'label_encoders': {col: enc.classes_.tolist() for col, enc in self.label_encoders.items()},
+            'reference_stats': self.reference_stats,
+            'grade_reference': self.grade_reference,
+            'numeric_features': self.numeric_features,
+            'categorical_features': self.categorical_features,
+            'engineered_features': self.engineered_features
+        }
+
+        # Build next to the target and rename into place, so readers never see a partial model
+        path = os.path.abspath(path)
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        os.makedirs(tmp_path)
+        for name, array in arrays.items():
+            np.save(os.path.join(tmp_path, f"{name}.npy"), array)
+        with open(os.path.join(tmp_path, 'meta.json'), 'w') as f:
+            json.dump(meta, f)
+
+        if os.path.exists(path):
+            old_path = f"{path}.old-{os.getpid()}"
+            os.rename(path, old_path)
+            os.rename(tmp_path, path)
+            shutil.rmtree(old_path)
+        else:
+            os.rename(tmp_path, path)
+
+        self.model_version = meta['digest'][:12]
+        print(f"✅ Model saved to {path} (memory-mappable)")
+
+    def _load_mapped(self, path):
+        """Restore the scaler and label encoders on top of InferenceModel._load_mapped"""
+        meta = super()._load_mapped(path)
+        self.model = None
+
+        self.scaler = StandardScaler()
+        self.scaler.mean_ = mapped_array(path, 'scaler_mean')
+        self.scaler.scale_ = mapped_array(path, 'scaler_scale')
+        self.scaler.var_ = self.scaler.scale_ ** 2
+        self.scaler.n_features_in_ = len(self.scaler.mean_)
+
+        self.label_encoders = {}
+        for col, classes in meta['label_encoders'].items():
+            encoder = LabelEncoder()
+            encoder.classes_ = np.array(classes, dtype=object)
+            self.label_encoders[col] = encoder
+
+        self.grade_reference = meta['grade_reference']
+        return meta
+
     def load(self, path):
-        """Load trained model and preprocessing objects"""
+        """
+        Load trained model and preprocessing objects
+
+        Args:
+            path: Legacy joblib pickle, or a directory written by
+                save(format='mmap')
+        """
+        if os.path.isdir(path):
+            return super().load(path)
+
         data = joblib.load(path)
+        self.model_version = file_digest(path)
         self.model = data['model']
         self.scaler = data['scaler']
         self.label_encoders = data['label_encoders']
         self.contamination = data['contamination']
+        # Models saved before reference stats existed fall back to in-frame medians
+        self.reference_stats = data.get('reference_stats')
+        self.grade_reference = data.get('grade_reference', False)
         self.numeric_features = data['numeric_features']
         self.categorical_features = data['categorical_features']
         self.engineered_features = data['engineered_features']
         self.all_features = self.numeric_features + self.categorical_features + self.engineered_features
+        self.compile_encoders()
+        self.compile_forest()
         print(f"✅ Model loaded from {path}")
         return self
@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+"""
+Array-based evaluator for a fitted Isolation Forest
+Flattens every tree into contiguous NumPy node arrays and folds the
+StandardScaler into the split thresholds, so scoring needs no sklearn call
+"""
+
+import numpy as np
+
+# Bit patterns used to map float64 values onto an ordered int64 key space
+_SIGN_BIT = np.int64(-0x8000000000000000)
+_ABS_MASK = np.int64(0x7FFFFFFFFFFFFFFF)
+_POS_INF_KEY = np.int64(0x7FF0000000000000)
+
+
+def _ordered_keys(values):
+    """Map float64 values to int64 keys with the same ordering"""
+    bits = np.ascontiguousarray(values, dtype=np.float64).view(np.int64)
+    return np.where(bits < 0, -(bits & _ABS_MASK), bits)
+
+
+def _from_ordered_keys(keys):
+    """Inverse of _ordered_keys"""
+    bits = np.where(keys < 0, (-keys) | _SIGN_BIT, keys)
+    return bits.view(np.float64)
+
+
+def fold_thresholds(thresholds, mean, scale):
+    """
+    Move split thresholds from scaled float32 space into raw float64 space
+
+    sklearn scales X in float64, casts it to float32 and then compares
+    ``x32 <= threshold``. That predicate is monotone in the raw value, so
+    for every node there is a largest raw float64 ``b`` that still goes
+    left. A bisection over the ordered bit patterns finds it exactly, which
+    makes ``x_raw <= b`` agree with sklearn on every input, not just
+    approximately.
+
+    Args:
+        thresholds: Split thresholds in scaled space
+        mean: Scaler mean for each threshold's feature (0 for no scaling)
+        scale: Scaler scale for each threshold's feature (1 for no scaling)
+
+    Returns:
+        Numpy array of raw-space thresholds
+    """
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+    mean = np.asarray(mean, dtype=np.float64)
+    scale = np.asarray(scale, dtype=np.float64)
+
+    def goes_left(raw):
+        with np.errstate(over='ignore', invalid='ignore'):
+            return ((raw - mean) / scale).astype(np.float32) <= thresholds
+
+    lo = np.full(thresholds.shape, -_POS_INF_KEY, dtype=np.int64)
+    hi = np.full(thresholds.shape, _POS_INF_KEY, dtype=np.int64)
+
+    # Invariant: lo goes left, hi goes right (unless even +inf goes left)
+    always_left = goes_left(np.full(thresholds.shape, np.inf))
+
+    active = ~always_left & (lo + 1 < hi)
+    while active.any():
+        mid = (lo & hi) + ((lo ^ hi) >> 1)
+        left = goes_left(_from_ordered_keys(mid))
+        lo = np.where(active & left, mid, lo)
+        hi = np.where(active & ~left, mid, hi)
+        active = ~always_left & (lo + 1 < hi)
+
+    return np.where(always_left, np.inf, _from_ordered_keys(lo))
+
+
+class FlatIsolationForest:
+    """
+    Isolation Forest flattened into contiguous node arrays
+
+    All trees live in one set of arrays indexed by global node id. Leaves
+    point to themselves, so every sample can be advanced max_depth times in
+    lockstep without branching on leaf status.
+    """
+
+    # Node arrays written by arrays() and accepted back by from_arrays()
+    ARRAY_FIELDS = ('feature', 'threshold', 'children', 'leaf_value', 'roots')
+
+    def __init__(self, feature, threshold, left, right, leaf_value, roots,
+                 max_depth, denominator, offset, children=None):
+        """
+        Args:
+            feature: Raw-space feature index per node
+            threshold: Raw-space split threshold per node (+inf for leaves)
+            left: Global id of the left child (self for leaves)
+            right: Global id of the right child (self for leaves)
+            leaf_value: Path length including the average-path-length correction
+            roots: Global node id of each tree's root, in estimator order
+            max_depth: Deepest leaf over all trees
+            denominator: n_estimators * c(max_samples) normalization term
+            offset: IsolationForest.offset_ decision threshold
+            children: Precomputed packed [left, right] pairs (e.g. memory-mapped)
+        """
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.leaf_value = leaf_value
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.denominator = float(denominator)
+        self.offset = float(offset)
+
+        # Children packed as [left, right] pairs so one gather advances a level
+        if children is None:
+            children = np.stack([left, right], axis=1).ravel()
+        self.children = children
+        self._leaf_attributions = None
+
+    def arrays(self):
+        """
+        Node arrays and scalars needed to rebuild this forest
+
+        Returns:
+            Tuple of ({name: array} for ARRAY_FIELDS, {name: scalar})
+        """
+        arrays = {name: getattr(self, name) for name in self.ARRAY_FIELDS}
+        scalars = {
+            'max_depth': self.max_depth,
+            'denominator': self.denominator,
+            'offset': self.offset
+        }
+        return arrays, scalars
+
+    @classmethod
+    def from_arrays(cls, arrays, max_depth, denominator, offset):
+        """
+        Rebuild a forest from arrays() output without copying the node arrays
+
+        Args:
+            arrays: Dictionary with every name in ARRAY_FIELDS (may be np.memmap)
+            max_depth, denominator, offset: Scalars returned by arrays()
+
+        Returns:
+            FlatIsolationForest
+        """
+        pairs = arrays['children'].reshape(-1, 2)
+        return cls(
+            feature=arrays['feature'],
+            threshold=arrays['threshold'],
+            left=pairs[:, 0],
+            right=pairs[:, 1],
+            leaf_value=arrays['leaf_value'],
+            roots=arrays['roots'],
+            max_depth=max_depth,
+            denominator=denominator,
+            offset=offset,
+            children=arrays['children']
+        )
+
+    @classmethod
+    def from_sklearn(cls, model, scaler=None):
+        """
+        Export a fitted IsolationForest (and optional StandardScaler)
+
+        Args:
+            model: Fitted sklearn IsolationForest
+            scaler: Fitted StandardScaler applied before the forest, folded
+                into the thresholds so raw feature vectors can be scored
+
+        Returns:
+            FlatIsolationForest
+        """
+        from sklearn.ensemble._iforest import _average_path_length
+
+        n_features = model.n_features_in_
+        subsample_features = model._max_features != n_features
+
+        mean = np.zeros(n_features) if scaler is None else np.asarray(scaler.mean_, dtype=np.float64)
+        scale = np.ones(n_features) if scaler is None else np.asarray(scaler.scale_, dtype=np.float64)
+
+        features, thresholds, lefts, rights, leaf_values, roots = [], [], [], [], [], []
+        max_depth = 0
+        base = 0
+
+        for estimator, estimator_features in zip(model.estimators_, model.estimators_features_):
+            tree = estimator.tree_
+            n_nodes = tree.node_count
+            node_ids = np.arange(n_nodes)
+            is_leaf = tree.children_left == -1
+
+            tree_features = np.where(is_leaf, 0, tree.feature)
+            if subsample_features:
+                tree_features = np.asarray(estimator_features)[tree_features]
+
+            # Same per-leaf term sklearn adds: depth + c(n_leaf_samples) - 1
+            decision_path_lengths = _node_depths(tree)
+            average_path_lengths = _average_path_length(tree.n_node_samples)
+
+            features.append(tree_features)
+            thresholds.append(np.where(is_leaf, np.inf, tree.threshold))
+            lefts.append(base + np.where(is_leaf, node_ids, tree.children_left))
+            rights.append(base + np.where(is_leaf, node_ids, tree.children_right))
+            leaf_values.append(decision_path_lengths + average_path_lengths - 1.0)
+            roots.append(base)
+
+            max_depth = max(max_depth, tree.max_depth)
+            base += n_nodes
+
+        feature = np.concatenate(features).astype(np.intp)
+        threshold = np.concatenate(thresholds)
+        internal = np.isfinite(threshold)
+        threshold[internal] = fold_thresholds(threshold[internal], mean[feature[internal]], scale[feature[internal]])
+
+        denominator = len(model.estimators_) * _average_path_length([model._max_samples])[0]
+
+        return cls(
+            feature=feature,
+            threshold=threshold,
+            left=np.concatenate(lefts).astype(np.intp),
+            right=np.concatenate(rights).astype(np.intp),
+            leaf_value=np.concatenate(leaf_values).astype(np.float64),
+            roots=np.asarray(roots, dtype=np.intp),
+            max_depth=max_depth,
+            denominator=denominator,
+            offset=model.offset_
+        )
+
+    def leaf_attributions(self):
+        """
+        Attribution row of every node, built on first use
+
+        A leaf fixes its whole root path, so its row can be precomputed: for
+        each split on the path at depth d, 1 / (d + 1) goes to the split's
+        feature, and the row is scaled to sum to the leaf's share of credit,
+        1 / (path_length * n_trees). Internal nodes get zero rows.
+
+        Returns:
+            Numpy array of shape (n_nodes, n_features)
+        """
+        if self._leaf_attributions is None:
+            n_nodes = len(self.left)
+            is_leaf = self.left == np.arange(n_nodes)
+            n_features = int(self.feature[~is_leaf].max()) + 1 if (~is_leaf).any() else 0
+
+            weights = np.zeros((n_nodes, n_features))
+            frontier = np.asarray(self.roots)
+            for depth in range(self.max_depth):
+                parents = frontier[~is_leaf[frontier]]
+                for children in (self.left[parents], self.right[parents]):
+                    weights[children] = weights[parents]
+                    weights[children, self.feature[parents]] += 1.0 / (depth + 1)
+                frontier = np.concatenate([self.left[parents], self.right[parents]])
+
+            totals = weights.sum(axis=1)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                credit = 1.0 / (totals * self.leaf_value * len(self.roots))
+            credit = np.where(is_leaf & (totals > 0), credit, 0.0)
+            self._leaf_attributions = weights * credit[:, None]
+
+        return self._leaf_attributions
+
+    def leaves(self, X):
+        """
+        Global leaf id reached by every sample in every tree
+
+        Args:
+            X: Raw feature matrix of shape (n_samples, n_features)
+
+        Returns:
+            Numpy array of shape (n_samples, n_trees)
+        """
+        n_samples, n_features = X.shape
+        values = np.ascontiguousarray(X).ravel()
+        row_offsets = (np.arange(n_samples) * n_features)[:, None]
+        node = np.broadcast_to(self.roots, (n_samples, len(self.roots)))
+
+        for _ in range(self.max_depth):
+            go_right = ~(values[row_offsets + self.feature[node]] <= self.threshold[node])
+            node = self.children[2 * node + go_right]
+
+        return node
+
+    def _scores(self, path_lengths):
+        """score_samples values from per-tree path lengths of shape (n_samples, n_trees)"""
+        # Accumulate tree by tree like sklearn so the float sums match exactly
+        depths = np.cumsum(path_lengths, axis=1)[:, -1]
+
+        return -(2 ** (
+            -np.divide(depths, self.denominator, out=np.ones_like(depths), where=self.denominator != 0)
+        ))
+
+    def score_samples(self, X, chunk_size=256):
+        """
+        Equivalent of IsolationForest.score_samples(scaler.transform(X))
+
+        Args:
+            X: Raw feature matrix of shape (n_samples, n_features)
+            chunk_size: Rows walked at once, bounds the (rows x trees) buffers
+
+        Returns:
+            Numpy array of scores (lower = more abnormal)
+        """
+        X = np.asarray(X, dtype=np.float64)
+        scores = np.empty(X.shape[0])
+
+        for start in range(0, X.shape[0], chunk_size):
+            chunk = X[start:start + chunk_size]
+            scores[start:start + chunk_size] = self._scores(self.leaf_value[self.leaves(chunk)])
+
+        return scores
+
+    def score_and_attribute(self, X, chunk_size=256, leaves=None):
+        """
+        Scores plus per-feature attributions from the same walk down the trees
+
+        Each tree gives a sample 1 / path_length of isolation credit (a short
+        path means the sample was easy to isolate) and shares it among the
+        features split on along that sample's path. The split at depth d gets
+        weight 1 / (d + 1), so splits that cut the sample off early count the
+        most. Credit is averaged over trees, so a row sums to the mean inverse
+        path length and anomalous rows have larger totals.
+
+        Args:
+            X: Raw feature matrix of shape (n_samples, n_features)
+            chunk_size: Rows walked at once, bounds the (rows x trees x features) buffer
+            leaves: Leaf ids of shape (n_samples, n_trees) if already found
+                (e.g. by sklearn's own tree walk), instead of walking the
+                flattened arrays
+
+        Returns:
+            Tuple of (scores identical to score_samples, attributions of shape
+            (n_samples, n_features))
+        """
+        X = np.asarray(X, dtype=np.float64)
+        n_samples, n_features = X.shape
+        scores = np.empty(n_samples)
+        attributions = np.zeros((n_samples, n_features))
+
+        leaf_attributions = self.leaf_attributions()
+        # Trailing features no tree splits on have no column and stay zero
+        width = leaf_attributions.shape[1]
+
+        for start in range(0, n_samples, chunk_size):
+            if leaves is None:
+                chunk_leaves = self.leaves(X[start:start + chunk_size])
+            else:
+                chunk_leaves = leaves[start:start + chunk_size]
+            scores[start:start + chunk_size] = self._scores(self.leaf_value[chunk_leaves])
+            # Gathered tree-major so the sum over trees adds contiguous blocks
+            attributions[start:start + chunk_size, :width] = np.take(leaf_attributions, chunk_leaves.T, axis=0).sum(axis=0)
+
+        return scores, attributions
+
+    def predict(self, X):
+        """Scores plus the IsolationForest.predict decision (True = anomaly)"""
+        scores = self.score_samples(X)
+        return scores, (scores - self.offset) < 0
+
+
+def _node_depths(tree):
+    """Depth of every node counted from 1 at the root"""
+    children_left = tree.children_left
+    children_right = tree.children_right
+    depths = np.zeros(tree.node_count, dtype=np.float64)
+    depths[0] = 1.0
+    # Children always have larger ids than their parent in sklearn trees
+    for node in range(tree.node_count):
+        left = children_left[node]
+        if left != -1:
+            depths[left] = depths[node] + 1.0
+            depths[children_right[node]] = depths[node] + 1.0
+    return depths
@@ -0,0 +1,692 @@
+#!/usr/bin/env python3
+"""
+Inference-only scoring for the anomaly detection model
+Depends on NumPy alone, so a service serving memory-mapped models starts
+without importing pandas or the scikit-learn training stack.
+AnomalyDetector extends InferenceModel with training and pickle support
+"""
+
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from models.forest_evaluator import FlatIsolationForest
+
+# Mean Earth radius used for haversine distances
+EARTH_RADIUS_KM = 6371.0
+
+# Version of the directory layout written by AnomalyDetector.save(format='mmap')
+MAPPED_FORMAT_VERSION = 1
+
+# Global feature importance results kept per model (keyed by version + data)
+IMPORTANCE_CACHE_SIZE = 16
+
+# Top contributing features added to every prediction
+DEFAULT_EXPLAIN_TOP = 5
+
+
+def temperature_anomaly_score(temperature):
+    """Malaysia typical temp range: 23-35°C, scored by distance from 29°C outside it"""
+    temperature = np.asarray(temperature, dtype=float)
+    return np.where((temperature >= 23) & (temperature <= 35), 0.0, np.abs(temperature - 29) / 10)
+
+
+def moisture_anomaly_score(moisture):
+    """Typical range: 0-100%, scored by distance from 50% outside it"""
+    moisture = np.asarray(moisture, dtype=float)
+    return np.where((moisture >= 0) & (moisture <= 100), 0.0, np.abs(moisture - 50) / 50)
+
+
+def _deviation(values, medians):
+    """Relative deviation from a reference median"""
+    return np.abs(values - medians) / (medians + 0.01)
+
+
+def file_digest(path):
+    """Short content hash of a model artifact, used as its model version"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()[:12]
+
+
+def _as_float(value):
+    """Coerce a raw record value to float, treating missing values as NaN"""
+    if value is None or value == '':
+        return np.nan
+    return float(value)
+
+
+def _start_timer(timings):
+    """Start a stage timer, or None when the caller isn't collecting timings"""
+    return time.perf_counter() if timings is not None else None
+
+
+def _lap(timings, stage, since):
+    """Add the time elapsed since `since` to timings[stage] and restart the timer"""
+    if timings is None:
+        return None
+    now = time.perf_counter()
+    timings[stage] = timings.get(stage, 0.0) + now - since
+    return now
+
+
+def arrays_digest(arrays):
+    """sha256 hex digest of named arrays, the content hash of a mapped model directory"""
+    digest = hashlib.sha256()
+    for name in sorted(arrays):
+        digest.update(name.encode())
+        digest.update(np.ascontiguousarray(arrays[name]).tobytes())
+    return digest.hexdigest()
+
+
+def mapped_digest(path):
+    """Recompute the digest of a mapped model directory from its arrays"""
+    names = [name[:-len('.npy')] for name in os.listdir(path) if name.endswith('.npy')]
+    return arrays_digest({name: mapped_array(path, name) for name in names})
+
+
+def mapped_array(path, name):
+    """Plain read-only ndarray view over one memory-mapped .npy file of a model directory"""
+    return np.asarray(np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r'))
+
+
+def load_model(path):
+    """
+    Load a model for serving with the lightest class that can read it
+
+    Args:
+        path: Memory-mapped model directory or legacy joblib pickle
+
+    Returns:
+        InferenceModel for mapped directories, AnomalyDetector for pickles
+        (unpickling needs scikit-learn anyway)
+    """
+    if os.path.isdir(path):
+        return InferenceModel().load(path)
+
+    from models.anomaly_detector import AnomalyDetector
+    return AnomalyDetector().load(path)
+
+
+class InferenceModel:
+    """
+    Scores batch records with a flattened forest and precompiled lookup tables
+    """
+
+    def __init__(self, contamination=0.15):
+        """
+        Args:
+            contamination: Expected proportion of anomalies in dataset
+        """
+        # Content hash of the artifact this model was saved to / loaded from
+        self.model_version = None
+        self.contamination = contamination
+
+        # Flattened forest with the scaler folded in, used on the scoring hot path
+        self.flat_forest = None
+        self._importance_cache = OrderedDict()
+
+        # Number of topFeatures per prediction (0 = no explanations)
+        self.explain_top = DEFAULT_EXPLAIN_TOP
+
+        # Label -> code lookup tables for the categorical features
+        self.category_tables = {}
+
+        # Per-crop median price/quantity learned in training, None until then
+        self.reference_stats = None
+
+        # Features to use for anomaly detection
+        self.numeric_features = [
+            'latitude', 'longitude', 'quantity', 'pricePerUnit',
+            'temperature', 'humidity', 'moistureContent'
+        ]
+
+        self.categorical_features = [
+            'crop', 'qualityGrade', 'weather_main'
+        ]
+
+        self.engineered_features = [
+            'distance_from_region_center',
+            'price_deviation_from_median',
+            'quantity_deviation',
+            'temp_anomaly_score',
+            'moisture_anomaly_score'
+        ]
+
+        self.all_features = self.numeric_features + self.categorical_features + self.engineered_features
+
+        # Region centers for distance calculation (Malaysia)
+        self.region_centers = {
+            'north': (6.0, 100.5),   # Kedah/Perlis area
+            'central': (3.2, 101.5),  # Selangor/KL area
+            'south': (1.9, 103.5),    # Johor area
+            'east': (3.8, 103.0),     # Pahang/Terengganu area
+            'borneo': (5.5, 116.0)    # Sabah/Sarawak area
+        }
+
+    def distance_to_nearest_region(self, lat, lng):
+        """
+        Great-circle distance to the closest region center
+
+        All points are broadcast against the region-center matrix in one pass,
+        so the cost is a handful of array operations regardless of row count.
+
+        Args:
+            lat: Array of latitudes in degrees
+            lng: Array of longitudes in degrees
+
+        Returns:
+            Array of haversine distances in km (NaN where coordinates are missing)
+        """
+        centers = np.radians(np.array(list(self.region_centers.values()), dtype=float))
+        lat = np.radians(np.asarray(lat, dtype=float)).reshape(-1, 1)
+        lng = np.radians(np.asarray(lng, dtype=float)).reshape(-1, 1)
+
+        center_lat = centers[:, 0]
+        center_lng = centers[:, 1]
+
+        a = (
+            np.sin((lat - center_lat) / 2) ** 2
+            + np.cos(lat) * np.cos(center_lat) * np.sin((lng - center_lng) / 2) ** 2
+        )
+        distances = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+        return distances.min(axis=1)
+
+    def reference_median(self, crop, grade, column):
+        """
+        Look up the reference median for one batch
+
+        Falls back from crop+grade to crop to the global median, so unseen
+        crops are still compared against the overall market.
+        """
+        stats = self.reference_stats
+        grade_stats = stats.get('crop_grade', {}).get(crop, {}).get(grade)
+        if grade_stats is not None:
+            return grade_stats[column]
+
+        crop_stats = stats['crop'].get(crop)
+        if crop_stats is not None:
+            return crop_stats[column]
+
+        return stats['global'][column]
+
+    def record_to_vector(self, record, timings=None):
+        """
+        Build the model input for a single batch record without pandas
+
+        Mirrors prepare_features(training=False) for a one-row frame: engineered
+        features are computed from the raw values, then missing values become 0
+        and unknown categories become -1.
+
+        Args:
+            record: Dictionary with batch information
+            timings: Optional dictionary that receives per-stage seconds
+
+        Returns:
+            Numpy array of shape (n_features,) in all_features order
+        """
+        timer = _start_timer(timings)
+        values = {col: _as_float(record.get(col)) for col in self.numeric_features}
+
+        values['distance_from_region_center'] = float(
+            self.distance_to_nearest_region(values.get('latitude', np.nan), values.get('longitude', np.nan))[0]
+        )
+
+        # Without a reference table a one-row frame is its own crop median
+        if self.reference_stats is None:
+            values['price_deviation_from_median'] = 0.0
+            values['quantity_deviation'] = 0.0
+        else:
+            crop, grade = str(record.get('crop')), str(record.get('qualityGrade'))
+            values['price_deviation_from_median'] = _deviation(
+                values.get('pricePerUnit', np.nan), self.reference_median(crop, grade, 'pricePerUnit')
+            )
+            values['quantity_deviation'] = _deviation(
+                values.get('quantity', np.nan), self.reference_median(crop, grade, 'quantity')
+            )
+        values['temp_anomaly_score'] = float(temperature_anomaly_score(values.get('temperature', np.nan)))
+        values['moisture_anomaly_score'] = float(moisture_anomaly_score(values.get('moistureContent', np.nan)))
+        timer = _lap(timings, 'engineer_features', timer)
+
+        for col in self.categorical_features:
+            values[col] = self._encode_category(col, str(record.get(col)))
+
+        x = np.empty(len(self.all_features))
+        for i, feature in enumerate(self.all_features):
+            x[i] = values.get(feature, 0.0)
+
+        x[np.isnan(x)] = 0.0
+        _lap(timings, 'encoding', timer)
+        return x
+
+    def records_to_matrix(self, records):
+        """
+        Vectorized record_to_vector for many batch records
+
+        Each record is treated independently (exactly as predict would treat
+        it on its own): per-crop deviations come from the reference table,
+        never from the other records in the batch.
+
+        Args:
+            records: List of dictionaries with batch information
+
+        Returns:
+            Numpy array of shape (n_records, n_features) in all_features order
+        """
+        numeric = np.array([self._numeric_values(record) for record in records], dtype=float)
+        return self._assemble_matrix(numeric.reshape(len(records), len(self.numeric_features)), records)
+
+    def _numeric_values(self, record):
+        """Raw numeric feature values of one record, NaN where missing"""
+        return [_as_float(record.get(col)) for col in self.numeric_features]
+
+    def _assemble_matrix(self, numeric, records, timings=None):
+        """Build the feature matrix from the numeric block plus categorical labels"""
+        timer = _start_timer(timings)
+        n_rows = numeric.shape[0]
+        values = {col: numeric[:, j] for j, col in enumerate(self.numeric_features)}
+        missing = np.full(n_rows, np.nan)
+
+        values['distance_from_region_center'] = self.distance_to_nearest_region(
+            values.get('latitude', missing), values.get('longitude', missing)
+        )
+        if self.reference_stats is None:
+            values['price_deviation_from_median'] = 0.0
+            values['quantity_deviation'] = 0.0
+        else:
+            keys = [(str(record.get('crop')), str(record.get('qualityGrade'))) for record in records]
+            for column, feature in [('pricePerUnit', 'price_deviation_from_median'), ('quantity', 'quantity_deviation')]:
+                medians = np.array([self.reference_median(crop, grade, column) for crop, grade in keys], dtype=float)
+                values[feature] = _deviation(values.get(column, missing), medians)
+
+        values['temp_anomaly_score'] = temperature_anomaly_score(values.get('temperature', missing))
+        values['moisture_anomaly_score'] = moisture_anomaly_score(values.get('moistureContent', missing))
+        timer = _lap(timings, 'engineer_features', timer)
+
+        for col in self.categorical_features:
+            values[col] = [self._encode_category(col, str(record.get(col))) for record in records]
+
+        X = np.empty((n_rows, len(self.all_features)))
+        for i, feature in enumerate(self.all_features):
+            X[:, i] = values.get(feature, 0.0)
+
+        X[np.isnan(X)] = 0.0
+        _lap(timings, 'encoding', timer)
+        return X
+
+    def compile_category_tables(self, classes):
+        """
+        Compile label -> code lookup tables
+
+        Codes are positions in each column's sorted classes (LabelEncoder
+        order), so lookups give the same codes as transform() in O(1).
+
+        Args:
+            classes: Dictionary of column -> list of class labels
+        """
+        self.category_tables = {
+            col: {label: code for code, label in enumerate(labels)}
+            for col, labels in classes.items()
+        }
+
+    def _encode_category(self, col, label):
+        """Encode one categorical label, mapping unseen labels to -1"""
+        return self.category_tables[col].get(label, -1)
+
+    def _check_loaded(self):
+        if self.flat_forest is None:
+            raise Exception("Model not loaded yet. Call load() first.")
+
+    def _score_vectors(self, X, timings=None):
+        """
+        Score raw feature vectors in a single pass over the forest
+
+        The scaler is folded into the split thresholds, so there is no
+        separate scaling stage on this path.
+
+        Args:
+            X: Numpy array of shape (n_samples, n_features)
+            timings: Optional dictionary that receives per-stage seconds
+
+        Returns:
+            Tuple of (raw score_samples values, boolean anomaly mask)
+        """
+        timer = _start_timer(timings)
+        result = self.flat_forest.predict(X)
+        _lap(timings, 'tree_scoring', timer)
+        return result
+
+    def predict(self, batch_data, timings=None):
+        """
+        Predict if a batch is anomalous
+
+        Args:
+            batch_data: Dictionary with batch information
+            timings: Optional dictionary that receives per-stage seconds
+
+        Returns:
+            Dictionary with prediction results
+        """
+        self._check_loaded()
+
+        return self.predict_vectors(self.record_to_vector(batch_data, timings).reshape(1, -1), timings)[0]
+
+    def predict_vectors(self, X, timings=None):
+        """
+        Predict anomalies for feature vectors that are already built
+
+        For callers that needed the vectors anyway (e.g. as cache keys), so
+        records aren't converted twice.
+
+        Args:
+            X: Array of shape (n_records, n_features) from record_to_vector
+            timings: Optional dictionary that receives per-stage seconds
+
+        Returns:
+            List with one prediction result per row
+        """
+        self._check_loaded()
+
+        scores, is_anomaly, explanations = self._score_and_explain(X, timings)
+        return [
+            self._format_result(is_anomaly[row], scores[row], explanations[row])
+            for row in range(len(X))
+        ]
+
+    def set_explanations(self, top_features):
+        """
+        Choose how many top contributing features predictions carry
+
+        Builds the per-leaf attribution table up front, so the first request
+        (or every forked worker) doesn't pay for it.
+
+        Args:
+            top_features: Features listed in topFeatures (0 turns explanations off)
+        """
+        self.explain_top = top_features
+        if top_features:
+            self.attribution_forest().leaf_attributions()
+
+    def _score_and_explain(self, X, timings=None):
+        """
+        Score feature vectors and, when enabled, explain them from the same walk
+
+        Returns:
+            Tuple of (raw scores, boolean anomaly mask, per-row topFeatures
+            lists, or None per row when explanations are off)
+        """
+        if not self.explain_top:
+            scores, is_anomaly = self._score_vectors(X, timings)
+            return scores, is_anomaly, [None] * len(scores)
+
+        timer = _start_timer(timings)
+        scores, is_anomaly, attributions = self._attribute_vectors(X)
+        timer = _lap(timings, 'tree_scoring', timer)
+        explanations = self._top_features(attributions)
+        _lap(timings, 'explanation', timer)
+        return scores, is_anomaly, explanations
+
+    def _top_features(self, attributions):
+        """Largest attributions of every row with their share of the row total"""
+        names = self.all_features
+
+        if len(attributions) == 1:
+            # NumPy's per-call overhead costs more than sorting one short row
+            row = attributions[0].tolist()
+            columns = [sorted(range(len(row)), key=row.__getitem__, reverse=True)[:self.explain_top]]
+            values = [[row[column] for column in columns[0]]]
+            totals = [sum(row)]
+        else:
+            # One stable sort over the whole matrix, so ties keep column order
+            ranked = np.argsort(-attributions, axis=1, kind='stable')[:, :self.explain_top]
+            columns = ranked.tolist()
+            values = np.take_along_axis(attributions, ranked, axis=1).tolist()
+            # Summed left to right like sum() above, so shares match exactly
+            totals = np.cumsum(attributions, axis=1)[:, -1].tolist() if attributions.shape[1] else [0.0] * len(columns)
+
+        return [
+            [
+                {
+                    'feature': names[column],
+                    'contribution': value,
+                    'share': value / total if total > 0 else 0.0
+                }
+                for column, value in zip(row_columns, row_values)
+            ]
+            for row_columns, row_values, total in zip(columns, values, totals)
+        ]
+
+    def _format_result(self, is_anomaly, anomaly_score, top_features=None):
+        """Turn one raw forest score (and its explanation) into the API result dictionary"""
+        # Convert anomaly score to 0-1 range (lower score = more anomalous)
+        # Isolation Forest scores are typically in range [-1, 1]
+        normalized_score = float(1 / (1 + np.exp(anomaly_score)))  # Sigmoid transformation
+
+        # Determine risk level
+        if normalized_score > 0.7:
+            risk_level = 'HIGH'
+        elif normalized_score > 0.5:
+            risk_level = 'MEDIUM'
+        else:
+            risk_level = 'LOW'
+
+        result = {
+            'isAnomaly': bool(is_anomaly),
+            'anomalyScore': float(normalized_score),
+            'confidence': float(1 - normalized_score) if not is_anomaly else float(normalized_score),
+            'riskLevel': risk_level,
+            'recommendation': 'REVIEW' if is_anomaly else 'APPROVE'
+        }
+        if top_features is not None:
+            result['topFeatures'] = top_features
+        return result
+
+    def predict_many(self, records, timings=None):
+        """
+        Predict anomalies for many batch records in one vectorized pass
+
+        Records that cannot be converted to features (non-dict items or
+        non-numeric values) are reported individually and do not affect the
+        rest of the batch.
+
+        Args:
+            records: List of dictionaries with batch information
+            timings: Optional dictionary that receives per-stage seconds
+
+        Returns:
+            List with one result per input record, in input order. Invalid
+            records get {'error': message} instead of a prediction.
+        """
+        self._check_loaded()
+
+        timer = _start_timer(timings)
+        results = [None] * len(records)
+        valid_index, numeric_rows = [], []
+
+        for i, record in enumerate(records):
+            try:
+                numeric_rows.append(self._numeric_values(record))
+                valid_index.append(i)
+            except (AttributeError, TypeError, ValueError) as e:
+                results[i] = {'error': f'Invalid record: {e}'}
+
+        _lap(timings, 'engineer_features', timer)
+
+        if valid_index:
+            valid_records = [records[i] for i in valid_index]
+            numeric = np.array(numeric_rows, dtype=float)
+            X = self._assemble_matrix(numeric, valid_records, timings)
+            scores, is_anomaly, explanations = self._score_and_explain(X, timings)
+
+            for row, i in enumerate(valid_index):
+                results[i] = self._format_result(is_anomaly[row], scores[row], explanations[row])
+
+        return results
+
+    def attribution_forest(self):
+        """Forest whose split structure feature attributions are read from"""
+        return self.flat_forest
+
+    def _attribute_vectors(self, X):
+        """
+        Score feature vectors and attribute each score to features in one pass
+
+        Args:
+            X: Numpy array of shape (n_samples, n_features)
+
+        Returns:
+            Tuple of (raw score_samples values, boolean anomaly mask,
+            attributions of shape (n_samples, n_features))
+        """
+        forest = self.attribution_forest()
+        scores, attributions = forest.score_and_attribute(X)
+        return scores, (scores - forest.offset) < 0, attributions
+
+    def feature_attributions(self, records):
+        """
+        Per-sample feature attributions from each record's isolation paths
+
+        See FlatIsolationForest.score_and_attribute for the weighting. Larger
+        values mean the feature did more to isolate the record.
+
+        Args:
+            records: List of dictionaries with batch information
+
+        Returns:
+            List with one {feature: attribution} dictionary per record, in
+            input order. Invalid records get {'error': message} instead.
+        """
+        self._check_loaded()
+
+        results = [None] * len(records)
+        valid_index, numeric_rows = [], []
+        for i, record in enumerate(records):
+            try:
+                numeric_rows.append(self._numeric_values(record))
+                valid_index.append(i)
+            except (AttributeError, TypeError, ValueError) as e:
+                results[i] = {'error': f'Invalid record: {e}'}
+
+        if valid_index:
+            X = self._assemble_matrix(np.array(numeric_rows, dtype=float), [records[i] for i in valid_index])
+            _, _, attributions = self._attribute_vectors(X)
+            for row, i in enumerate(valid_index):
+                results[i] = dict(zip(self.all_features, attributions[row].tolist()))
+
+        return results
+
+    def feature_importance(self, records):
+        """
+        Global feature importance over a set of batch records
+
+        Args:
+            records: List of dictionaries with batch information
+
+        Returns:
+            Dictionary described in _summarize_attributions
+        """
+        self._check_loaded()
+        numeric = np.array([self._numeric_values(record) for record in records], dtype=float)
+        return self._importance_from_matrix(self._assemble_matrix(numeric, records))
+
+    def _importance_from_matrix(self, X):
+        """Global importance of a feature matrix, cached per model version and data"""
+        key = (self.model_version, hashlib.sha1(np.ascontiguousarray(X, dtype=np.float64).tobytes()).hexdigest())
+        cached = self._importance_cache.get(key)
+        if cached is not None:
+            self._importance_cache.move_to_end(key)
+            return cached
+
+        _, is_anomaly, attributions = self._attribute_vectors(X)
+        summary = self._summarize_attributions(attributions, is_anomaly)
+
+        self._importance_cache[key] = summary
+        while len(self._importance_cache) > IMPORTANCE_CACHE_SIZE:
+            self._importance_cache.popitem(last=False)
+        return summary
+
+    def _summarize_attributions(self, attributions, is_anomaly):
+        """
+        Average per-sample attributions into a global ranking
+
+        Returns:
+            Dictionary with sample counts and a 'features' list sorted by
+            importance, each with its share of the total and its mean over
+            anomalous and normal samples
+        """
+        overall = attributions.mean(axis=0) if len(attributions) else np.zeros(len(self.all_features))
+        total = overall.sum()
+
+        def mean_where(mask):
+            return attributions[mask].mean(axis=0) if mask.any() else np.zeros(len(self.all_features))
+
+        anomalous, normal = mean_where(is_anomaly), mean_where(~is_anomaly)
+
+        features = [
+            {
+                'feature': name,
+                'importance': float(overall[i]),
+                'share': float(overall[i] / total) if total > 0 else 0.0,
+                'anomalous': float(anomalous[i]),
+                'normal': float(normal[i])
+            }
+            for i, name in enumerate(self.all_features)
+        ]
+        features.sort(key=lambda item: item['importance'], reverse=True)
+
+        return {
+            'modelVersion': self.model_version,
+            'samples': int(len(attributions)),
+            'anomalies': int(is_anomaly.sum()),
+            'features': features
+        }
+
+    def _load_mapped(self, path):
+        """
+        Open the arrays and metadata of a memory-mapped model directory
+
+        Returns:
+            The parsed meta.json, for subclasses that restore more state
+        """
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+
+        if meta.get('format') != MAPPED_FORMAT_VERSION:
+            raise ValueError(f"Unsupported mapped model format: {meta.get('format')}")
+
+        forest_arrays = {
+            name: mapped_array(path, f'forest_{name}') for name in FlatIsolationForest.ARRAY_FIELDS
+        }
+        self.flat_forest = FlatIsolationForest.from_arrays(forest_arrays, **meta['forest'])
+        self._importance_cache.clear()
+
+        self.model_version = meta['digest'][:12]
+        self.contamination = meta['contamination']
+        self.reference_stats = meta['reference_stats']
+        self.numeric_features = meta['numeric_features']
+        self.categorical_features = meta['categorical_features']
+        self.engineered_features = meta['engineered_features']
+        self.all_features = self.numeric_features + self.categorical_features + self.engineered_features
+        self.compile_category_tables(meta['label_encoders'])
+        return meta
+
+    def load(self, path):
+        """
+        Load a memory-mapped model directory written by AnomalyDetector.save(format='mmap')
+
+        Args:
+            path: Model directory
+
+        Returns:
+            self
+        """
+        self._load_mapped(path)
+        print(f"✅ Model loaded from {path} (memory-mapped)")
+        return self
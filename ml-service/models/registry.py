@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Versioned model registry
+A directory of content-hashed model artifacts, each with a JSON sidecar
+manifest that describes the model without unpickling it:
+
+    registry/
+        v0001-3f2a9c1b7d4e.pkl
+        v0001-3f2a9c1b7d4e.model/
+        v0001-3f2a9c1b7d4e.json
+        v0002-a81c0e55f930.pkl
+        v0002-a81c0e55f930.model/
+        v0002-a81c0e55f930.json
+
+The pickle keeps the full sklearn model for retraining; the memory-mapped
+.model directory is what serving processes load, so every pre-fork worker
+maps the same page-cache pages instead of unpickling a private copy.
+"""
+
+import hashlib
+import json
+import os
+import re
+import tempfile
+from datetime import datetime, timezone
+
+VERSION_PATTERN = re.compile(r'^v(\d{4,})-([0-9a-f]{12})\.json$')
+
+
+def sha256_file(path):
+    """Full sha256 hex digest of a file"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ModelRegistry:
+    """
+    Publishes and resolves model versions in a registry directory
+
+    The manifest is written last, so a version only becomes visible once
+    its artifact is complete.
+    """
+
+    def __init__(self, root):
+        """
+        Args:
+            root: Registry directory (created on first publish)
+        """
+        self.root = root
+
+    def versions(self):
+        """
+        Published versions, oldest first
+
+        Returns:
+            List of manifest dictionaries
+        """
+        if not os.path.isdir(self.root):
+            return []
+
+        found = []
+        for name in os.listdir(self.root):
+            match = VERSION_PATTERN.match(name)
+            if match:
+                found.append((int(match.group(1)), name[:-len('.json')]))
+
+        return [self.manifest(version) for _, version in sorted(found)]
+
+    def latest(self):
+        """Manifest of the newest published version, or None"""
+        versions = self.versions()
+        return versions[-1] if versions else None
+
+    def manifest(self, version):
+        """Read a version's sidecar manifest"""
+        with open(os.path.join(self.root, f"{version}.json")) as f:
+            return json.load(f)
+
+    def artifact_path(self, manifest):
+        """Absolute path of a version's model artifact"""
+        return os.path.join(self.root, manifest['artifact'])
+
+    def publish(self, detector, metrics=None, mapped=True):
+        """
+        Save a trained detector as the next registry version
+
+        Args:
+            detector: Trained AnomalyDetector
+            metrics: Results dictionary returned by AnomalyDetector.train
+            mapped: Also write the memory-mapped serving copy
+
+        Returns:
+            Manifest of the new version
+        """
+        os.makedirs(self.root, exist_ok=True)
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix='.pkl.tmp')
+        os.close(fd)
+        try:
+            detector.save(tmp_path)
+            sha256 = sha256_file(tmp_path)
+
+            latest = self.latest()
+            sequence = latest['sequence'] + 1 if latest else 1
+            version = f"v{sequence:04d}-{sha256[:12]}"
+
+            manifest = {
+                'version': version,
+                'sequence': sequence,
+                'artifact': f"{version}.pkl",
+                'sha256': sha256,
+                'createdAt': datetime.now(timezone.utc).isoformat(),
+                'contamination': detector.contamination,
+                'features': {
+                    'numeric': detector.numeric_features,
+                    'categorical': detector.categorical_features,
+                    'engineered': detector.engineered_features
+                },
+                'metrics': metrics or {}
+            }
+
+            os.replace(tmp_path, os.path.join(self.root, manifest['artifact']))
+
+            # Serving copy; versions published before this existed only have the pickle
+            if mapped and detector.flat_forest is not None:
+                mapped_path = os.path.join(self.root, f"{version}.model")
+                detector.save(mapped_path, format='mmap')
+                with open(os.path.join(mapped_path, 'meta.json')) as f:
+                    manifest['mapped'] = f"{version}.model"
+                    manifest['mappedDigest'] = json.load(f)['digest']
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        self._write_manifest(manifest)
+        detector.model_version = version
+        print(f"📦 Published model {version} to {self.root}")
+        return manifest
+
+    def _write_manifest(self, manifest):
+        tmp_path = os.path.join(self.root, f".{manifest['version']}.json.tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, os.path.join(self.root, f"{manifest['version']}.json"))
+
+    def load(self, manifest, mapped=True):
+        """
+        Load a published version, checking the artifact against its manifest
+
+        Args:
+            manifest: Manifest dictionary (see versions / latest)
+            mapped: Load the memory-mapped serving copy when the version has
+                one (an InferenceModel sharing its pages with every other
+                process that maps it); False loads the pickled AnomalyDetector
+
+        Returns:
+            Model whose model_version is the registry version
+        """
+        if mapped and manifest.get('mapped'):
+            from models.inference import InferenceModel, mapped_digest
+
+            path = os.path.join(self.root, manifest['mapped'])
+            if mapped_digest(path) != manifest['mappedDigest']:
+                raise ValueError(f"Artifact {path} does not match its manifest checksum")
+            detector = InferenceModel().load(path)
+        else:
+            from models.anomaly_detector import AnomalyDetector
+
+            path = self.artifact_path(manifest)
+            if sha256_file(path) != manifest['sha256']:
+                raise ValueError(f"Artifact {path} does not match its manifest checksum")
+            detector = AnomalyDetector().load(path)
+
+        detector.model_version = manifest['version']
+        return detector
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Production entry point for the ML service
+Loads the model once in the master process, then forks workers that share
+it copy-on-write (see serving/prefork.py)
+
+Usage:
+    python serve.py --workers 4 --threads 8
+    kill -HUP <master pid>     # rolling worker recycle
+    kill -TERM <master pid>    # graceful shutdown
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Pre-fork ML service server')
+    parser.add_argument('--host', default=os.getenv('ML_HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=int(os.getenv('ML_PORT', '5000')))
+    parser.add_argument('--workers', type=int, default=int(os.getenv('ML_WORKERS', os.cpu_count() or 1)),
+                        help='Worker processes (default: CPU count)')
+    parser.add_argument('--threads', type=int, default=int(os.getenv('ML_THREADS', '4')),
+                        help='Request threads per worker')
+    parser.add_argument('--max-requests', type=int, default=int(os.getenv('ML_MAX_REQUESTS', '0')),
+                        help='Recycle a worker after this many requests (0 = never)')
+    parser.add_argument('--max-requests-jitter', type=int, default=int(os.getenv('ML_MAX_REQUESTS_JITTER', '0')))
+    parser.add_argument('--graceful-timeout', type=float, default=float(os.getenv('ML_GRACEFUL_TIMEOUT', '30')),
+                        help='Seconds a stopping worker gets to finish in-flight requests')
+    parser.add_argument('--ready-file', default=os.getenv('ML_READY_FILE'),
+                        help='File written once every worker is serving')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    import app as ml_app
+    from serving.prefork import PreforkServer
+
+    # Finish loading the model in the master before any fork, so workers
+    # share it and no loader thread is lost across fork()
+    ml_app.model_loaded.wait()
+
+    PreforkServer(
+        ml_app.app,
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        threads=args.threads,
+        max_requests=args.max_requests,
+        max_requests_jitter=args.max_requests_jitter,
+        graceful_timeout=args.graceful_timeout,
+        ready_file=args.ready_file,
+        post_fork=ml_app.start_process_threads
+    ).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+In-process result cache for ML scoring
+Bounded LRU with a TTL, plus single-flight collapsing so concurrent
+identical requests wait on one computation instead of all scoring
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+def feature_cache_key(feature_vector, model_version):
+    """
+    Canonical cache key for a normalized feature vector
+
+    Args:
+        feature_vector: Numpy array in the model's feature order
+        model_version: Version of the model that will score it
+
+    Returns:
+        Hex digest identifying (model version, feature values)
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(str(model_version).encode())
+    digest.update(feature_vector.astype('<f8', copy=False).tobytes())
+    return digest.hexdigest()
+
+
+class _Flight:
+    """A computation in progress that other callers can wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class ScoringCache:
+    """
+    Thread-safe LRU cache with per-entry TTL and single-flight deduplication
+    """
+
+    def __init__(self, max_entries=10000, ttl_seconds=60.0, clock=time.monotonic):
+        """
+        Args:
+            max_entries: Maximum cached results; 0 disables caching
+            ttl_seconds: Seconds a cached result stays valid
+            clock: Monotonic time source
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._flights = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get_or_compute(self, key, compute):
+        """
+        Return the cached value for key, computing it at most once
+
+        Concurrent callers with the same key share one call to compute().
+        Errors are propagated to every waiter and are never cached.
+
+        Args:
+            key: Cache key, see feature_cache_key
+            compute: Zero-argument callable producing the value
+
+        Returns:
+            Cached or freshly computed value
+        """
+        if self.max_entries <= 0:
+            return compute()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > self.clock():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+                self.expirations += 1
+
+            flight = self._flights.get(key)
+            if flight is not None:
+                self.coalesced += 1
+                leader = False
+            else:
+                flight = self._flights[key] = _Flight()
+                self.misses += 1
+                leader = True
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = compute()
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+                if flight.error is None:
+                    self._store(key, flight.value)
+            flight.done.set()
+
+        return flight.value
+
+    def _store(self, key, value):
+        """Insert under the lock, evicting least recently used entries"""
+        self._entries[key] = (self.clock() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        """Drop every cached result"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Counters for /health and the cache stats route"""
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                'enabled': self.max_entries > 0,
+                'size': len(self._entries),
+                'maxEntries': self.max_entries,
+                'ttlSeconds': self.ttl_seconds,
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'inFlight': len(self._flights),
+                'hitRate': (self.hits + self.coalesced) / lookups if lookups else 0.0
+            }
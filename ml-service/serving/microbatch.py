@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Asyncio micro-batching for ML inference
+Single-batch requests are queued and flushed every few milliseconds (or
+when the batch is full) into one vectorized scoring call, then the results
+are fanned back out to the waiting callers
+"""
+
+import asyncio
+import bisect
+import os
+import threading
+import time
+
+
+class Histogram:
+    """Fixed-bucket histogram with count/sum/max, cheap enough for every request"""
+
+    def __init__(self, bounds):
+        self.bounds = list(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def snapshot(self):
+        labels = [f'<={b:g}' for b in self.bounds] + [f'>{self.bounds[-1]:g}']
+        return {
+            'count': self.count,
+            'mean': self.total / self.count if self.count else 0.0,
+            'max': self.max,
+            'buckets': dict(zip(labels, self.counts))
+        }
+
+
+class MicroBatcher:
+    """
+    Collects concurrent scoring requests into vectorized batches
+
+    The scheduler runs on its own event loop thread. A flush happens when
+    max_batch_size items are queued or max_wait_ms after the first item of
+    a batch arrived, whichever comes first.
+    """
+
+    def __init__(self, score_many, max_batch_size=64, max_wait_ms=5.0):
+        """
+        Args:
+            score_many: Callable taking a list of items and returning one
+                result per item, in order
+            max_batch_size: Largest number of items scored in one call
+            max_wait_ms: Longest time the first queued item waits for company
+        """
+        self.score_many = score_many
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+
+        self.flush_sizes = Histogram([1, 2, 4, 8, 16, 32, 64, 128, 256])
+        self.queue_wait_ms = Histogram([0.5, 1, 2, 5, 10, 20, 50, 100])
+        self.flush_reasons = {'size': 0, 'timer': 0}
+
+        self._loop = None
+        self._queue = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_started(self):
+        """Start the scheduler thread, again after a fork (threads don't survive it)"""
+        if self._pid == os.getpid():
+            return
+
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+
+            loop = asyncio.new_event_loop()
+            ready = threading.Event()
+
+            def run():
+                asyncio.set_event_loop(loop)
+                self._queue = asyncio.Queue()
+                loop.create_task(self._schedule())
+                ready.set()
+                loop.run_forever()
+
+            threading.Thread(target=run, name='ml-microbatch', daemon=True).start()
+            ready.wait()
+
+            self._loop = loop
+            self._pid = os.getpid()
+
+    async def submit(self, item):
+        """Queue one item from inside the scheduler loop and await its result"""
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((item, future, time.perf_counter()))
+        return await future
+
+    def submit_threadsafe(self, item, timeout=None):
+        """
+        Queue one item from a request thread and block until it is scored
+
+        Args:
+            item: Payload passed to score_many as part of a batch
+            timeout: Seconds to wait for the result
+
+        Returns:
+            The result score_many produced for this item
+        """
+        self._ensure_started()
+        return asyncio.run_coroutine_threadsafe(self.submit(item), self._loop).result(timeout)
+
+    async def _schedule(self):
+        loop = asyncio.get_running_loop()
+
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            reason = 'timer'
+
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            else:
+                reason = 'size'
+
+            self.flush_reasons[reason] += 1
+            # Score off-loop so the next batch can fill up meanwhile
+            await loop.run_in_executor(None, self._flush, batch)
+
+    def _flush(self, batch):
+        flush_start = time.perf_counter()
+        self.flush_sizes.observe(len(batch))
+        for _, _, enqueued_at in batch:
+            self.queue_wait_ms.observe((flush_start - enqueued_at) * 1000)
+
+        try:
+            results = self.score_many([item for item, _, _ in batch])
+            outcomes = [(future, result, None) for (_, future, _), result in zip(batch, results)]
+        except Exception as e:
+            outcomes = [(future, None, e) for _, future, _ in batch]
+
+        for future, result, error in outcomes:
+            self._loop.call_soon_threadsafe(_resolve, future, result, error)
+
+    def stats(self):
+        """Flush size and queue wait instrumentation"""
+        return {
+            'maxBatchSize': self.max_batch_size,
+            'maxWaitMs': self.max_wait * 1000,
+            'flushes': sum(self.flush_reasons.values()),
+            'flushReasons': dict(self.flush_reasons),
+            'flushSize': self.flush_sizes.snapshot(),
+            'queueWaitMs': self.queue_wait_ms.snapshot()
+        }
+
+
+def _resolve(future, result, error):
+    if future.done():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Zero-downtime model hot swap
+Polls the model registry, loads new versions in the background, warms them
+up and hands them to the service only once they score correctly
+"""
+
+import os
+import threading
+import time
+
+from serving.scoring import OPTIONAL_FIELD_DEFAULTS
+
+
+def warm_up(detector):
+    """
+    Run a new model through the single and batch scoring paths
+
+    Raises whatever the model raises, so a broken artifact is never swapped in.
+    """
+    record = dict(OPTIONAL_FIELD_DEFAULTS)
+    record.update({
+        'crop': next(iter(detector.category_tables['crop'])),
+        'quantity': 500.0,
+        'pricePerUnit': 5.0,
+        'latitude': 3.1390,
+        'longitude': 101.6869
+    })
+
+    detector.predict(dict(record))
+    results = detector.predict_many([dict(record) for _ in range(8)])
+    if any('error' in result for result in results):
+        raise ValueError(f"Warm-up scoring failed: {results[0]}")
+
+
+class ModelWatcher:
+    """
+    Background thread that follows the newest (or a pinned) registry version
+    """
+
+    def __init__(self, registry, on_swap, current_version=None, poll_seconds=10.0,
+                 pinned_version=None):
+        """
+        Args:
+            registry: ModelRegistry to watch
+            on_swap: Called as on_swap(detector, manifest) with a warmed-up model
+            current_version: Version already being served
+            poll_seconds: Seconds between registry scans
+            pinned_version: Serve exactly this version instead of the newest
+        """
+        self.registry = registry
+        self.on_swap = on_swap
+        self.current_version = current_version
+        self.poll_seconds = poll_seconds
+        self.pinned_version = pinned_version
+
+        self.failed_versions = set()
+        self.last_error = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        """Start polling in this process (safe to call repeatedly, and after a fork)"""
+        if self._pid == os.getpid():
+            return
+
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            threading.Thread(target=self._run, name='ml-model-watcher', daemon=True).start()
+            self._pid = os.getpid()
+
+    def check(self):
+        """
+        Swap in the target version if it differs from the one being served
+
+        Returns:
+            True if a new model was swapped in
+        """
+        if self.pinned_version:
+            manifest = self.registry.manifest(self.pinned_version)
+        else:
+            manifest = self.registry.latest()
+
+        if manifest is None:
+            return False
+
+        version = manifest['version']
+        if version == self.current_version or version in self.failed_versions:
+            return False
+
+        try:
+            detector = self.registry.load(manifest)
+            warm_up(detector)
+        except Exception as e:
+            # Keep serving the current model; don't retry a bad artifact every poll
+            self.failed_versions.add(version)
+            self.last_error = f"{version}: {e}"
+            print(f"❌ Model {version} rejected: {e}")
+            return False
+
+        self.on_swap(detector, manifest)
+        previous, self.current_version = self.current_version, version
+        print(f"🔄 Model swapped: {previous} -> {version} (pid {os.getpid()})")
+        return True
+
+    def _run(self):
+        while True:
+            time.sleep(self.poll_seconds)
+            try:
+                self.check()
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"⚠️  Model registry check failed: {e}")
+
+    def stats(self):
+        """Watcher state for /health"""
+        return {
+            'currentVersion': self.current_version,
+            'pinnedVersion': self.pinned_version,
+            'pollSeconds': self.poll_seconds,
+            'failedVersions': sorted(self.failed_versions),
+            'lastError': self.last_error
+        }
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Pre-fork WSGI server for the ML service
+The master process loads the model once and forks workers that share its
+memory pages copy-on-write; each worker serves requests from a bounded
+thread pool on the shared listening socket
+"""
+
+import gc
+import os
+import random
+import select
+import signal
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+
+
+class _RequestHandler(WSGIRequestHandler):
+    """One request per connection so idle keep-alives cannot pin pool threads"""
+    protocol_version = 'HTTP/1.0'
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    """Werkzeug server that dispatches requests to a fixed-size thread pool"""
+
+    multithread = True
+
+    def __init__(self, app, fd, threads, max_requests=0, on_drain=None):
+        """
+        Args:
+            app: WSGI application
+            fd: File descriptor of an already listening socket
+            threads: Worker threads handling requests
+            max_requests: Requests served before the server drains itself (0 = never)
+            on_drain: Called once when max_requests is reached
+        """
+        sock = socket.socket(fileno=os.dup(fd))
+        host, port = sock.getsockname()[:2]
+        sock.close()
+
+        super().__init__(host, port, app, handler=_RequestHandler, fd=fd)
+        self.pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='ml-request')
+        self.max_requests = max_requests
+        self.on_drain = on_drain
+        self.handled = 0
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self._process_request_thread, request, client_address)
+
+        self.handled += 1
+        if self.max_requests and self.handled == self.max_requests and self.on_drain:
+            self.on_drain()
+
+    def _process_request_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+
+class PreforkServer:
+    """
+    Master process supervising forked WSGI workers
+
+    Signals:
+        SIGTERM / SIGINT: graceful shutdown (workers finish in-flight requests)
+        SIGHUP: rolling recycle, one worker at a time
+    """
+
+    def __init__(self, app, host='0.0.0.0', port=5000, workers=None, threads=4,
+                 max_requests=0, max_requests_jitter=0, graceful_timeout=30.0,
+                 ready_file=None, backlog=2048, post_fork=None):
+        """
+        Args:
+            app: WSGI application, already imported (and its model loaded)
+            host: Interface to bind
+            port: Port to bind
+            workers: Number of worker processes (default: CPU count)
+            threads: Request threads per worker
+            max_requests: Recycle a worker after this many requests (0 = never)
+            max_requests_jitter: Random extra requests so workers don't recycle together
+            graceful_timeout: Seconds a stopping worker gets before SIGKILL
+            ready_file: Path written once all workers are serving, removed on exit
+            backlog: Listen queue length of the shared socket
+            post_fork: Called in every worker right after it is forked
+        """
+        self.app = app
+        self.host = host
+        self.port = port
+        self.num_workers = workers or os.cpu_count() or 1
+        self.threads = threads
+        self.max_requests = max_requests
+        self.max_requests_jitter = max_requests_jitter
+        self.graceful_timeout = graceful_timeout
+        self.ready_file = ready_file
+        self.backlog = backlog
+        self.post_fork = post_fork
+
+        self.workers = {}       # pid -> ready flag
+        self.stopping = {}      # pid -> SIGKILL deadline
+        self.recycle_queue = []
+        self.ready = False
+        self.shutting_down = False
+
+    def run(self):
+        """Bind, fork the workers and supervise them until shutdown"""
+        self.listener = socket.create_server((self.host, self.port), backlog=self.backlog)
+        self.ready_read, self.ready_write = os.pipe()
+
+        # Keep the garbage collector away from everything loaded so far,
+        # so scanning it in a worker does not un-share the model's pages
+        gc.collect()
+        gc.freeze()
+
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        signal.signal(signal.SIGINT, self._handle_stop)
+        signal.signal(signal.SIGHUP, self._handle_recycle)
+
+        print(f"🚀 Master {os.getpid()} listening on http://{self.host}:{self.port}")
+        print(f"   Workers: {self.num_workers} x {self.threads} threads")
+
+        for _ in range(self.num_workers):
+            self._spawn_worker()
+
+        try:
+            while not (self.shutting_down and not self.workers):
+                self._read_ready_notifications(timeout=0.5)
+                self._reap_workers()
+
+                if self.shutting_down:
+                    self._kill_overdue_workers()
+                    continue
+
+                while len(self.workers) < self.num_workers:
+                    self._spawn_worker()
+
+                self._advance_recycle()
+                self._kill_overdue_workers()
+        finally:
+            self.listener.close()
+            if self.ready_file and os.path.exists(self.ready_file):
+                os.remove(self.ready_file)
+            print("👋 ML service stopped")
+
+    def _spawn_worker(self):
+        pid = os.fork()
+        if pid == 0:
+            self._run_worker()
+        self.workers[pid] = False
+
+    def _run_worker(self):
+        """Worker process body, never returns"""
+        exit_code = 0
+        try:
+            os.close(self.ready_read)
+            for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+                signal.signal(sig, signal.SIG_DFL)
+
+            if self.post_fork is not None:
+                self.post_fork()
+
+            jitter = random.randint(0, self.max_requests_jitter) if self.max_requests_jitter else 0
+            server = PooledWSGIServer(
+                self.app, self.listener.fileno(), self.threads,
+                max_requests=self.max_requests + jitter if self.max_requests else 0
+            )
+
+            def drain(*_):
+                # shutdown() blocks until serve_forever returns, so call it off-thread
+                threading.Thread(target=server.shutdown, daemon=True).start()
+
+            server.on_drain = drain
+            signal.signal(signal.SIGTERM, drain)
+            signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+            os.write(self.ready_write, f"{os.getpid()}\n".encode())
+            server.serve_forever()
+
+            # Let in-flight requests finish before exiting
+            server.pool.shutdown(wait=True)
+        except BaseException as e:
+            print(f"❌ Worker {os.getpid()} crashed: {e}")
+            exit_code = 1
+        finally:
+            os._exit(exit_code)
+
+    def _read_ready_notifications(self, timeout):
+        readable, _, _ = select.select([self.ready_read], [], [], timeout)
+        if not readable:
+            return
+
+        for line in os.read(self.ready_read, 4096).decode().split():
+            pid = int(line)
+            if pid in self.workers:
+                self.workers[pid] = True
+
+        if not self.ready and all(self.workers.values()) and len(self.workers) >= self.num_workers:
+            self._mark_ready()
+
+    def _mark_ready(self):
+        """Signal that the service accepts traffic"""
+        self.ready = True
+        print(f"✅ {len(self.workers)} workers ready")
+
+        if self.ready_file:
+            with open(self.ready_file, 'w') as f:
+                f.write(f"{os.getpid()}\n")
+
+        # systemd Type=notify support
+        notify_socket = os.getenv('NOTIFY_SOCKET')
+        if notify_socket:
+            address = '\0' + notify_socket[1:] if notify_socket.startswith('@') else notify_socket
+            with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+                sock.sendto(b'READY=1', address)
+
+    def _reap_workers(self):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+
+            self.workers.pop(pid, None)
+            self.stopping.pop(pid, None)
+            if not self.shutting_down and os.waitstatus_to_exitcode(status) != 0:
+                print(f"⚠️  Worker {pid} exited with status {os.waitstatus_to_exitcode(status)}")
+
+    def _advance_recycle(self):
+        """Stop the next queued worker once every worker is serving again"""
+        if not self.recycle_queue or self.stopping or not all(self.workers.values()):
+            return
+
+        pid = self.recycle_queue.pop(0)
+        if pid in self.workers:
+            self._stop_worker(pid)
+
+    def _stop_worker(self, pid):
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            return
+        self.stopping[pid] = time.monotonic() + self.graceful_timeout
+
+    def _kill_overdue_workers(self):
+        now = time.monotonic()
+        for pid, deadline in list(self.stopping.items()):
+            if now > deadline:
+                try:
+                    os.kill(pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+
+    def _handle_stop(self, signum, frame):
+        if self.shutting_down:
+            return
+        print("🛑 Shutting down workers gracefully...")
+        self.shutting_down = True
+        for pid in list(self.workers):
+            self._stop_worker(pid)
+
+    def _handle_recycle(self, signum, frame):
+        print("♻️  Recycling workers...")
+        self.recycle_queue = [pid for pid in self.workers if pid not in self.stopping]
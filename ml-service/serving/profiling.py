@@ -0,0 +1,598 @@
+#!/usr/bin/env python3
+"""
+Opt-in memory and CPU profiling for the scoring path
+tracemalloc tracing and sampled cProfile can be switched on and off at
+runtime from the admin endpoints, without restarting the service
+
+Under the pre-fork server an admin request reaches whichever worker
+accepts it, so the settings live in a mapping shared by every process
+forked after the Profiler was created. Each worker applies them from a
+background thread, and a report request is answered by all of them and
+merged by the worker that received it.
+"""
+
+import atexit
+import cProfile
+import glob
+import io
+import json
+import mmap
+import multiprocessing
+import os
+import pstats
+import random
+import shutil
+import tempfile
+import threading
+import time
+import tracemalloc
+import uuid
+
+# The profilers' own bookkeeping shouldn't show up as request allocations
+_IGNORED_FILES = (__file__, tracemalloc.__file__, cProfile.__file__, pstats.__file__)
+
+GROUP_BY_OPTIONS = ('lineno', 'filename', 'traceback')
+
+
+class _RequestSample:
+    """Profiling state for one request between begin() and end()"""
+
+    __slots__ = ('start_bytes', 'snapshot', 'profile', 'gated')
+
+    def __init__(self):
+        self.start_bytes = None
+        self.snapshot = None
+        self.profile = None
+        self.gated = False
+
+
+class _AllocationStats:
+    """Per-route allocation totals while tracemalloc is on"""
+
+    def __init__(self):
+        self.requests = 0
+        self.net_bytes = 0
+        self.max_net_bytes = 0
+        self.max_peak_bytes = 0
+        self.snapshots = 0
+        self.retained_blocks = 0
+        self.retained_bytes = 0
+        # 'file:line' -> [blocks, bytes] still alive after sampled requests
+        self.retained_sites = {}
+
+    def merge(self, raw):
+        """Add another worker's totals (a vars() dict of _AllocationStats)"""
+        self.requests += raw['requests']
+        self.net_bytes += raw['net_bytes']
+        self.max_net_bytes = max(self.max_net_bytes, raw['max_net_bytes'])
+        self.max_peak_bytes = max(self.max_peak_bytes, raw['max_peak_bytes'])
+        self.snapshots += raw['snapshots']
+        self.retained_blocks += raw['retained_blocks']
+        self.retained_bytes += raw['retained_bytes']
+        for site, (blocks, size) in raw['retained_sites'].items():
+            totals = self.retained_sites.setdefault(site, [0, 0])
+            totals[0] += blocks
+            totals[1] += size
+
+    def as_dict(self):
+        return {
+            'requests': self.requests,
+            'meanNetBytes': self.net_bytes / self.requests if self.requests else 0.0,
+            'maxNetBytes': self.max_net_bytes,
+            'maxPeakBytes': self.max_peak_bytes,
+            'sampledRequests': self.snapshots,
+            'meanRetainedBlocks': self.retained_blocks / self.snapshots if self.snapshots else 0.0,
+            'meanRetainedBytes': self.retained_bytes / self.snapshots if self.snapshots else 0.0,
+            'topRetainedSites': [
+                {'site': site, 'blocksPerRequest': blocks / self.snapshots, 'bytesPerRequest': size / self.snapshots}
+                for site, (blocks, size) in sorted(
+                    self.retained_sites.items(), key=lambda item: item[1][1], reverse=True
+                )[:10]
+            ]
+        }
+
+
+class SharedControl:
+    """
+    Profiler settings and report requests shared across fork()
+
+    The state is a small JSON document in an anonymous shared mapping, so
+    every process forked after this object was created reads and writes
+    the same copy. Workers leave their report parts in a common directory.
+    """
+
+    SIZE = 1 << 16
+
+    def __init__(self):
+        self._map = mmap.mmap(-1, self.SIZE)
+        self._lock = multiprocessing.Lock()
+        self.directory = tempfile.mkdtemp(prefix='ml-profiling-')
+        self._owner = os.getpid()
+        atexit.register(self._remove_directory)
+        self._write({'memory': None, 'cpu': None, 'report': None})
+
+    def read(self):
+        with self._lock:
+            return self._read()
+
+    def update(self, **changes):
+        """Replace top-level keys of the shared state"""
+        with self._lock:
+            state = self._read()
+            state.update(changes)
+            self._write(state)
+            return state
+
+    def _read(self):
+        length = int.from_bytes(self._map[:4], 'little')
+        return json.loads(self._map[4:4 + length])
+
+    def _write(self, state):
+        data = json.dumps(state).encode()
+        if len(data) + 4 > self.SIZE:
+            raise ValueError('Profiling control state too large')
+        self._map[:4 + len(data)] = len(data).to_bytes(4, 'little') + data
+
+    def _remove_directory(self):
+        # Forked workers leave with os._exit, so this only runs in the creator
+        if os.getpid() == self._owner:
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+
+class Profiler:
+    """
+    Runtime-switchable tracemalloc and cProfile sampling
+
+    Memory: while tracing, every request records its net and peak traced
+    bytes (peak covers transient copies that are freed before the request
+    ends). A sampled fraction also diffs full snapshots to attribute the
+    blocks a request leaves behind to source lines. tracemalloc's counters
+    are process-wide, so while tracing is on the profiled requests of a
+    worker run one at a time; otherwise concurrent requests would show up
+    in each other's numbers.
+
+    CPU: a sampled fraction of requests runs under cProfile, one at a time,
+    and their stats are merged.
+
+    With shared=True, start/stop/report calls go through a SharedControl and
+    reach every worker that has called start_sync().
+    """
+
+    def __init__(self, shared=True, poll_seconds=0.2, report_timeout=2.0):
+        """
+        Args:
+            shared: Coordinate forked workers (see SharedControl)
+            poll_seconds: How often each worker checks the shared settings
+            report_timeout: Seconds to wait for other workers' report parts
+        """
+        self._lock = threading.Lock()
+        self._cpu_lock = threading.Lock()
+        self._memory_gate = threading.Lock()
+
+        self.memory_enabled = False
+        self.memory_started_at = None
+        self.snapshot_rate = 0.0
+        self.allocation_stats = {}
+
+        self.cpu_enabled = False
+        self.cpu_started_at = None
+        self.cpu_sample_rate = 0.0
+        self.cpu_requests = 0
+        self._cpu_stats = None
+
+        self.shared = SharedControl() if shared else None
+        self.poll_seconds = poll_seconds
+        self.report_timeout = report_timeout
+        self._applied = {'memory': None, 'cpu': None}
+        self._answered_report = None
+        self._sync_pid = None
+        self._sync_lock = threading.Lock()
+        self._apply_lock = threading.Lock()
+
+    # Admin API
+
+    def start_memory(self, frames=10, snapshot_rate=0.05):
+        """
+        Start tracemalloc tracing in every worker
+
+        Args:
+            frames: Stack frames stored per allocation (deeper = slower)
+            snapshot_rate: Fraction of requests that also diff full snapshots
+        """
+        settings = {'session': uuid.uuid4().hex, 'frames': frames, 'snapshotRate': snapshot_rate}
+        self._configure('memory', settings)
+
+    def stop_memory(self):
+        """Stop tracing everywhere and return the final report"""
+        report = self.memory_report()
+        self._configure('memory', None)
+        return report
+
+    def memory_report(self, limit=20, group_by='lineno'):
+        """
+        Top allocation sites still alive, plus per-route request stats
+
+        Args:
+            limit: Number of allocation sites returned
+            group_by: 'lineno', 'filename' or 'traceback'
+
+        Returns:
+            Dictionary for the admin endpoint, merged over all workers
+        """
+        if group_by not in GROUP_BY_OPTIONS:
+            raise ValueError(f"group_by must be one of {', '.join(GROUP_BY_OPTIONS)}")
+
+        parts = self._collect({'kind': 'memory', 'limit': limit, 'groupBy': group_by})
+        parts = [part for part in parts if part['enabled']]
+        if not parts:
+            return {'enabled': False}
+
+        sites = {}
+        routes = {}
+        for part in parts:
+            for site in part['topSites']:
+                totals = sites.setdefault(tuple(site['site']), [0, 0])
+                totals[0] += site['bytes']
+                totals[1] += site['blocks']
+            for route, raw in part['routes'].items():
+                routes.setdefault(route, _AllocationStats()).merge(raw)
+
+        return {
+            'enabled': True,
+            'workers': [
+                {'pid': part['pid'], 'tracingSeconds': part['tracingSeconds'],
+                 'tracedBytes': part['tracedBytes'], 'peakTracedBytes': part['peakTracedBytes']}
+                for part in parts
+            ],
+            'tracedBytes': sum(part['tracedBytes'] for part in parts),
+            # Each worker contributes its own top sites, so this is the top of those
+            'topSites': [
+                {'site': list(site), 'bytes': size, 'blocks': blocks}
+                for site, (size, blocks) in sorted(sites.items(), key=lambda item: item[1][0], reverse=True)[:limit]
+            ],
+            'requests': {route: stats.as_dict() for route, stats in routes.items()}
+        }
+
+    def start_cpu(self, sample_rate=0.01):
+        """
+        Profile a fraction of requests with cProfile in every worker
+
+        Args:
+            sample_rate: Fraction of scoring requests profiled (0-1)
+        """
+        self._configure('cpu', {'session': uuid.uuid4().hex, 'sampleRate': sample_rate})
+
+    def stop_cpu(self):
+        """Stop sampling everywhere and return the final report"""
+        report = self.cpu_report()
+        self._configure('cpu', None)
+        return report
+
+    def cpu_report(self, limit=30, sort='cumulative'):
+        """
+        Merged cProfile stats of the sampled requests of all workers
+
+        Args:
+            limit: Number of functions listed
+            sort: pstats sort key ('cumulative', 'tottime', 'calls', ...)
+
+        Returns:
+            Dictionary with the pstats table as text
+        """
+        if sort not in pstats.Stats.sort_arg_dict_default:
+            raise ValueError(f"Unknown sort key: {sort}")
+
+        parts = [part for part in self._collect({'kind': 'cpu'}) if part['enabled']]
+        if not parts:
+            return {'enabled': False}
+
+        output = io.StringIO()
+        stats_files = [part['statsFile'] for part in parts if part['statsFile']]
+        if stats_files:
+            stats = pstats.Stats(*stats_files, stream=output)
+            stats.sort_stats(sort).print_stats(limit)
+
+        return {
+            'enabled': True,
+            'sampleRate': parts[0]['sampleRate'],
+            'workers': [{'pid': part['pid'], 'profiledRequests': part['profiledRequests']} for part in parts],
+            'profiledRequests': sum(part['profiledRequests'] for part in parts),
+            'samplingSeconds': max(part['samplingSeconds'] for part in parts),
+            'stats': output.getvalue()
+        }
+
+    def status(self):
+        """Which profilers are on"""
+        if self.shared is not None:
+            state = self.shared.read()
+            memory, cpu = state['memory'], state['cpu']
+        else:
+            memory, cpu = self._applied['memory'], self._applied['cpu']
+
+        return {
+            'memory': {'enabled': memory is not None, 'snapshotRate': memory['snapshotRate'] if memory else 0.0},
+            'cpu': {'enabled': cpu is not None, 'sampleRate': cpu['sampleRate'] if cpu else 0.0},
+            'workers': len(self._live_workers()) if self.shared is not None else 1
+        }
+
+    # Cross-worker coordination
+
+    def start_sync(self):
+        """Follow the shared settings in this process (safe to call repeatedly, and after a fork)"""
+        if self.shared is None or self._sync_pid == os.getpid():
+            return
+
+        with self._sync_lock:
+            if self._sync_pid == os.getpid():
+                return
+            self.sync()
+            threading.Thread(target=self._run_sync, name='ml-profiling-sync', daemon=True).start()
+            self._sync_pid = os.getpid()
+
+    def sync(self):
+        """Apply changed shared settings and answer a pending report request"""
+        with self._apply_lock:
+            self._sync()
+
+    def _sync(self):
+        state = self.shared.read()
+
+        memory = state['memory']
+        if memory != self._applied['memory']:
+            if memory is None:
+                self._stop_memory_local()
+            else:
+                self._start_memory_local(memory['frames'], memory['snapshotRate'])
+            self._applied['memory'] = memory
+
+        cpu = state['cpu']
+        if cpu != self._applied['cpu']:
+            if cpu is None:
+                self.cpu_enabled = False
+            else:
+                self._start_cpu_local(cpu['sampleRate'])
+            self._applied['cpu'] = cpu
+
+        report = state['report']
+        if report is not None and report['id'] != self._answered_report:
+            self._answer(report)
+            self._answered_report = report['id']
+
+        # Heartbeat, so a report request knows which workers to wait for
+        with open(os.path.join(self.shared.directory, f'alive-{os.getpid()}'), 'w'):
+            pass
+
+    def _run_sync(self):
+        while True:
+            time.sleep(self.poll_seconds)
+            try:
+                self.sync()
+            except Exception as e:
+                print(f"⚠️  Profiling sync failed: {e}")
+
+    def _configure(self, kind, settings):
+        if self.shared is None:
+            self._applied[kind] = settings
+            if kind == 'memory':
+                if settings is None:
+                    self._stop_memory_local()
+                else:
+                    self._start_memory_local(settings['frames'], settings['snapshotRate'])
+            elif settings is None:
+                self.cpu_enabled = False
+            else:
+                self._start_cpu_local(settings['sampleRate'])
+            return
+
+        self.shared.update(**{kind: settings})
+        # Apply here right away; the other workers follow within poll_seconds
+        self.start_sync()
+        self.sync()
+
+    def _collect(self, request):
+        """Ask every worker for its part of a report and wait for them"""
+        if self.shared is None:
+            return [self._report_part(request)]
+
+        request = dict(request, id=uuid.uuid4().hex)
+        self.shared.update(report=request)
+        self.start_sync()
+        self.sync()
+
+        deadline = time.monotonic() + self.report_timeout
+        while True:
+            parts = {}
+            for path in glob.glob(os.path.join(self.shared.directory, f"report-{request['id']}-*.json")):
+                with open(path) as f:
+                    part = json.load(f)
+                parts[part['pid']] = part
+            if self._live_workers() <= set(parts) or time.monotonic() > deadline:
+                break
+            time.sleep(self.poll_seconds / 4)
+
+        # Parts of earlier requests are no longer needed
+        for path in glob.glob(os.path.join(self.shared.directory, 'report-*')):
+            if f"report-{request['id']}-" not in os.path.basename(path):
+                os.remove(path)
+        return list(parts.values())
+
+    def _live_workers(self):
+        """Pids of the processes following the shared settings"""
+        pids = set()
+        for path in glob.glob(os.path.join(self.shared.directory, 'alive-*')):
+            pid = int(path.rsplit('-', 1)[1])
+            try:
+                os.kill(pid, 0)
+                pids.add(pid)
+            except ProcessLookupError:
+                os.remove(path)
+        return pids
+
+    def _answer(self, request):
+        """Write this worker's part of a report request"""
+        part = self._report_part(request)
+        path = os.path.join(self.shared.directory, f"report-{request['id']}-{os.getpid()}.json")
+        with open(path + '.tmp', 'w') as f:
+            json.dump(part, f)
+        os.replace(path + '.tmp', path)
+
+    def _report_part(self, request):
+        if request['kind'] == 'memory':
+            return self._memory_part(request['limit'], request['groupBy'])
+        return self._cpu_part(request.get('id'))
+
+    # This process
+
+    def _start_memory_local(self, frames, snapshot_rate):
+        with self._lock:
+            if tracemalloc.is_tracing():
+                tracemalloc.stop()
+            tracemalloc.start(frames)
+            self.snapshot_rate = snapshot_rate
+            self.allocation_stats = {}
+            self.memory_started_at = time.time()
+            self.memory_enabled = True
+
+    def _stop_memory_local(self):
+        with self._lock:
+            self.memory_enabled = False
+            if tracemalloc.is_tracing():
+                tracemalloc.stop()
+
+    def _memory_part(self, limit, group_by):
+        if not (self.memory_enabled and tracemalloc.is_tracing()):
+            return {'pid': os.getpid(), 'enabled': False}
+
+        current, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>')
+        ])
+
+        sites = []
+        for stat in snapshot.statistics(group_by)[:limit]:
+            sites.append({
+                'site': [f"{frame.filename}:{frame.lineno}" for frame in stat.traceback],
+                'bytes': stat.size,
+                'blocks': stat.count
+            })
+
+        with self._lock:
+            routes = {route: dict(vars(stats)) for route, stats in self.allocation_stats.items()}
+
+        return {
+            'pid': os.getpid(),
+            'enabled': True,
+            'tracingSeconds': time.time() - self.memory_started_at,
+            'tracedBytes': current,
+            'peakTracedBytes': peak,
+            'topSites': sites,
+            'routes': routes
+        }
+
+    def _start_cpu_local(self, sample_rate):
+        with self._lock:
+            self.cpu_sample_rate = sample_rate
+            self.cpu_requests = 0
+            self._cpu_stats = None
+            self.cpu_started_at = time.time()
+            self.cpu_enabled = True
+
+    def _cpu_part(self, request_id):
+        if not self.cpu_enabled:
+            return {'pid': os.getpid(), 'enabled': False}
+
+        stats_file = None
+        with self._lock:
+            if self._cpu_stats is not None:
+                directory = self.shared.directory if self.shared is not None else tempfile.gettempdir()
+                stats_file = os.path.join(directory, f"report-{request_id}-{os.getpid()}.prof")
+                self._cpu_stats.dump_stats(stats_file)
+            profiled = self.cpu_requests
+
+        return {
+            'pid': os.getpid(),
+            'enabled': True,
+            'sampleRate': self.cpu_sample_rate,
+            'profiledRequests': profiled,
+            'samplingSeconds': time.time() - self.cpu_started_at,
+            'statsFile': stats_file
+        }
+
+    # Request hooks
+
+    def begin(self):
+        """
+        Called before a scoring request
+
+        Returns:
+            Sample to pass to end(), or None when nothing is being profiled
+        """
+        if not (self.memory_enabled or self.cpu_enabled):
+            return None
+
+        sample = _RequestSample()
+
+        if self.memory_enabled and tracemalloc.is_tracing():
+            # Traced byte counts are process-wide: measure one request at a time
+            self._memory_gate.acquire()
+            sample.gated = True
+            if random.random() < self.snapshot_rate:
+                sample.snapshot = tracemalloc.take_snapshot()
+            tracemalloc.reset_peak()
+            sample.start_bytes = tracemalloc.get_traced_memory()[0]
+
+        if self.cpu_enabled and random.random() < self.cpu_sample_rate and self._cpu_lock.acquire(blocking=False):
+            sample.profile = cProfile.Profile()
+            sample.profile.enable()
+
+        return sample
+
+    def end(self, sample, route):
+        """Called after the request with the sample returned by begin()"""
+        if sample is None:
+            return
+
+        try:
+            self._record(sample, route)
+        finally:
+            if sample.gated:
+                self._memory_gate.release()
+
+    def _record(self, sample, route):
+        if sample.profile is not None:
+            sample.profile.disable()
+            self._cpu_lock.release()
+            with self._lock:
+                if self._cpu_stats is None:
+                    self._cpu_stats = pstats.Stats(sample.profile)
+                else:
+                    self._cpu_stats.add(sample.profile)
+                self.cpu_requests += 1
+
+        if sample.start_bytes is not None and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+
+            diff = None
+            if sample.snapshot is not None:
+                diff = [
+                    stat for stat in tracemalloc.take_snapshot().compare_to(sample.snapshot, 'lineno')
+                    if stat.size_diff > 0 and stat.traceback[0].filename not in _IGNORED_FILES
+                ]
+
+            with self._lock:
+                stats = self.allocation_stats.setdefault(route, _AllocationStats())
+                net = current - sample.start_bytes
+                stats.requests += 1
+                stats.net_bytes += net
+                stats.max_net_bytes = max(stats.max_net_bytes, net)
+                stats.max_peak_bytes = max(stats.max_peak_bytes, peak - sample.start_bytes)
+                if diff is not None:
+                    stats.snapshots += 1
+                    for stat in diff:
+                        frame = stat.traceback[0]
+                        site = stats.retained_sites.setdefault(f"{frame.filename}:{frame.lineno}", [0, 0])
+                        site[0] += stat.count_diff
+                        site[1] += stat.size_diff
+                        stats.retained_blocks += stat.count_diff
+                        stats.retained_bytes += stat.size_diff
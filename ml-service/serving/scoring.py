@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+Batch scoring shared by the ML service routes
+One model evaluation produces the anomaly result, heuristic flags, fraud
+factor breakdown and combined fraud score for a batch
+"""
+
+import math
+
+# Fields every batch payload must carry
+REQUIRED_FIELDS = ['crop', 'quantity', 'pricePerUnit', 'latitude', 'longitude']
+
+# Defaults for optional fields
+OPTIONAL_FIELD_DEFAULTS = {
+    'temperature': 28.0,
+    'humidity': 75.0,
+    'moistureContent': 12.0,
+    'qualityGrade': 'B',
+    'weather_main': 'Clear'
+}
+
+# Fields read as numbers, by the model and by the heuristics below
+NUMERIC_FIELDS = ['quantity', 'pricePerUnit', 'latitude', 'longitude', 'temperature', 'humidity', 'moistureContent']
+
+
+def validate_batch_payload(batch_data):
+    """
+    Validate a batch payload and fill in defaults for optional fields
+
+    Returns:
+        Error message, or None if the payload is usable
+    """
+    if not isinstance(batch_data, dict):
+        return 'Batch payload must be a JSON object'
+
+    missing_fields = [f for f in REQUIRED_FIELDS if f not in batch_data]
+    if missing_fields:
+        return f'Missing required fields: {", ".join(missing_fields)}'
+
+    for field, default in OPTIONAL_FIELD_DEFAULTS.items():
+        if batch_data.get(field) is None:
+            batch_data[field] = default
+
+    # The model reads numeric strings as numbers, so the heuristics must too:
+    # a cached result is keyed on the model's feature vector, and two
+    # payloads with the same vector have to get the same flags and factors
+    for field in NUMERIC_FIELDS:
+        value = batch_data[field]
+        try:
+            if isinstance(value, bool):
+                raise TypeError
+            number = float(value)
+        except (TypeError, ValueError):
+            return f'Field {field} must be a number'
+        if not math.isfinite(number):
+            return f'Field {field} must be a finite number'
+        batch_data[field] = number
+
+    return None
+
+
+def build_anomaly_flags(batch_data, result):
+    """Explain which heuristic factors line up with an anomaly prediction"""
+    flags = []
+    if not result['isAnomaly']:
+        return flags
+
+    # Analyze which factors contributed to anomaly
+    if abs(batch_data['latitude']) < 0.1 and abs(batch_data['longitude']) < 0.1:
+        flags.append({
+            'type': 'GPS_ANOMALY',
+            'message': 'GPS coordinates suspicious (near Null Island)',
+            'severity': 'HIGH'
+        })
+
+    if batch_data['temperature'] > 40 or batch_data['temperature'] < 15:
+        flags.append({
+            'type': 'WEATHER_ANOMALY',
+            'message': f'Temperature {batch_data["temperature"]}°C outside normal range for Malaysia',
+            'severity': 'HIGH'
+        })
+
+    if batch_data.get('moistureContent', 50) > 100 or batch_data.get('moistureContent', 50) < 0:
+        flags.append({
+            'type': 'MOISTURE_ANOMALY',
+            'message': 'Moisture content physically impossible',
+            'severity': 'CRITICAL'
+        })
+
+    # Price anomaly check (very rough heuristic)
+    if batch_data['pricePerUnit'] > 100:
+        flags.append({
+            'type': 'PRICE_ANOMALY',
+            'message': f'Price RM{batch_data["pricePerUnit"]}/kg unusually high',
+            'severity': 'MEDIUM'
+        })
+
+    return flags
+
+
+def build_fraud_assessment(batch_data, anomaly_result):
+    """
+    Combine the anomaly score with GPS, price and weather heuristics
+
+    Returns:
+        Dictionary with fraudScore, riskLevel, factors and recommendation
+    """
+    factors = []
+
+    # GPS factor
+    lat, lng = batch_data.get('latitude', 0), batch_data.get('longitude', 0)
+    if abs(lat) < 0.1 and abs(lng) < 0.1:
+        gps_score = 0.9
+    elif lat < 0 or lat > 8 or lng < 99 or lng > 120:  # Outside Malaysia
+        gps_score = 0.7
+    else:
+        gps_score = 0.1
+
+    factors.append({
+        'factor': 'gps_location',
+        'score': gps_score,
+        'status': 'SUSPICIOUS' if gps_score > 0.5 else 'NORMAL'
+    })
+
+    # Price factor
+    price = batch_data.get('pricePerUnit', 0)
+    price_score = 0.1 if 1 < price < 50 else 0.6
+
+    factors.append({
+        'factor': 'pricing',
+        'score': price_score,
+        'status': 'SUSPICIOUS' if price_score > 0.5 else 'NORMAL'
+    })
+
+    # Weather factor
+    temp = batch_data.get('temperature', 28)
+    weather_score = 0.1 if 20 < temp < 36 else 0.7
+
+    factors.append({
+        'factor': 'weather_conditions',
+        'score': weather_score,
+        'status': 'SUSPICIOUS' if weather_score > 0.5 else 'NORMAL'
+    })
+
+    # Combined fraud score (weighted average)
+    fraud_score = (
+        anomaly_result['anomalyScore'] * 0.5 +
+        gps_score * 0.2 +
+        price_score * 0.2 +
+        weather_score * 0.1
+    )
+
+    return {
+        'fraudScore': float(fraud_score),
+        'riskLevel': anomaly_result['riskLevel'],
+        'factors': factors,
+        'recommendation': 'BLOCK' if fraud_score > 0.8 else 'REVIEW' if fraud_score > 0.6 else 'APPROVE'
+    }
+
+
+def assemble_score(batch_data, prediction, model_version=None):
+    """
+    Build the combined score from one model prediction
+
+    Args:
+        batch_data: Validated batch payload
+        prediction: AnomalyDetector prediction for it
+        model_version: Version of the model that produced the prediction
+
+    Returns:
+        Dictionary with 'anomaly' (prediction plus flags) and 'fraud' views,
+        both tagged with modelVersion
+    """
+    anomaly = dict(prediction)
+    anomaly['flags'] = build_anomaly_flags(batch_data, prediction)
+    anomaly['modelVersion'] = model_version
+
+    fraud = build_fraud_assessment(batch_data, prediction)
+    fraud['modelVersion'] = model_version
+
+    return {
+        'anomaly': anomaly,
+        'fraud': fraud
+    }
+
+
+def score_batch(detector, batch_data, timings=None, feature_vector=None):
+    """
+    Score one validated batch with a single model evaluation
+
+    Args:
+        detector: Loaded AnomalyDetector
+        batch_data: Payload already passed through validate_batch_payload
+        timings: Optional dictionary that receives per-stage seconds
+        feature_vector: detector.record_to_vector(batch_data), if the
+            caller already built it
+
+    Returns:
+        Combined score, see assemble_score
+    """
+    if feature_vector is None:
+        prediction = detector.predict(batch_data, timings)
+    else:
+        prediction = detector.predict_vectors(feature_vector.reshape(1, -1), timings)[0]
+    return assemble_score(batch_data, prediction, detector.model_version)
+
+
+def score_vectors(detector, items, X, timings=None):
+    """
+    Score validated batches whose feature vectors are already built
+
+    Args:
+        detector: Loaded AnomalyDetector
+        items: Payloads already passed through validate_batch_payload
+        X: Their feature vectors, one row per item
+        timings: Optional dictionary that receives per-stage seconds
+
+    Returns:
+        List of combined scores, in input order
+    """
+    return [
+        assemble_score(batch_data, prediction, detector.model_version)
+        for batch_data, prediction in zip(items, detector.predict_vectors(X, timings))
+    ]
+
+
+def score_many(detector, items, timings=None):
+    """
+    Validate and score many batches with one vectorized model evaluation
+
+    Args:
+        detector: Loaded AnomalyDetector
+        items: List of raw payloads
+        timings: Optional dictionary that receives per-stage seconds
+
+    Returns:
+        List with one entry per item, in input order: a combined score, or
+        {'error': message} for items that are invalid
+    """
+    results = [None] * len(items)
+    valid_index = []
+
+    for i, batch_data in enumerate(items):
+        error = validate_batch_payload(batch_data)
+        if error:
+            results[i] = {'error': error}
+        else:
+            valid_index.append(i)
+
+    predictions = detector.predict_many([items[i] for i in valid_index], timings)
+
+    for i, prediction in zip(valid_index, predictions):
+        if 'error' in prediction:
+            results[i] = prediction
+            continue
+
+        try:
+            results[i] = assemble_score(items[i], prediction, detector.model_version)
+        except TypeError as e:
+            results[i] = {'error': f'Invalid record: {e}'}
+
+    return results
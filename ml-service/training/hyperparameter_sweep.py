@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Parallel hyperparameter and contamination sweep for the anomaly detector
+
+Prepares the feature matrix once, places it in shared memory and fits one
+IsolationForest per (n_estimators, max_samples, max_features) combination
+in worker processes that map the matrix instead of copying it.
+Contamination only moves the decision threshold (offset_ is a percentile
+of the training scores), so every contamination value is evaluated on the
+same fitted forest instead of refitting it.
+
+Prints a leaderboard of precision/recall/F1 on the held-out split and fit
+time, then retrains the best configuration with AnomalyDetector.train and
+saves it with AnomalyDetector.save.
+
+Usage:
+    python training/hyperparameter_sweep.py --data data/combined_training_data.csv
+    python training/hyperparameter_sweep.py --synthetic 5000 --workers 4 --output /tmp/best.pkl
+"""
+
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(SERVICE_DIR)
+
+import numpy as np
+
+from models.anomaly_detector import AnomalyDetector
+from models.registry import ModelRegistry
+from utils.training_data import load_training_data, preferred_path
+
+DEFAULT_DATA = preferred_path(os.path.join(SERVICE_DIR, 'data', 'combined_training_data.csv'))
+DEFAULT_OUTPUT = os.path.join(SERVICE_DIR, 'saved_models', 'anomaly_detector.pkl')
+
+# Arrays mapped from the parent's shared memory, per worker process
+_shared = {}
+
+
+def share_arrays(arrays):
+    """
+    Copy arrays into new shared memory blocks
+
+    Returns:
+        Tuple of (blocks to close and unlink when done,
+        {name: (block name, shape, dtype)} for attach_arrays)
+    """
+    blocks, specs = [], {}
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+        blocks.append(block)
+        specs[name] = (block.name, array.shape, array.dtype.str)
+    return blocks, specs
+
+
+def attach_arrays(specs):
+    """
+    Worker initializer: map the parent's blocks as read-only arrays
+
+    Workers share the parent's resource tracker, so the blocks are only
+    unlinked by the parent (or by the tracker if the parent dies).
+
+    Args:
+        specs: Output of share_arrays
+    """
+    for name, (block_name, shape, dtype) in specs.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        array = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+        array.flags.writeable = False
+        _shared[name] = (block, array)
+
+
+def evaluate(params, contaminations, random_state):
+    """
+    Fit one forest on the shared training split and score it at every contamination
+
+    Args:
+        params: n_estimators, max_samples and max_features for IsolationForest
+        contaminations: Contamination values to evaluate
+        random_state: Seed, same as AnomalyDetector.train uses
+
+    Returns:
+        List of leaderboard rows, one per contamination value
+    """
+    from sklearn.ensemble import IsolationForest
+    from sklearn.metrics import precision_recall_fscore_support
+
+    X_train = _shared['X_train'][1]
+    X_test = _shared['X_test'][1]
+    y_test = _shared['y_test'][1]
+
+    model = IsolationForest(random_state=random_state, bootstrap=False, n_jobs=1, **params)
+    start = time.perf_counter()
+    model.fit(X_train)
+    fit_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    train_scores = model.score_samples(X_train)
+    test_scores = model.score_samples(X_test)
+    score_us_per_row = (time.perf_counter() - start) / (len(X_train) + len(X_test)) * 1e6
+
+    rows = []
+    for contamination in contaminations:
+        # What IsolationForest.fit sets offset_ to for this contamination
+        offset = np.percentile(train_scores, 100.0 * contamination)
+        predicted = test_scores < offset
+        precision, recall, f1, _ = precision_recall_fscore_support(
+            y_test, predicted, average='binary', zero_division=0
+        )
+        rows.append(dict(
+            params,
+            contamination=contamination,
+            precision=float(precision),
+            recall=float(recall),
+            f1=float(f1),
+            flagged=float(predicted.mean()),
+            fit_seconds=fit_seconds,
+            score_us_per_row=score_us_per_row
+        ))
+    return rows
+
+
+def parse_number(value):
+    """'auto' stays a string, '0.5' becomes a float, '256' an int"""
+    if value == 'auto':
+        return value
+    return float(value) if '.' in value else int(value)
+
+
+def load_data(args):
+    if args.synthetic:
+        from utils.generate_synthetic_data import generate_synthetic_dataset
+        print(f"🎲 Generating {args.synthetic} synthetic batches...")
+        with contextlib.redirect_stdout(io.StringIO()):
+            return generate_synthetic_dataset(
+                n_normal=int(args.synthetic * 0.85), n_anomalous=int(args.synthetic * 0.15)
+            )
+
+    print(f"📂 Loading training data from: {args.data}")
+    return load_training_data(args.data)
+
+
+def run_sweep(df, args):
+    """Evaluate the whole grid in parallel, returning leaderboard rows"""
+    # Fit encoders, reference stats and scaler exactly like AnomalyDetector.train
+    detector = AnomalyDetector()
+    with contextlib.redirect_stdout(io.StringIO()):
+        X_train, X_test, y_train, y_test = detector.prepare_training_split(df, args.test_size, args.random_state)
+    detector.scaler.fit(X_train)
+
+    blocks, specs = share_arrays({
+        'X_train': detector.scaler.transform(X_train),
+        'X_test': detector.scaler.transform(X_test),
+        'y_test': y_test.astype(bool)
+    })
+
+    grid = [
+        {'n_estimators': n, 'max_samples': samples, 'max_features': features}
+        for n, samples, features in itertools.product(args.n_estimators, args.max_samples, args.max_features)
+    ]
+    # Biggest fits first so a slow one doesn't start last ('auto' and fractions ~ 256 samples)
+    grid.sort(key=lambda p: p['n_estimators'] * (p['max_samples'] if isinstance(p['max_samples'], int) else 256),
+              reverse=True)
+
+    workers = min(args.workers, len(grid))
+    print(f"\n⚙️  Sweeping {len(grid)} forests x {len(args.contamination)} contamination values "
+          f"on {len(X_train)} training rows ({workers} workers, "
+          f"{sum(block.size for block in blocks) / 1e6:.1f} MB shared)")
+
+    rows = []
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=attach_arrays, initargs=(specs,)) as pool:
+            futures = {pool.submit(evaluate, params, args.contamination, args.random_state): params
+                       for params in grid}
+            for done, future in enumerate(as_completed(futures), 1):
+                result = future.result()
+                rows.extend(result)
+                params = futures[future]
+                print(f"   [{done}/{len(grid)}] n_estimators={params['n_estimators']} "
+                      f"max_samples={params['max_samples']} max_features={params['max_features']}: "
+                      f"fit {result[0]['fit_seconds']:.2f}s, best F1 {max(r['f1'] for r in result):.2%}")
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+    rows.sort(key=lambda row: (-row[args.metric], row['fit_seconds']))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Parallel IsolationForest hyperparameter sweep')
+    parser.add_argument('--data', default=DEFAULT_DATA, help='Training data (.parquet/.csv/.json) with an is_anomaly column')
+    parser.add_argument('--synthetic', type=int, help='Sweep on this many synthetic batches instead')
+    parser.add_argument('--n-estimators', type=int, nargs='+', default=[50, 100, 200])
+    parser.add_argument('--max-samples', type=parse_number, nargs='+', default=['auto', 128, 512])
+    parser.add_argument('--max-features', type=parse_number, nargs='+', default=[0.5, 0.75, 1.0])
+    parser.add_argument('--contamination', type=float, nargs='+', default=[0.1, 0.15, 0.165, 0.2])
+    parser.add_argument('--metric', choices=['f1', 'precision', 'recall'], default='f1',
+                        help='Leaderboard ranking (ties go to the faster fit)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--test-size', type=float, default=0.2)
+    parser.add_argument('--random-state', type=int, default=42)
+    parser.add_argument('--top', type=int, default=10, help='Leaderboard rows printed')
+    parser.add_argument('--leaderboard', help='Write every row to this JSON file')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help='Where the best model is saved')
+    parser.add_argument('--no-save', action='store_true', help='Only print the leaderboard')
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("  ANOMALY DETECTION HYPERPARAMETER SWEEP")
+    print("=" * 70)
+
+    df = load_data(args)
+    print(f"✅ {len(df)} batch records ({int(df['is_anomaly'].sum())} anomalous)")
+
+    start = time.perf_counter()
+    rows = run_sweep(df, args)
+    print(f"\n⏱️  Sweep finished in {time.perf_counter() - start:.1f}s")
+
+    print(f"\n🏆 Leaderboard (test split, ranked by {args.metric}):")
+    print(f"   {'#':>3} {'trees':>6} {'samples':>8} {'features':>9} {'contam.':>8} "
+          f"{'precision':>10} {'recall':>8} {'F1':>8} {'fit (s)':>8}")
+    for rank, row in enumerate(rows[:args.top], 1):
+        print(f"   {rank:>3} {row['n_estimators']:>6} {str(row['max_samples']):>8} {row['max_features']:>9} "
+              f"{row['contamination']:>8} {row['precision']:>10.2%} {row['recall']:>8.2%} "
+              f"{row['f1']:>8.2%} {row['fit_seconds']:>8.2f}")
+
+    if args.leaderboard:
+        with open(args.leaderboard, 'w') as f:
+            json.dump(rows, f, indent=2)
+        print(f"\n💾 Leaderboard written to {args.leaderboard}")
+
+    if args.no_save:
+        return
+
+    best = rows[0]
+    print("\n" + "=" * 70)
+    print("  RETRAINING BEST CONFIGURATION")
+    print("=" * 70)
+    detector = AnomalyDetector(contamination=best['contamination'])
+    results = detector.train(
+        df,
+        test_size=args.test_size,
+        random_state=args.random_state,
+        n_estimators=best['n_estimators'],
+        max_samples=best['max_samples'],
+        max_features=best['max_features']
+    )
+    print(f"\n🔍 Test F1 after retraining: {results['test_f1']:.2%} (sweep: {best['f1']:.2%})")
+
+    print(f"\n💾 Saving model...")
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    detector.save(args.output)
+
+    # Memory-mappable copy, like train_anomaly_detector.py
+    mapped_path = os.path.splitext(args.output)[0] + '.model'
+    detector.save(mapped_path, format='mmap')
+
+    registry_dir = os.getenv('ML_MODEL_REGISTRY')
+    if registry_dir:
+        ModelRegistry(registry_dir).publish(detector, metrics=results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+Incremental retraining of the anomaly detector
+
+Pulls only the batches created since the last run's createdAt watermark,
+refreshes the current model by replacing its oldest trees with trees fit on
+the new batches (AnomalyDetector.refresh_forest) and publishes the result
+through the usual save path. A bounded history of earlier feature rows
+(reservoir sample or sliding window) is kept next to the watermark to
+recompute the decision threshold, so a run costs the same whether the
+database holds a thousand batches or a million.
+
+A full retrain (train_anomaly_detector.py) refits the encoders and scaler;
+the next incremental run notices and reseeds its history.
+
+Usage:
+    python training/incremental_train.py
+    python training/incremental_train.py --data new_batches.parquet --history window --capacity 5000
+"""
+
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(SERVICE_DIR)
+
+import numpy as np
+import pandas as pd
+
+from models.anomaly_detector import AnomalyDetector
+from models.registry import ModelRegistry
+from utils.training_data import load_training_data, preferred_path
+
+DEFAULT_MODEL = os.path.join(SERVICE_DIR, 'saved_models', 'anomaly_detector.pkl')
+DEFAULT_STATE_DIR = os.path.join(SERVICE_DIR, 'saved_models', 'incremental')
+DEFAULT_SEED_DATA = preferred_path(os.path.join(SERVICE_DIR, 'data', 'combined_training_data.csv'))
+
+
+def feature_fingerprint(detector):
+    """Identifies the encoders, reference medians and features the history rows were built with"""
+    digest = hashlib.sha256(json.dumps({
+        'features': detector.all_features,
+        'encoders': {col: enc.classes_.tolist() for col, enc in detector.label_encoders.items()},
+        'reference_stats': detector.reference_stats
+    }, sort_keys=True, default=str).encode())
+    return digest.hexdigest()[:16]
+
+
+class History:
+    """
+    Bounded sample of earlier feature rows
+
+    'reservoir' keeps a uniform sample of every row seen (Algorithm R);
+    'window' keeps the most recent rows.
+    """
+
+    def __init__(self, capacity, strategy='reservoir', rows=None, seen=0):
+        self.capacity = capacity
+        self.strategy = strategy
+        self.rows = rows
+        self.seen = seen
+
+    def add(self, X, rng):
+        """Fold new rows into the history"""
+        if self.rows is None:
+            self.rows = np.empty((0, X.shape[1]))
+
+        if self.strategy == 'window':
+            self.rows = np.vstack([self.rows, X])[-self.capacity:]
+            self.seen += len(X)
+            return
+
+        free = max(self.capacity - len(self.rows), 0)
+        self.rows = np.vstack([self.rows, X[:free]])
+        self.seen += len(X[:free])
+
+        # Row number t (0-based) replaces a random slot with probability capacity / (t + 1)
+        rest = X[free:]
+        if len(rest):
+            slots = rng.integers(0, self.seen + np.arange(1, len(rest) + 1))
+            for i in np.flatnonzero(slots < self.capacity):
+                self.rows[slots[i]] = rest[i]
+            self.seen += len(rest)
+
+    def __len__(self):
+        return 0 if self.rows is None else len(self.rows)
+
+
+def load_state(state_dir):
+    """Saved watermark and history, or None"""
+    state_path = os.path.join(state_dir, 'state.json')
+    if not os.path.exists(state_path):
+        return None, None
+
+    with open(state_path) as f:
+        state = json.load(f)
+    rows = np.load(os.path.join(state_dir, 'history.npy'))
+    history = History(state['capacity'], state['strategy'], rows, state['seen'])
+    return state, history
+
+
+def save_state(state_dir, state, history):
+    """Write state.json and history.npy, replacing the old ones atomically"""
+    os.makedirs(state_dir, exist_ok=True)
+
+    history_tmp = os.path.join(state_dir, f'.history.npy.tmp-{os.getpid()}')
+    with open(history_tmp, 'wb') as f:
+        np.save(f, history.rows)
+    os.replace(history_tmp, os.path.join(state_dir, 'history.npy'))
+
+    state_tmp = os.path.join(state_dir, f'.state.json.tmp-{os.getpid()}')
+    with open(state_tmp, 'w') as f:
+        json.dump(state, f, indent=2)
+    os.replace(state_tmp, os.path.join(state_dir, 'state.json'))
+
+
+def parse_timestamp(value):
+    """ISO timestamp -> naive UTC datetime, like Prisma stores createdAt"""
+    timestamp = pd.Timestamp(value)
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.tz_convert('UTC').tz_localize(None)
+    return timestamp.to_pydatetime()
+
+
+def seed_history(detector, args, rng):
+    """
+    Start a history from the initial training data
+
+    Returns:
+        Tuple of (History, watermark or None)
+    """
+    history = History(args.capacity, args.history)
+    watermark = parse_timestamp(args.since) if args.since else None
+
+    if args.seed_data and os.path.exists(args.seed_data):
+        df = load_training_data(args.seed_data)
+        history.add(detector.prepare_features(df, training=False), rng)
+        print(f"🌱 Seeded history with {len(history)} of {len(df)} rows from {args.seed_data}")
+
+        if watermark is None and 'createdAt' in df.columns:
+            created = pd.to_datetime(df['createdAt'], errors='coerce', utc=True).max()
+            if pd.notna(created):
+                watermark = parse_timestamp(created)
+    else:
+        print("⚠️  Warning: No seed data, starting with an empty history")
+
+    return history, watermark
+
+
+def pull_new_batches(args, watermark):
+    """
+    Batches created after the watermark
+
+    Returns:
+        Tuple of (DataFrame, watermark to record once they are trained on)
+    """
+    if args.data:
+        print(f"📂 Loading new batches from: {args.data}")
+        df = load_training_data(args.data)
+        if 'createdAt' not in df.columns:
+            print("⚠️  Warning: No createdAt column, using every row and keeping the watermark")
+            return df, watermark
+        created = pd.to_datetime(df['createdAt'], utc=True).dt.tz_localize(None)
+        if watermark is not None:
+            df, created = df[created > watermark], created[created > watermark]
+        return df, (created.max().to_pydatetime() if len(df) else watermark)
+
+    from utils.data_export import export_batch_data
+
+    # Rows committed a little after their createdAt would fall behind a
+    # watermark taken at the newest row, so stop short of "now"
+    until = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(seconds=args.lag_seconds)
+    print(f"🔌 Pulling batches created after {watermark or 'the beginning'} up to {until}")
+    with contextlib.redirect_stdout(io.StringIO()):
+        df = export_batch_data(since=watermark, until=until)
+    return df, until
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Incremental anomaly detector retraining')
+    parser.add_argument('--model', default=DEFAULT_MODEL, help='Pickled model to refresh')
+    parser.add_argument('--output', help='Where to save the refreshed model (default: --model)')
+    parser.add_argument('--state-dir', default=DEFAULT_STATE_DIR, help='Watermark and history location')
+    parser.add_argument('--data', help='Read new batches from this file (.parquet/.csv/.json) instead of the database')
+    parser.add_argument('--seed-data', default=DEFAULT_SEED_DATA,
+                        help='Training data that seeds the history on the first run')
+    parser.add_argument('--since', help='Initial watermark (ISO timestamp) on the first run')
+    parser.add_argument('--history', choices=['reservoir', 'window'], default='reservoir')
+    parser.add_argument('--capacity', type=int, default=5000, help='History rows kept')
+    parser.add_argument('--min-rows', type=int, default=50,
+                        help='Fewer new batches than this are left for the next run')
+    parser.add_argument('--replace', type=int, help='Trees replaced (default: new rows share of the window)')
+    parser.add_argument('--lag-seconds', type=int, default=60,
+                        help='Ignore batches created in the last N seconds')
+    parser.add_argument('--random-state', type=int, default=42)
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("  INCREMENTAL ANOMALY DETECTION MODEL REFRESH")
+    print("=" * 70)
+
+    detector = AnomalyDetector().load(args.model)
+    fingerprint = feature_fingerprint(detector)
+
+    state, history = load_state(args.state_dir)
+    refreshes = state['refreshes'] if state else 0
+    # A different seed for every refresh, so new trees don't repeat earlier subsamples
+    rng = np.random.default_rng([args.random_state, refreshes])
+
+    if state is None or state['fingerprint'] != fingerprint:
+        if state is not None:
+            print("♻️  Model was retrained from scratch since the last run, reseeding history")
+        history, watermark = seed_history(detector, args, rng)
+    else:
+        watermark = parse_timestamp(state['watermark']) if state['watermark'] else None
+        print(f"📌 Watermark: {watermark}, history: {len(history)} rows ({history.strategy}, "
+              f"{history.seen} seen)")
+
+    df_new, next_watermark = pull_new_batches(args, watermark)
+    print(f"✅ {len(df_new)} new batches")
+
+    if len(df_new) < args.min_rows:
+        print(f"⏸️  Fewer than {args.min_rows} new batches, nothing to do")
+        return
+
+    start = time.perf_counter()
+    X_new = detector.prepare_features(df_new, training=False)
+    results = detector.refresh_forest(
+        X_new, history.rows, n_replace=args.replace, random_state=int(rng.integers(2 ** 31))
+    )
+    results['refresh_seconds'] = time.perf_counter() - start
+    history.add(X_new, rng)
+
+    print(f"\n🌲 Replaced {results['replaced_estimators']} of {results['n_estimators']} trees "
+          f"({results['fit_rows']} fit rows, {results['window_rows']} threshold rows) "
+          f"in {results['refresh_seconds']:.2f}s")
+    print(f"   New batches flagged: {results['new_flagged_rate']:.2%} "
+          f"(contamination {results['contamination']})")
+
+    output = args.output or args.model
+    print(f"\n💾 Saving model...")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    detector.save(output)
+
+    # Memory-mappable copy, like train_anomaly_detector.py
+    detector.save(os.path.splitext(output)[0] + '.model', format='mmap')
+
+    registry_dir = os.getenv('ML_MODEL_REGISTRY')
+    if registry_dir:
+        ModelRegistry(registry_dir).publish(detector, metrics=results)
+
+    # Only advance once the refreshed model is safely written
+    save_state(args.state_dir, {
+        'watermark': next_watermark.isoformat() if next_watermark else None,
+        'fingerprint': fingerprint,
+        'strategy': history.strategy,
+        'capacity': history.capacity,
+        'seen': history.seen,
+        'refreshes': refreshes + 1,
+        'modelVersion': detector.model_version,
+        'updatedAt': datetime.now(timezone.utc).isoformat()
+    }, history)
+    print(f"📌 Watermark advanced to {next_watermark}")
+
+
+if __name__ == "__main__":
+    main()
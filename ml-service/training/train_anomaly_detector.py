@@ -9,6 +9,8 @@ sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
 import pandas as pd
 from models.anomaly_detector import AnomalyDetector
+from models.registry import ModelRegistry
+from utils.training_data import load_training_data, preferred_path
 
 def main():
     print("=" * 70)
@@ -16,10 +18,11 @@ def main():
     print("=" * 70)
 
     # Load combined training data
-    data_path = '/home/mirza/fabric-workspace/agricultural-supply-chain/ml-service/data/combined_training_data.csv'
+    # Parquet written by combine_datasets.py is preferred over the CSV
+    data_path = preferred_path('/home/mirza/fabric-workspace/agricultural-supply-chain/ml-service/data/combined_training_data.csv')
     print(f"\n📂 Loading training data from: {data_path}")
 
-    df = pd.read_csv(data_path)
+    df = load_training_data(data_path)
     print(f"✅ Loaded {len(df)} batch records")
 
     # Display dataset info
@@ -43,11 +46,27 @@ def main():
 
     results = detector.train(df, test_size=0.2, random_state=42)
 
+    # Which features the forest isolates anomalies on
+    importance = detector.get_feature_importance(df)
+    print(f"\n🔎 Feature Importance (isolation path attribution, {importance['samples']} batches):")
+    for item in importance['features'][:10]:
+        print(f"   {item['feature']:<30} {item['share']:>6.1%}   "
+              f"anomalous {item['anomalous']:.4f} / normal {item['normal']:.4f}")
+
     # Save trained model
     model_path = '/home/mirza/fabric-workspace/agricultural-supply-chain/ml-service/saved_models/anomaly_detector.pkl'
     print(f"\n💾 Saving model...")
     detector.save(model_path)
 
+    # Memory-mappable copy: near-instant load, pages shared between workers
+    mapped_path = os.path.join(os.path.dirname(model_path), 'anomaly_detector.model')
+    detector.save(mapped_path, format='mmap')
+
+    # Publish to the model registry so running services hot-swap to it
+    registry_dir = os.getenv('ML_MODEL_REGISTRY')
+    if registry_dir:
+        ModelRegistry(registry_dir).publish(detector, metrics=results)
+
     # Test predictions on some samples
     print("\n" + "=" * 70)
     print("  TESTING MODEL ON SAMPLE BATCHES")
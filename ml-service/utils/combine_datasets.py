@@ -3,18 +3,27 @@
 Combine real and synthetic training data
 """
 
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 import pandas as pd
 import json
 
+from utils.training_data import load_training_data, preferred_path, save_parquet
+
 def combine_datasets():
     """Combine real exported data with synthetic data"""
 
     print("🔗 Combining real and synthetic datasets...")
 
     # Load real data
-    real_data_path = '/home/mirza/fabric-workspace/agricultural-supply-chain/ml-service/data/training_data.csv'
-    df_real = pd.read_csv(real_data_path)
-    print(f"✅ Loaded {len(df_real)} real batch records")
+    # Prefer the incremental export's snapshot, then data_export.py --format parquet, then the CSV
+    real_data_path = '/home/mirza/fabric-workspace/agricultural-supply-chain/ml-service/data/batches'
+    if not os.path.exists(os.path.join(real_data_path, 'state.json')):
+        real_data_path = preferred_path('/home/mirza/fabric-workspace/agricultural-supply-chain/ml-service/data/training_data.csv')
+    df_real = load_training_data(real_data_path)
+    print(f"✅ Loaded {len(df_real)} real batch records from {os.path.basename(real_data_path)}")
 
     # Add is_anomaly column to real data (assume all real data is normal)
     df_real['is_anomaly'] = False
@@ -43,12 +52,16 @@ def combine_datasets():
     output_json = '/home/mirza/fabric-workspace/agricultural-supply-chain/ml-service/data/combined_training_data.json'
     output_csv = '/home/mirza/fabric-workspace/agricultural-supply-chain/ml-service/data/combined_training_data.csv'
 
+    output_parquet = '/home/mirza/fabric-workspace/agricultural-supply-chain/ml-service/data/combined_training_data.parquet'
+
     df_combined.to_json(output_json, orient='records', date_format='iso', indent=2)
     df_combined.to_csv(output_csv, index=False)
+    save_parquet(df_combined, output_parquet)
 
     print(f"\n✅ Combined dataset saved to:")
     print(f"   JSON: {output_json}")
     print(f"   CSV: {output_csv}")
+    print(f"   Parquet: {output_parquet}")
 
     print(f"\n🌾 Crop Distribution:")
     print(df_combined['crop'].value_counts().head(10))
@@ -3,10 +3,14 @@
 Export training data from PostgreSQL database for ML model training
 """
 
+import argparse
 import psycopg2
 import pandas as pd
 import json
 import os
+import queue
+import threading
+from datetime import datetime, timezone
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -44,8 +48,66 @@ def get_db_connection():
     conn = psycopg2.connect(DATABASE_URL)
     return conn
 
-def export_batch_data():
-    """Export batch data with all features for training"""
+def _time_range(column, since, until):
+    """SQL condition for since < column <= until, or None without bounds"""
+    conditions = []
+    if since is not None:
+        conditions.append(f'{column} > %(since)s')
+    if until is not None:
+        conditions.append(f'{column} <= %(until)s')
+    return ' AND '.join(conditions) or None
+
+def batch_query(since=None, until=None, changed=False, harvest_from=None, harvest_to=None, ordered=True):
+    """
+    Batch export query with all training features
+
+    Processing and quality-test aggregates are computed per batch in their
+    own subqueries before the join, so a batch with several of each is
+    neither multiplied into many rows nor counted more than once.
+
+    Args:
+        since: Only batches created after this time (exclusive)
+        until: Only batches created at or before this time
+        changed: Select batches updated in the range, or whose processing
+            records / quality tests are dated in it, instead of batches
+            created in it. Recalled batches are included so an
+            incremental export can drop them.
+        harvest_from, harvest_to: Only batches with harvest_from <=
+            harvestDate < harvest_to (for splitting an export)
+        ordered: Newest batches first; bulk exports skip the sort
+
+    Returns:
+        Tuple of (SQL, parameters)
+    """
+
+    if changed:
+        filters = []
+        updated = _time_range('b."updatedAt"', since, until)
+        if updated:
+            filters.append(
+                f"""({updated}
+            OR EXISTS (SELECT 1 FROM processing_records p
+                       WHERE p."batchId" = b.id AND {_time_range('p."processingDate"', since, until)})
+            OR EXISTS (SELECT 1 FROM quality_tests q
+                       WHERE q."batchId" = b.id AND {_time_range('q."testDate"', since, until)}))"""
+            )
+    else:
+        filters = ["b.status NOT IN ('RECALLED')"]
+        created = _time_range('b."createdAt"', since, until)
+        if created:
+            filters.append(created)
+
+    harvest = []
+    if harvest_from is not None:
+        harvest.append('"harvestDate" >= %(harvest_from)s')
+    if harvest_to is not None:
+        harvest.append('"harvestDate" < %(harvest_to)s')
+    filters += ['b.' + condition for condition in harvest]
+
+    # A harvest range only needs the aggregates of its own batches
+    scope = ''
+    if harvest:
+        scope = 'WHERE "batchId" IN (SELECT id FROM batches WHERE {})'.format(' AND '.join(harvest))
 
     query = """
     SELECT
@@ -91,12 +153,12 @@ def export_batch_data():
         b.pesticides,
 
         -- Processing info if available
-        COUNT(pr.id) as processing_count,
-        AVG(pr."outputQuantity"::float / NULLIF(pr."inputQuantity"::float, 0)) as avg_yield_ratio,
+        COALESCE(pr.processing_count, 0) as processing_count,
+        pr.avg_yield_ratio,
 
         -- Quality tests if available
-        COUNT(qt.id) as quality_test_count,
-        STRING_AGG(DISTINCT qt."passFailStatus", ', ') as quality_test_results,
+        COALESCE(qt.quality_test_count, 0) as quality_test_count,
+        qt.quality_test_results,
 
         -- Created timestamp
         b."createdAt"
@@ -104,30 +166,52 @@ def export_batch_data():
     FROM batches b
     LEFT JOIN farm_locations fl ON b."farmLocationId" = fl.id
     LEFT JOIN farmer_profiles fp ON b."farmerId" = fp.id
-    LEFT JOIN processing_records pr ON b.id = pr."batchId"
-    LEFT JOIN quality_tests qt ON b.id = qt."batchId"
-
-    WHERE b.status NOT IN ('RECALLED')
-
-    GROUP BY
-        b.id, b."batchId", b."productType", b."cropType", b.quantity, b.unit,
-        b."qualityGrade", b."pricePerUnit", b.currency, b."totalBatchValue",
-        b."moistureContent", b."proteinContent", b.certifications, b.status,
-        b."harvestDate", b."cultivationMethod", b."irrigationMethod",
-        b.fertilizers, b.pesticides, b."createdAt",
-        fl.latitude, fl.longitude, fl.temperature, fl.humidity,
-        fl."weather_main", fl."weather_desc", fl."soilType", fl."soilPh", fl.elevation,
-        fp."farmingType", fp."primaryCrops", fp.certifications, fp."farmSize"
+    LEFT JOIN (
+        SELECT
+            "batchId",
+            COUNT(*) as processing_count,
+            AVG("outputQuantity"::float / NULLIF("inputQuantity"::float, 0)) as avg_yield_ratio
+        FROM processing_records
+        {scope}
+        GROUP BY "batchId"
+    ) pr ON pr."batchId" = b.id
+    LEFT JOIN (
+        SELECT
+            "batchId",
+            COUNT(*) as quality_test_count,
+            STRING_AGG(DISTINCT "passFailStatus", ', ') as quality_test_results
+        FROM quality_tests
+        {scope}
+        GROUP BY "batchId"
+    ) qt ON qt."batchId" = b.id
+
+    WHERE {filters}
+    {order}
+    """.format(
+        filters=' AND '.join(filters) or 'TRUE',
+        scope=scope,
+        order='ORDER BY b."createdAt" DESC' if ordered else ''
+    )
+
+    return query, {'since': since, 'until': until, 'harvest_from': harvest_from, 'harvest_to': harvest_to}
+
+def export_batch_data(since=None, until=None):
+    """
+    Export batch data with all features for training
 
-    ORDER BY b."createdAt" DESC
+    Args:
+        since: Only batches created after this time (exclusive)
+        until: Only batches created at or before this time
     """
 
+    query, params = batch_query(since, until)
+
     try:
         conn = get_db_connection()
         print("✅ Connected to database")
 
         # Execute query and load into pandas DataFrame
-        df = pd.read_sql_query(query, conn)
+        df = pd.read_sql_query(query, conn, params=params)
         print(f"✅ Exported {len(df)} batch records")
 
         conn.close()
@@ -161,7 +245,7 @@ def save_training_data(df, output_path='data/training_data.json'):
     df_copy = df.copy()
 
     # Convert lists to strings for JSON serialization
-    for col in ['certifications', 'farmer_certifications', 'fertilizers', 'pesticides', 'farmingType', 'primaryCrops']:
+    for col in ARRAY_COLUMNS:
         if col in df_copy.columns:
             df_copy[col] = df_copy[col].apply(lambda x: json.dumps(x) if isinstance(x, (list, dict)) else x)
 
@@ -178,59 +262,626 @@ def save_training_data(df, output_path='data/training_data.json'):
 
     return output_file
 
-def export_location_history():
-    """Export batch location history for spatial anomaly detection"""
+# Array columns of the batch export, written as JSON text
+ARRAY_COLUMNS = ['certifications', 'farmer_certifications', 'fertilizers', 'pesticides', 'farmingType', 'primaryCrops']
 
-    query = """
+# PostgreSQL type OIDs, for the Parquet schema of a streamed export
+BOOL_TYPES = {16}
+INT_TYPES = {20, 21, 23}
+FLOAT_TYPES = {700, 701, 1700}
+DATE_TYPES = {1082}
+TIMESTAMP_TYPES = {1114: None, 1184: 'UTC'}
+# Arrays and JSON are stored as JSON text
+JSON_TYPES = {114, 199, 1000, 1007, 1009, 1015, 1016, 1021, 1022, 1231, 3802}
+
+def _json_text(value):
+    # Compact, like PostgreSQL's array_to_json, so both Parquet exports match
+    return value if isinstance(value, str) else json.dumps(value, separators=(',', ':'), default=str)
+
+def parquet_schema(description):
+    """
+    Parquet schema for a cursor's result columns
+
+    Args:
+        description: cursor.description after the first fetch
+
+    Returns:
+        Tuple of (pyarrow schema, per-column value converter or None)
+    """
+    import pyarrow as pa
+
+    fields, converters = [], []
+    for column in description:
+        code = column.type_code
+        if code in BOOL_TYPES:
+            arrow_type, convert = pa.bool_(), None
+        elif code in INT_TYPES:
+            arrow_type, convert = pa.int64(), None
+        elif code in FLOAT_TYPES:
+            # NUMERIC arrives as Decimal
+            arrow_type, convert = pa.float64(), float
+        elif code in DATE_TYPES:
+            arrow_type, convert = pa.date32(), None
+        elif code in TIMESTAMP_TYPES:
+            arrow_type, convert = pa.timestamp('ms', tz=TIMESTAMP_TYPES[code]), None
+        elif code in JSON_TYPES:
+            arrow_type, convert = pa.string(), _json_text
+        else:
+            # Text, enums (e.g. BatchStatus) and anything else
+            arrow_type, convert = pa.string(), str
+        fields.append(pa.field(column.name, arrow_type))
+        converters.append(convert)
+
+    return pa.schema(fields), converters
+
+def rows_to_table(rows, schema, converters):
+    """Convert fetched row tuples into a pyarrow Table column by column"""
+    import pyarrow as pa
+
+    arrays = []
+    for i, (field, convert) in enumerate(zip(schema, converters)):
+        values = [row[i] for row in rows]
+        if convert is not None:
+            values = [None if value is None else convert(value) for value in values]
+        arrays.append(pa.array(values, type=field.type))
+
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+def stream_query_tables(query, params, chunk_size=10000, cursor_name='ml_export'):
+    """
+    Run a query through a named (server-side) cursor, chunk_size rows at a time
+
+    Args:
+        query, params: SQL and its parameters
+        chunk_size: Rows fetched per round trip
+        cursor_name: Server-side cursor name
+
+    Yields:
+        pyarrow Tables of up to chunk_size rows. The first one is yielded
+        even when the result is empty, so callers always get the schema.
+    """
+    conn = get_db_connection()
+    try:
+        with conn.cursor(name=cursor_name) as cursor:
+            cursor.itersize = chunk_size
+            cursor.execute(query, params)
+            schema = None
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                # A named cursor only has a description after its first fetch
+                if schema is None:
+                    schema, converters = parquet_schema(cursor.description)
+                elif not rows:
+                    break
+                yield rows_to_table(rows, schema, converters)
+                if not rows:
+                    break
+    finally:
+        conn.close()
+
+def stream_query_to_parquet(query, params, output_file, chunk_size=10000, compression='zstd',
+                            cursor_name='ml_export'):
+    """
+    Stream a query's rows into a Parquet file without loading them all
+
+    Each chunk from stream_query_tables is written as one row group, so
+    memory stays at about one chunk however large the result is. The file
+    is written under a temporary name and renamed into place when complete.
+
+    Args:
+        query, params: SQL and its parameters
+        output_file: Destination .parquet path
+        chunk_size: Rows fetched and written per row group
+        compression: Parquet codec ('zstd', 'snappy', 'gzip', 'none')
+        cursor_name: Server-side cursor name
+
+    Returns:
+        Number of rows written
+    """
+    import pyarrow.parquet as pq
+
+    tmp_file = f"{output_file}.tmp-{os.getpid()}"
+    rows_written = 0
+    writer = None
+
+    try:
+        for table in stream_query_tables(query, params, chunk_size, cursor_name):
+            if writer is None:
+                writer = pq.ParquetWriter(tmp_file, table.schema, compression=compression)
+            if table.num_rows:
+                writer.write_table(table, row_group_size=chunk_size)
+                rows_written += table.num_rows
+                print(f"   {rows_written} rows written...", end='\r')
+
+        writer.close()
+        writer = None
+        os.replace(tmp_file, output_file)
+    finally:
+        if writer is not None:
+            writer.close()
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+
+    return rows_written
+
+def stream_batch_data(output_path='data/training_data.parquet', since=None, until=None,
+                      chunk_size=10000, compression='zstd'):
+    """
+    Export batch data straight to a compressed Parquet file
+
+    Same rows and columns as export_batch_data, with peak memory bounded
+    by chunk_size instead of the table size.
+
+    Args:
+        output_path: Destination, relative to the ml-service directory
+        since, until: Optional createdAt bounds, as in export_batch_data
+        chunk_size: Rows per fetch and per Parquet row group
+        compression: Parquet codec
+
+    Returns:
+        Path of the written file
+    """
+    import pyarrow.parquet as pq
+
+    query, params = batch_query(since, until)
+    output_file = os.path.join(os.path.dirname(__file__), '..', output_path)
+    os.makedirs(os.path.dirname(os.path.abspath(output_file)), exist_ok=True)
+
+    print(f"🔌 Streaming batches in chunks of {chunk_size}...")
+    rows_written = stream_query_to_parquet(
+        query, params, output_file, chunk_size, compression, cursor_name='ml_batch_export'
+    )
+
+    metadata = pq.ParquetFile(output_file).metadata
+    print(f"✅ Exported {rows_written} batch records to: {output_file}")
+    print(f"   Row groups: {metadata.num_row_groups}, columns: {metadata.num_columns}")
+    print(f"   File size: {os.path.getsize(output_file) / 1024:.2f} KB ({compression})")
+
+    return output_file
+
+def harvest_ranges(conn, parts):
+    """
+    Split batches into harvestDate ranges holding about the same number of rows
+
+    Args:
+        conn: Database connection
+        parts: Number of ranges
+
+    Returns:
+        List of (harvest_from, harvest_to) for batch_query, None for open ends
+    """
+    if parts <= 1:
+        return [(None, None)]
+
+    with conn.cursor() as cursor:
+        cursor.execute(
+            'SELECT percentile_disc(%s::float8[]) WITHIN GROUP (ORDER BY "harvestDate") FROM batches',
+            ([i / parts for i in range(1, parts)],)
+        )
+        quantiles = cursor.fetchone()[0] or []
+
+    bounds = sorted({bound for bound in quantiles if bound is not None})
+    edges = [None] + bounds + [None]
+    return list(zip(edges[:-1], edges[1:]))
+
+def copy_query_batches(query, params, schema, block_size=1 << 22):
+    """
+    Run a query with COPY ... TO STDOUT and parse the CSV as it arrives
+
+    COPY sends rows as one continuous stream instead of cursor round
+    trips, and pyarrow's CSV reader parses it in C, column by column. The
+    COPY runs on a helper thread writing into a pipe that the reader
+    consumes, so only about one block is in memory at a time.
+
+    Args:
+        query, params: SQL and its parameters
+        schema: pyarrow schema of the result columns
+        block_size: Bytes parsed per record batch
+
+    Yields:
+        pyarrow RecordBatches
+    """
+    import pyarrow.csv as pv
+
+    conn = get_db_connection()
+    read_fd, write_fd = os.pipe()
+    errors = []
+
+    def produce():
+        try:
+            with os.fdopen(write_fd, 'wb') as sink, conn.cursor() as cursor:
+                copy_sql = f"COPY ({cursor.mogrify(query, params).decode()}) TO STDOUT WITH (FORMAT csv, HEADER)"
+                cursor.copy_expert(copy_sql, sink)
+        except Exception as e:
+            errors.append(e)
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+    try:
+        with os.fdopen(read_fd, 'rb') as source:
+            reader = pv.open_csv(
+                source,
+                read_options=pv.ReadOptions(block_size=block_size),
+                parse_options=pv.ParseOptions(newlines_in_values=True),
+                convert_options=pv.ConvertOptions(
+                    column_types=schema,
+                    strings_can_be_null=True,
+                    # COPY writes NULL as an empty field and '' as ""
+                    quoted_strings_can_be_null=False,
+                    true_values=['t'],
+                    false_values=['f']
+                )
+            )
+            for batch in reader:
+                yield batch
+    except Exception:
+        producer.join()
+        # A failed COPY shows up to the reader as a truncated stream
+        if errors:
+            raise errors[0]
+        raise
+    finally:
+        producer.join()
+        conn.close()
+
+    if errors:
+        raise errors[0]
+
+def _copy_columns(conn, query, params):
+    """
+    Select list that wraps the batch query for COPY, with arrays as JSON text
+
+    Returns:
+        Tuple of (select list for "SELECT ... FROM (query) q", pyarrow schema)
+    """
+    with conn.cursor() as cursor:
+        cursor.execute(f"SELECT * FROM ({query}) q LIMIT 0", params)
+        description = cursor.description
+
+    columns = ', '.join(
+        f'array_to_json(q."{column.name}")::text AS "{column.name}"'
+        if column.name in ARRAY_COLUMNS else f'q."{column.name}"'
+        for column in description
+    )
+    schema, _ = parquet_schema(description)
+    return columns, schema
+
+_DONE = object()
+
+def copy_batch_data(output_path='data/training_data.parquet', since=None, until=None, workers=4,
+                    chunk_size=50000, compression='zstd'):
+    """
+    Bulk export batch data to Parquet with COPY over parallel connections
+
+    The batches are split into harvestDate ranges of about equal size and
+    each range is pulled with COPY ... TO STDOUT on its own connection.
+    Parsed record batches go through a bounded queue to a single Parquet
+    writer, so memory stays bounded. Same columns and values as
+    stream_batch_data, in no particular row order.
+
+    Args:
+        output_path: Destination, relative to the ml-service directory
+        since, until: Optional createdAt bounds, as in export_batch_data
+        workers: Parallel connections (harvestDate ranges)
+        chunk_size: Rows per Parquet row group
+        compression: Parquet codec
+
+    Returns:
+        Path of the written file
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    output_file = os.path.join(os.path.dirname(__file__), '..', output_path)
+    os.makedirs(os.path.dirname(os.path.abspath(output_file)), exist_ok=True)
+    tmp_file = f"{output_file}.tmp-{os.getpid()}"
+
+    conn = get_db_connection()
+    try:
+        ranges = harvest_ranges(conn, workers)
+        queries = [
+            batch_query(since, until, harvest_from=harvest_from, harvest_to=harvest_to, ordered=False)
+            for harvest_from, harvest_to in ranges
+        ]
+        columns, schema = _copy_columns(conn, *queries[0])
+    finally:
+        conn.close()
+
+    print(f"🔌 Copying batches over {len(ranges)} connection(s)...")
+    batches = queue.Queue(maxsize=len(ranges) * 2)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                batches.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def copy_range(query, params):
+        try:
+            for batch in copy_query_batches(f"SELECT {columns} FROM ({query}) q", params, schema):
+                if not put(batch):
+                    return
+            put(_DONE)
+        except Exception as e:
+            put(e)
+
+    threads = [threading.Thread(target=copy_range, args=query, daemon=True) for query in queries]
+    for thread in threads:
+        thread.start()
+
+    rows_written = 0
+    writer = pq.ParquetWriter(tmp_file, schema, compression=compression)
+    try:
+        pending, pending_rows, done = [], 0, 0
+        while done < len(threads):
+            item = batches.get()
+            if item is _DONE:
+                done += 1
+            elif isinstance(item, Exception):
+                raise item
+            else:
+                pending.append(item)
+                pending_rows += item.num_rows
+            if pending and (pending_rows >= chunk_size or done == len(threads)):
+                writer.write_table(pa.Table.from_batches(pending, schema=schema))
+                rows_written += pending_rows
+                pending, pending_rows = [], 0
+                print(f"   {rows_written} rows written...", end='\r')
+
+        writer.close()
+        writer = None
+        os.replace(tmp_file, output_file)
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+        if writer is not None:
+            writer.close()
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+
+    metadata = pq.ParquetFile(output_file).metadata
+    print(f"✅ Exported {rows_written} batch records to: {output_file}")
+    print(f"   Row groups: {metadata.num_row_groups}, columns: {metadata.num_columns}")
+    print(f"   File size: {os.path.getsize(output_file) / 1024:.2f} KB ({compression})")
+
+    return output_file
+
+# Keyset order of the location history export: (batchId, timestamp) is
+# indexed, id breaks ties between events of a batch at the same time
+LOCATION_HISTORY_KEY = ['batchRecordId', 'timestamp', 'id']
+
+def location_history_page_query(after=None):
+    """
+    One page of batch location history in keyset order
+
+    The page is cut from batch_location_history alone, by a row comparison
+    on (batchId, timestamp, id) that the ("batchId", timestamp) index
+    serves, and joined to batches afterwards, so every page costs the
+    same however far into the history it is.
+
+    Args:
+        after: Key (batchRecordId, timestamp, id) of the last exported
+            row, or None for the first page
+
+    Returns:
+        Tuple of (SQL, parameters); the page size is the %(page_size)s parameter
+    """
+    after_filter = ''
+    params = {}
+    if after is not None:
+        after_filter = 'WHERE (blh."batchId", blh.timestamp, blh.id) > (%(after_batch)s, %(after_timestamp)s, %(after_id)s)'
+        params = dict(zip(['after_batch', 'after_timestamp', 'after_id'], after))
+
+    query = f"""
     SELECT
-        blh."batchId",
-        blh."eventType",
-        blh.latitude,
-        blh.longitude,
-        blh.timestamp,
-        blh.metadata,
+        page."batchId" as "batchRecordId",
+        page.timestamp,
+        page.id,
+        b."batchId",
+        page."eventType",
+        page.latitude,
+        page.longitude,
+        page.metadata,
         b."productType" as crop,
         b.quantity
-    FROM batch_location_history blh
-    JOIN batches b ON blh."batchId" = b."batchId"
-    ORDER BY blh.timestamp DESC
-    LIMIT 10000
+    FROM (
+        SELECT blh.id, blh."batchId", blh."eventType", blh.latitude, blh.longitude, blh.timestamp, blh.metadata
+        FROM batch_location_history blh
+        {after_filter}
+        ORDER BY blh."batchId", blh.timestamp, blh.id
+        LIMIT %(page_size)s
+    ) page
+    JOIN batches b ON b.id = page."batchId"
+    ORDER BY page."batchId", page.timestamp, page.id
     """
+    return query, params
 
-    try:
-        conn = get_db_connection()
-        df = pd.read_sql_query(query, conn)
-        conn.close()
+def _load_history_state(output_dir):
+    state_path = os.path.join(output_dir, 'state.json')
+    if not os.path.exists(state_path):
+        return None
+    with open(state_path) as f:
+        return json.load(f)
 
-        print(f"\n✅ Exported {len(df)} location history records")
+def _write_history_state(output_dir, state):
+    tmp_path = os.path.join(output_dir, f'.state.json.tmp-{os.getpid()}')
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, os.path.join(output_dir, 'state.json'))
 
-        # Save to JSON
-        output_file = os.path.join(os.path.dirname(__file__), '..', 'data/location_history.json')
-        df.to_json(output_file, orient='records', date_format='iso', indent=2)
-        print(f"✅ Location history saved to: {output_file}")
+def export_location_history(output_path='data/location_history', page_size=10000, file_rows=500000,
+                            compression='zstd', restart=False):
+    """
+    Export the complete batch location history for spatial anomaly detection
+
+    Pages through the history in (batchId, timestamp, id) order, page_size
+    rows per query, and writes each page as a Parquet row group. Every
+    file_rows rows the current part file is closed and the key of its last
+    row is recorded in state.json, so an interrupted export resumes after
+    the last finished part instead of starting over. Memory stays at about
+    one page however long the history is.
+
+    Each page is a separate short query rather than one long transaction,
+    so rows inserted during the export are included only if they sort
+    after the current key.
+
+    Args:
+        output_path: Output directory, relative to the ml-service directory
+        page_size: Rows per query and per Parquet row group
+        file_rows: Rows per part file (a resume point every file_rows rows)
+        compression: Parquet codec
+        restart: Discard an unfinished export instead of resuming it. A
+            finished export is always started over.
+
+    Returns:
+        Final state dict, or None if the export failed
+    """
+    import pyarrow.parquet as pq
 
-        return df
+    output_dir = os.path.join(os.path.dirname(__file__), '..', output_path)
+    os.makedirs(output_dir, exist_ok=True)
+    state = _load_history_state(output_dir)
+
+    if state is None or state['complete'] or restart:
+        state = {'lastKey': None, 'parts': [], 'rows': 0, 'complete': False,
+                 'startedAt': datetime.now(timezone.utc).isoformat()}
+        referenced = set()
+    else:
+        referenced = {part['file'] for part in state['parts']}
+        print(f"↩️  Resuming location history export after {state['rows']} rows")
+
+    # Leftovers of an interrupted run or of a previous export
+    for name in os.listdir(output_dir):
+        if (name.endswith('.parquet') and name not in referenced) or '.parquet.tmp-' in name:
+            os.remove(os.path.join(output_dir, name))
+
+    after = None
+    if state['lastKey']:
+        batch_id, timestamp, row_id = state['lastKey']
+        after = (batch_id, datetime.fromisoformat(timestamp), row_id)
+
+    conn = writer = tmp_file = None
+    part_rows = 0
+
+    def finish_part():
+        # Rename the open part into place and record its last key as the resume point
+        nonlocal writer, part_rows
+        writer.close()
+        writer = None
+        os.replace(tmp_file, os.path.join(output_dir, name))
+        state['parts'].append({'file': name, 'rows': part_rows})
+        state['rows'] += part_rows
+        state['lastKey'] = [after[0], after[1].isoformat(), after[2]]
+        _write_history_state(output_dir, state)
+        part_rows = 0
+
+    try:
+        conn = get_db_connection()
+        # One short statement per page, no snapshot held open for the whole export
+        conn.autocommit = True
+        schema = None
+
+        with conn.cursor() as cursor:
+            while True:
+                query, params = location_history_page_query(after)
+                cursor.execute(query, dict(params, page_size=page_size))
+                rows = cursor.fetchall()
+                if schema is None:
+                    schema, converters = parquet_schema(cursor.description)
+                if not rows:
+                    break
+
+                if writer is None:
+                    name = f"part-{len(state['parts']):06d}.parquet"
+                    tmp_file = os.path.join(output_dir, f".{name}.tmp-{os.getpid()}")
+                    writer = pq.ParquetWriter(tmp_file, schema, compression=compression)
+                writer.write_table(rows_to_table(rows, schema, converters), row_group_size=page_size)
+                part_rows += len(rows)
+                # The last key comes from the fetched values, at full timestamp precision
+                after = rows[-1][:len(LOCATION_HISTORY_KEY)]
+                print(f"   {state['rows'] + part_rows} location history rows written...", end='\r')
+
+                if part_rows >= file_rows:
+                    finish_part()
+                if len(rows) < page_size:
+                    break
+
+        # The last page was full (or short) and its part is still open
+        if writer is not None:
+            finish_part()
+
+        state['complete'] = True
+        state['completedAt'] = datetime.now(timezone.utc).isoformat()
+        _write_history_state(output_dir, state)
+
+        print(f"\n✅ Exported {state['rows']} location history records in {len(state['parts'])} files")
+        print(f"✅ Location history saved to: {output_dir}")
+        return state
 
     except Exception as e:
-        print(f"⚠️  Warning: Could not export location history: {e}")
+        print(f"\n⚠️  Warning: Could not export location history: {e}")
+        if state['parts']:
+            print(f"   {state['rows']} rows are saved, run again to resume")
         return None
 
-if __name__ == "__main__":
-    print("🚀 Starting data export for ML training...\n")
+    finally:
+        if writer is not None:
+            writer.close()
+        if tmp_file and os.path.exists(tmp_file):
+            os.remove(tmp_file)
+        if conn is not None:
+            conn.close()
 
-    # Export main batch data
-    df_batches = export_batch_data()
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Export training data from PostgreSQL')
+    parser.add_argument('--format', choices=['json', 'parquet'], default='json',
+                        help="'json' loads everything and writes JSON + CSV; "
+                             "'parquet' streams to a compressed Parquet file in bounded memory")
+    parser.add_argument('--method', choices=['cursor', 'copy'], default='cursor',
+                        help="parquet: 'cursor' streams a server-side cursor, "
+                             "'copy' bulk-loads with COPY over parallel connections")
+    parser.add_argument('--workers', type=int, default=4, help='Parallel connections (copy)')
+    parser.add_argument('--chunk-size', type=int, default=10000, help='Rows per fetch/row group (parquet)')
+    parser.add_argument('--compression', default='zstd', help='Parquet codec')
+    parser.add_argument('--restart-history', action='store_true',
+                        help='Start the location history export over instead of resuming it')
+    args = parser.parse_args()
 
-    if len(df_batches) > 0:
-        save_training_data(df_batches)
+    print("🚀 Starting data export for ML training...\n")
 
-        # Export location history if available
-        export_location_history()
+    if args.format == 'parquet':
+        if args.method == 'copy':
+            copy_batch_data(workers=args.workers, chunk_size=args.chunk_size, compression=args.compression)
+        else:
+            stream_batch_data(chunk_size=args.chunk_size, compression=args.compression)
+        export_location_history(page_size=args.chunk_size, compression=args.compression,
+                                restart=args.restart_history)
 
         print("\n✅ Data export completed successfully!")
         print("\nNext steps:")
-        print("1. Review data/training_data.csv to inspect the data")
+        print("1. Combine with synthetic data: python utils/combine_datasets.py")
         print("2. Run training scripts to build ML models")
 
     else:
-        print("❌ No data found in database. Please ensure batches exist.")
+        # Export main batch data
+        df_batches = export_batch_data()
+
+        if len(df_batches) > 0:
+            save_training_data(df_batches)
+
+            # Export location history if available
+            export_location_history(page_size=args.chunk_size, compression=args.compression,
+                                    restart=args.restart_history)
+
+            print("\n✅ Data export completed successfully!")
+            print("\nNext steps:")
+            print("1. Review data/training_data.csv to inspect the data")
+            print("2. Run training scripts to build ML models")
+
+        else:
+            print("❌ No data found in database. Please ensure batches exist.")
@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""
+Incremental training-data export, partitioned by harvest month
+
+Each run fetches only the batches that changed since the watermark in the
+dataset's state file (updatedAt, or processing records / quality tests
+dated after it) and upserts them by batchId into one Parquet file per
+harvest month. The change set is streamed into per-month staging files,
+then applied one month at a time, so memory stays at about one month
+however large it is. Only the months touched by the change set are
+rewritten.
+
+Change detection only sees what the query can date:
+- farm_locations and farmer_profiles have no updatedAt, so edits to a
+  farm's location or weather, or to a farmer's profile, don't mark their
+  batches as changed
+- processing_records and quality_tests have no createdAt and are found by
+  processingDate / testDate, so a record inserted with a date before the
+  watermark (backdated) is missed
+- batches deleted from the database never show up as changes
+A periodic full rescan (--full-rescan-days, default 7) re-reads every
+batch and rebuilds all partitions from it, which picks all of these up.
+
+Every run writes new partition files and then atomically replaces
+state.json, which lists the files of the current snapshot together with
+its watermark. Readers that go through state.json (load_training_data
+on the dataset directory) therefore always see one consistent snapshot,
+and the watermark only advances together with the data it covers.
+
+Usage:
+    python utils/incremental_export.py
+    python utils/incremental_export.py --dataset data/batches --lag-seconds 300
+    python utils/incremental_export.py --full-rescan
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+from datetime import datetime, timedelta, timezone
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.data_export import batch_query, stream_query_tables
+
+DEFAULT_DATASET = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'batches')
+STATE_FILE = 'state.json'
+UNKNOWN_PERIOD = 'unknown'
+
+
+def load_state(dataset_dir):
+    """Current snapshot state, or an empty one for a new dataset"""
+    state_path = os.path.join(dataset_dir, STATE_FILE)
+    if not os.path.exists(state_path):
+        return {'version': 0, 'watermark': None, 'fullScanAt': None, 'partitions': {}, 'index': None, 'rows': 0}
+    with open(state_path) as f:
+        return json.load(f)
+
+
+def write_state(dataset_dir, state):
+    tmp_path = os.path.join(dataset_dir, f'.{STATE_FILE}.tmp-{os.getpid()}')
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, os.path.join(dataset_dir, STATE_FILE))
+
+
+def harvest_periods(table):
+    """'YYYY-MM' partition key of every row"""
+    import pyarrow.compute as pc
+
+    periods = pc.strftime(table['harvestDate'], format='%Y-%m')
+    return pc.fill_null(periods, UNKNOWN_PERIOD)
+
+
+def fetch_changes(since, until, chunk_size):
+    """
+    Batches changed in (since, until], recalled ones included; every batch
+    when neither bound is given
+
+    Returns:
+        Iterator of pyarrow Tables of up to chunk_size rows
+    """
+    query, params = batch_query(since, until, changed=True, ordered=False)
+    return stream_query_tables(query, params, chunk_size, cursor_name='ml_incremental_export')
+
+
+def stage_changes(staging_dir, chunks, compression='zstd'):
+    """
+    Spill streamed changes into one staging Parquet file per harvest month
+
+    Only one chunk is held in memory at a time. Recalled batches are not
+    staged, only remembered as changed.
+
+    Args:
+        staging_dir: Directory for the staging files (created here)
+        chunks: Tables from fetch_changes
+        compression: Parquet codec
+
+    Returns:
+        Dictionary with 'changed' (every fetched batchId), 'index' (batchId
+        and period of every staged batch), 'files' ({period: staging file})
+        and 'rows' (fetched batches)
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+
+    os.makedirs(staging_dir, exist_ok=True)
+    writers, files = {}, {}
+    changed, index = [], []
+    rows = 0
+
+    try:
+        for chunk in chunks:
+            rows += chunk.num_rows
+            changed.append(chunk['batchId'].cast(pa.string()))
+            recalled = pc.equal(chunk['status'], 'RECALLED')
+            upserts = chunk.filter(pc.invert(pc.fill_null(recalled, False)))
+            periods = harvest_periods(upserts)
+            index.append(pa.table({'batchId': upserts['batchId'].cast(pa.string()), 'period': periods}))
+
+            for period in pc.unique(periods).to_pylist():
+                if period not in writers:
+                    files[period] = os.path.join(staging_dir, f"{period}.parquet")
+                    writers[period] = pq.ParquetWriter(files[period], upserts.schema, compression=compression)
+                writers[period].write_table(upserts.filter(pc.equal(periods, period)))
+    finally:
+        for writer in writers.values():
+            writer.close()
+
+    empty_index = pa.table({'batchId': pa.array([], pa.string()), 'period': pa.array([], pa.string())})
+    return {
+        'changed': pa.chunked_array(changed, pa.string()),
+        'index': pa.concat_tables([empty_index] + index),
+        'files': files,
+        'rows': rows
+    }
+
+
+def apply_changes(dataset_dir, state, staged, compression='zstd', full=False):
+    """
+    Upsert staged batches into their harvest-month partitions
+
+    A batch is removed from the partition it was in (looked up in the
+    batchId -> partition index) and, unless it was recalled, written to
+    the partition of its current harvest month. Only partitions that lose
+    or gain rows are rewritten, one at a time; the rest are carried over.
+
+    Args:
+        dataset_dir: Dataset directory
+        state: Current state (see load_state)
+        staged: Result of stage_changes
+        compression: Parquet codec
+        full: The staged batches are all batches, so every batch missing
+            from them is removed and every partition is rebuilt from them
+
+    Returns:
+        Tuple of (new state without watermark, {'inserted', 'updated', 'deleted', 'partitions'})
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+
+    version = state['version'] + 1
+    changed_ids = staged['changed']
+    upsert_index = staged['index']
+
+    if state['index']:
+        index = pq.read_table(os.path.join(dataset_dir, state['index']))
+    else:
+        index = pa.table({'batchId': pa.array([], pa.string()), 'period': pa.array([], pa.string())})
+
+    if full:
+        previous = pa.repeat(True, index.num_rows)
+    else:
+        previous = pc.is_in(index['batchId'], value_set=changed_ids)
+    previous_ids = index.filter(previous)['batchId']
+    touched = set(pc.unique(index.filter(previous)['period']).to_pylist())
+    touched |= set(staged['files'])
+
+    partitions = dict(state['partitions'])
+    for period in sorted(touched):
+        parts = []
+        if period in partitions and not full:
+            existing = pq.read_table(os.path.join(dataset_dir, partitions[period]['file']))
+            parts.append(existing.filter(pc.invert(pc.is_in(existing['batchId'], value_set=changed_ids))))
+        if period in staged['files']:
+            added = pq.read_table(staged['files'][period])
+            if parts:
+                added = added.cast(parts[0].schema)
+            parts.append(added)
+
+        if sum(part.num_rows for part in parts) == 0:
+            partitions.pop(period, None)
+            continue
+
+        table = pa.concat_tables(parts)
+        name = f"harvest_month={period}/part-{version:06d}.parquet"
+        os.makedirs(os.path.join(dataset_dir, os.path.dirname(name)), exist_ok=True)
+        pq.write_table(table, os.path.join(dataset_dir, name), compression=compression)
+        partitions[period] = {'file': name, 'rows': table.num_rows}
+
+    index = pa.concat_tables([index.filter(pc.invert(previous)), upsert_index])
+    index_name = f"index-{version:06d}.parquet"
+    pq.write_table(index, os.path.join(dataset_dir, index_name), compression=compression)
+
+    new_state = {
+        'version': version,
+        'partitions': partitions,
+        'index': index_name,
+        'rows': sum(partition['rows'] for partition in partitions.values())
+    }
+    updated = int(pc.sum(pc.is_in(upsert_index['batchId'], value_set=previous_ids)).as_py() or 0)
+    stats = {
+        'inserted': upsert_index.num_rows - updated,
+        'updated': updated,
+        'deleted': len(previous_ids) - updated,
+        'partitions': len(touched)
+    }
+    return new_state, stats
+
+
+def remove_stale_files(dataset_dir, keep_states):
+    """
+    Delete partition and index files no longer referenced
+
+    Files of the previous snapshot are kept too, so a reader that loaded
+    the old state.json just before the switch can still open them.
+    """
+    referenced = set()
+    for state in keep_states:
+        referenced.update(partition['file'] for partition in state['partitions'].values())
+        if state['index']:
+            referenced.add(state['index'])
+
+    for root, _, files in os.walk(dataset_dir):
+        for name in files:
+            path = os.path.relpath(os.path.join(root, name), dataset_dir)
+            if name.endswith('.parquet') and path not in referenced:
+                os.remove(os.path.join(dataset_dir, path))
+
+
+def export_incremental(dataset_dir=DEFAULT_DATASET, lag_seconds=60, chunk_size=10000, compression='zstd',
+                       full_rescan_days=7, full_rescan=False):
+    """
+    Bring the partitioned dataset up to date with the database
+
+    Args:
+        dataset_dir: Dataset directory (created on the first run)
+        lag_seconds: Leave rows updated in the last N seconds for the next
+            run, so transactions that commit late don't fall behind the watermark
+        chunk_size: Rows per server-side cursor fetch
+        compression: Parquet codec
+        full_rescan_days: Re-read every batch when the last full rescan is
+            this many days old, to catch changes the watermark can't see
+            (see the module docstring; 0 = never)
+        full_rescan: Re-read every batch on this run
+
+    Returns:
+        New state
+    """
+    os.makedirs(dataset_dir, exist_ok=True)
+    state = load_state(dataset_dir)
+    since = datetime.fromisoformat(state['watermark']) if state['watermark'] else None
+    until = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(seconds=lag_seconds)
+
+    last_full = state.get('fullScanAt')
+    if since is None or (full_rescan_days and (
+            last_full is None or until - datetime.fromisoformat(last_full) >= timedelta(days=full_rescan_days))):
+        full_rescan = True
+
+    staging_dir = os.path.join(dataset_dir, f".staging-{os.getpid()}")
+    try:
+        if full_rescan:
+            # No upper bound: batches updated after the watermark are fetched
+            # again next run, which the upsert makes harmless
+            print(f"🔌 Full rescan of all batches (last one: {last_full or 'never'})...")
+            chunks = fetch_changes(None, None, chunk_size)
+        else:
+            print(f"🔌 Fetching batches changed after {since} up to {until}...")
+            chunks = fetch_changes(since, until, chunk_size)
+
+        staged = stage_changes(staging_dir, chunks, compression)
+        print(f"✅ {staged['rows']} {'batches' if full_rescan else 'new or changed batches'} "
+              f"in {len(staged['files'])} harvest months")
+
+        if staged['rows'] == 0 and not full_rescan:
+            new_state = dict(state, watermark=until.isoformat())
+            write_state(dataset_dir, new_state)
+            print(f"📌 Nothing to apply, watermark advanced to {until}")
+            return new_state
+
+        new_state, stats = apply_changes(dataset_dir, state, staged, compression, full=full_rescan)
+    finally:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+
+    new_state['watermark'] = until.isoformat()
+    new_state['fullScanAt'] = until.isoformat() if full_rescan else last_full
+    new_state['updatedAt'] = datetime.now(timezone.utc).isoformat()
+    write_state(dataset_dir, new_state)
+    remove_stale_files(dataset_dir, [state, new_state])
+
+    print(f"✅ {stats['inserted']} inserted, {stats['updated']} updated, {stats['deleted']} removed "
+          f"across {stats['partitions']} harvest-month partitions")
+    print(f"   Snapshot v{new_state['version']}: {new_state['rows']} batches in "
+          f"{len(new_state['partitions'])} partitions")
+    print(f"📌 Watermark advanced to {until}")
+    return new_state
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Incremental, partitioned training data export')
+    parser.add_argument('--dataset', default=DEFAULT_DATASET, help='Partitioned dataset directory')
+    parser.add_argument('--lag-seconds', type=int, default=60,
+                        help='Ignore batches updated in the last N seconds')
+    parser.add_argument('--chunk-size', type=int, default=10000, help='Rows per cursor fetch')
+    parser.add_argument('--compression', default='zstd', help='Parquet codec')
+    parser.add_argument('--full-rescan-days', type=float, default=7,
+                        help='Re-read every batch once the last full rescan is N days old (0 = never)')
+    parser.add_argument('--full-rescan', action='store_true', help='Re-read every batch on this run')
+    args = parser.parse_args()
+
+    print("🚀 Starting incremental data export...\n")
+    export_incremental(args.dataset, args.lag_seconds, args.chunk_size, args.compression,
+                       args.full_rescan_days, args.full_rescan)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Read training data in any of the formats the export pipeline writes
+"""
+
+import json
+import os
+
+import pandas as pd
+
+
+def preferred_path(path):
+    """
+    The Parquet sibling of a training data file if one exists, else path
+
+    Args:
+        path: e.g. data/combined_training_data.csv
+
+    Returns:
+        data/combined_training_data.parquet when it exists, otherwise path
+    """
+    parquet_path = os.path.splitext(path)[0] + '.parquet'
+    return parquet_path if os.path.exists(parquet_path) else path
+
+
+def load_training_data(path, columns=None):
+    """
+    Load a training data file by its extension
+
+    Args:
+        path: .parquet, .json (records) or .csv file, or a dataset
+            directory written by incremental_export.py
+        columns: Optional subset of columns (Parquet only reads those)
+
+    Returns:
+        DataFrame
+    """
+    if os.path.isdir(path):
+        return load_partitioned(path, columns)
+
+    extension = os.path.splitext(path)[1].lower()
+
+    if extension == '.parquet':
+        return pd.read_parquet(path, columns=columns)
+    if extension == '.json':
+        df = pd.read_json(path, orient='records')
+    else:
+        df = pd.read_csv(path)
+
+    return df[columns] if columns is not None else df
+
+
+def load_partitioned(dataset_dir, columns=None):
+    """
+    Load the current snapshot of a partitioned dataset
+
+    Reads the partition files listed in the dataset's state.json, so a
+    concurrent incremental export never shows a half-applied update.
+
+    Args:
+        dataset_dir: Directory written by utils/incremental_export.py
+        columns: Optional subset of columns
+
+    Returns:
+        DataFrame
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    with open(os.path.join(dataset_dir, 'state.json')) as f:
+        state = json.load(f)
+
+    tables = [
+        pq.read_table(os.path.join(dataset_dir, partition['file']), columns=columns)
+        for _, partition in sorted(state['partitions'].items())
+    ]
+    if not tables:
+        return pd.DataFrame(columns=columns)
+    return pa.concat_tables(tables).to_pandas()
+
+
+def save_parquet(df, path, compression='zstd'):
+    """
+    Write a DataFrame to Parquet
+
+    Date columns that mix parsed timestamps (database exports) and ISO
+    strings (synthetic data, CSV round trips) are parsed first, since a
+    Parquet column has a single type.
+
+    Args:
+        df: DataFrame to write
+        path: Destination .parquet file
+        compression: Parquet codec
+    """
+    df = df.copy()
+    for col in ('harvestDate', 'createdAt'):
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col], errors='coerce', format='mixed')
+    df.to_parquet(path, index=False, compression=compression)